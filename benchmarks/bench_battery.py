@@ -0,0 +1,85 @@
+"""Benchmark of the vectorized battery simulation against the original loop.
+
+Run from the repository root with:
+
+    python -m benchmarks.bench_battery
+
+For every size the script checks that both implementations produce the same
+state of charge and the same violating rows, and prints the speedup.
+"""
+import time
+
+import numpy as np
+import pandas as pd
+
+from bus_checker.battery import CHARGING_SPEED_10, CHARGING_SPEED_90, simulate_battery_levels
+
+SIZES = [1_000, 10_000, 100_000]
+ROWS_PER_BLOCK = 200
+
+
+def make_rows(n_rows, seed=0):
+    """Generate battery simulation inputs for `n_rows` activities."""
+    rng = np.random.default_rng(seed)
+    activities = rng.choice(['dienst rit', 'materiaal rit', 'idle', 'opladen'], size=n_rows, p=[0.6, 0.1, 0.2, 0.1])
+    return pd.DataFrame({
+        'omloop nummer': np.arange(n_rows) // ROWS_PER_BLOCK + 1,
+        'activiteit': activities,
+        'consumption (kWh)': np.where(activities == 'idle', 0.01, rng.uniform(2, 20, n_rows)),
+        'duration': rng.integers(1, 30, n_rows).astype(float),
+    })
+
+
+def legacy_battery_levels(df, max_capacity):
+    """The row-by-row simulation that `check_battery_status` used before."""
+    battery_level = max_capacity
+    previous_loop_number = None
+    levels = []
+    for _, row in df.iterrows():
+        if row['omloop nummer'] != previous_loop_number:
+            battery_level = max_capacity
+        if row['activiteit'] == 'opladen':
+            charge_power = (CHARGING_SPEED_90 if battery_level <= (max_capacity * 0.9) else CHARGING_SPEED_10) * row['duration']
+            battery_level = min(battery_level + charge_power, max_capacity)
+        else:
+            battery_level -= row['consumption (kWh)']
+        battery_level = max(battery_level, 0)
+        levels.append(battery_level)
+        previous_loop_number = row['omloop nummer']
+    return np.array(levels)
+
+
+def main():
+    max_capacity = 300 * 0.9
+    min_battery = max_capacity * 0.1
+
+    for n_rows in SIZES:
+        df = make_rows(n_rows)
+
+        start = time.perf_counter()
+        expected = legacy_battery_levels(df, max_capacity)
+        legacy_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        levels = simulate_battery_levels(
+            df['omloop nummer'].to_numpy(),
+            (df['activiteit'] == 'opladen').to_numpy(),
+            df['consumption (kWh)'].to_numpy(),
+            df['duration'].to_numpy(),
+            max_capacity,
+        )
+        vectorized_seconds = time.perf_counter() - start
+
+        assert np.allclose(levels, expected, rtol=0, atol=1e-6)
+        assert np.array_equal(levels < min_battery, expected < min_battery)
+
+        print(
+            f'{n_rows:>7} rows: loop {legacy_seconds * 1000:9.1f} ms, '
+            f'vectorized {vectorized_seconds * 1000:7.2f} ms, '
+            f'speedup {legacy_seconds / vectorized_seconds:7.0f}x, '
+            f'max difference {np.abs(levels - expected).max():.1e} kWh'
+        )
+
+
+if __name__ == '__main__':
+    main()
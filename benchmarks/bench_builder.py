@@ -0,0 +1,40 @@
+"""Benchmark of building bus plannings from timetables of several sizes.
+
+Run from the repository root with:
+
+    python -m benchmarks.bench_builder
+
+Every built planning is checked for battery, route continuity and travel time
+problems, which it should not have.
+"""
+import time
+
+from benchmarks.synthetic import make_dataset
+from bus_checker.builder import build_planning
+from bus_checker.checks import check_battery_status, check_route_continuity, check_travel_time, planning_distances
+from bus_checker.model import PlanningModel
+
+SIZES = [10, 100, 500]  # Blocks of the synthetic planning the timetable is taken from
+SOH, MIN_SOC, CONSUMPTION_PER_KM = 90, 10, 1.6
+
+
+def main():
+    for n_blocks in SIZES:
+        _, timetable, distance_matrix = make_dataset(n_blocks)
+
+        start = time.perf_counter()
+        planning = build_planning(timetable, distance_matrix, SOH, MIN_SOC, CONSUMPTION_PER_KM)
+        seconds = time.perf_counter() - start
+
+        model = PlanningModel.from_frame(planning)
+        distances = planning_distances(model, distance_matrix)
+        assert check_battery_status(model, distances, SOH, MIN_SOC, CONSUMPTION_PER_KM).empty
+        assert check_route_continuity(model).empty
+        assert check_travel_time(model, distance_matrix).empty
+
+        print(f'{len(timetable):>6} trips: {len(planning):>6} rows and {model.n_blocks:>4} buses in '
+              f'{seconds * 1000:8.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
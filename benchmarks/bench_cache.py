@@ -0,0 +1,67 @@
+"""Load time of workbooks parsed from Excel against the Arrow sheet cache.
+
+Run from the repository root with:
+
+    python -m benchmarks.bench_cache
+
+Plannings of 10, 100 and 500 blocks and their timetable are written to
+.xlsx files. Every workbook is read from Excel, read once more while filling
+the cache, and then loaded memory-mapped from the cache.
+"""
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+from benchmarks.synthetic import make_distance_matrix, make_planning, make_timetable
+from bus_checker.cache import SheetCache
+from bus_checker.loading import TIMETABLE_SHEETS, read_sheets
+
+SIZES = [10, 100, 500]  # Blocks of 100 rows
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        cache = SheetCache(os.path.join(directory, 'cache'))
+        if not cache.available:
+            print('pyarrow is not installed, the sheet cache is disabled')
+            return
+
+        for n_blocks in SIZES:
+            planning = make_planning(n_blocks)
+            workbooks = {'planning': (os.path.join(directory, f'planning_{n_blocks}.xlsx'), [0])}
+            planning.to_excel(workbooks['planning'][0], index=False)
+
+            timetable_path = os.path.join(directory, f'timetable_{n_blocks}.xlsx')
+            with pd.ExcelWriter(timetable_path) as writer:
+                make_timetable(planning).to_excel(writer, sheet_name='Dienstregeling', index=False)
+                make_distance_matrix().to_excel(writer, sheet_name='Afstandsmatrix', index=False)
+            workbooks['timetable'] = (timetable_path, TIMETABLE_SHEETS)
+
+            for name, (path, sheets) in workbooks.items():
+                expected, excel_seconds = timed(read_sheets, path, sheets)
+                _, store_seconds = timed(read_sheets, path, sheets, cache)
+                frames, cached_seconds = timed(read_sheets, path, sheets, cache)
+
+                for sheet in sheets:
+                    pd.testing.assert_frame_equal(frames[sheet], expected[sheet])
+
+                rows = sum(len(frame) for frame in frames.values())
+                print(
+                    f'{name:>9} {rows:>6} rows: xlsx {excel_seconds * 1000:8.1f} ms, '
+                    f'first load with cache {store_seconds * 1000:8.1f} ms, '
+                    f'arrow {cached_seconds * 1000:6.1f} ms, speedup {excel_seconds / cached_seconds:5.0f}x'
+                )
+
+        print(f'cache size {cache.size() / 1024 ** 2:.1f} MB in {len(cache.entries())} files')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""Benchmark of the vectorized route continuity check against the original loop.
+
+Run from the repository root with:
+
+    python -m benchmarks.bench_continuity
+"""
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import make_planning
+from bus_checker.checks import check_route_continuity
+from bus_checker.model import PlanningModel
+
+SIZES = [10, 100, 300]  # Blocks of 100 rows
+
+
+def legacy_route_continuity(bus_planning):
+    """The row-by-row check that `check_route_continuity` used before."""
+    issues = []
+    for i in range(len(bus_planning) - 1):
+        current_row = bus_planning.iloc[i]
+        next_row = bus_planning.iloc[i + 1]
+        if (current_row['omloop nummer'] == next_row['omloop nummer']) & (current_row['eindlocatie'] != next_row['startlocatie']):
+            issues.append({
+                'omloop nummer': current_row['omloop nummer'],
+                'current end location': current_row['eindlocatie'],
+                'next start location': next_row['startlocatie'],
+            })
+    return pd.DataFrame(issues)
+
+
+def main():
+    for n_blocks in SIZES:
+        model = PlanningModel.from_frame(make_planning(n_blocks, error_rate=0.01))
+
+        start = time.perf_counter()
+        expected = legacy_route_continuity(model.frame)
+        legacy_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        issues = check_route_continuity(model)
+        vectorized_seconds = time.perf_counter() - start
+
+        # Every location issue of the loop is found, the rest are overlaps or gaps
+        mismatches = issues[issues['current end location'] != issues['next start location']]
+        assert np.array_equal(mismatches['omloop nummer'].to_numpy(), expected['omloop nummer'].to_numpy())
+
+        print(
+            f'{len(model):>7} rows: loop {legacy_seconds * 1000:9.1f} ms, '
+            f'vectorized {vectorized_seconds * 1000:7.2f} ms, '
+            f'speedup {legacy_seconds / vectorized_seconds:7.0f}x, '
+            f'{len(mismatches)} location issues, {len(issues) - len(mismatches)} time issues'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""Render time of the Gantt chart against the original per-trip bars.
+
+Run from the repository root with:
+
+    python -m benchmarks.bench_gantt
+
+Both charts are rendered to PNG, as the app does before showing them. Above
+DETAIL_BLOCKS blocks the new chart aggregates the bars into an image. The
+original renderer is only timed up to LEGACY_MAX_BLOCKS blocks, because it
+takes minutes beyond that.
+"""
+import time
+
+import numpy as np
+
+from benchmarks.synthetic import make_planning
+from bus_checker.model import PlanningModel
+from bus_checker.plots import _subplots, figure_png, plot_schedule_from_excel, schedule_bars, schedule_raster
+
+SIZES = [10, 100, 500]  # Blocks of 100 rows
+LEGACY_MAX_BLOCKS = 100
+
+
+def legacy_schedule(model):
+    """The per-trip `barh` loop that `plot_schedule_from_excel` used before."""
+    bus_planning = model.frame[['omloop nummer', 'activiteit', 'buslijn']].assign(
+        start=model.start / 60, duration=(model.duration / 60).clip(min=0.05)
+    )
+    color_map = {'400.0': 'blue', '401.0': 'yellow', 'materiaal rit': 'green', 'idle': 'red', 'opladen': 'orange'}
+    bus_planning['buslijn'] = bus_planning['buslijn'].astype(str)
+    bus_planning['color'] = bus_planning.apply(
+        lambda row: color_map.get(row['buslijn'], color_map.get(row['activiteit'], 'gray')), axis=1
+    )
+    fig, ax = _subplots(figsize=(12, 6))
+    for omloop_index, omloop in enumerate(bus_planning['omloop nummer'].unique()):
+        trips = bus_planning[bus_planning['omloop nummer'] == omloop]
+        for _, trip in trips.iterrows():
+            ax.barh(omloop_index, trip['duration'], left=trip['start'], color=trip['color'], edgecolor='black')
+    return fig
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    # Import matplotlib and build its font cache before timing
+    figure_png(plot_schedule_from_excel(PlanningModel.from_frame(make_planning(1))))
+
+    for n_blocks in SIZES:
+        model = PlanningModel.from_frame(make_planning(n_blocks))
+
+        # Every row is a bar, and the aggregated chart only uses the colors of the bars
+        bars = schedule_bars(model)
+        raster, _ = schedule_raster(bars, model.n_blocks)
+        assert np.all(bars['end'] > bars['start'])
+        assert set(np.unique(raster)) <= set(np.unique(bars['color'])) | {-1}
+
+        batched = timed(lambda: figure_png(plot_schedule_from_excel(model)))
+        if n_blocks <= LEGACY_MAX_BLOCKS:
+            legacy = timed(lambda: figure_png(legacy_schedule(model)))
+            comparison = f'per trip {legacy * 1000:9.1f} ms, speedup {legacy / batched:5.0f}x'
+        else:
+            comparison = 'per trip not timed'
+
+        print(f'{n_blocks:>4} blocks, {len(model):>6} rows: batched {batched * 1000:7.1f} ms, {comparison}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""Benchmark of re-validating an edited planning incrementally against a full check.
+
+Run from the repository root with:
+
+    python -m benchmarks.bench_incremental
+
+One row of one block is edited, as a planner would before uploading the
+planning again. The incremental result must equal the full check.
+"""
+import time
+
+import pandas as pd
+
+from benchmarks.synthetic import make_distance_matrix, make_planning
+from bus_checker.checks import check_battery_status, check_route_continuity, check_travel_time, planning_distances
+from bus_checker.incremental import IncrementalValidator, block_digests
+from bus_checker.model import PlanningModel
+from bus_checker.routes import DistanceLookup
+
+SIZES = [100, 500, 1000]  # Blocks of 100 rows
+PARAMETERS = (90, 10, 1.2)
+
+
+def run_checks(validator, model, distances, lookup):
+    """The per-block checks of the app, run through the validator."""
+    digests = block_digests(model)
+    return [
+        validator.run('battery', PARAMETERS, check_battery_status, model, digests, PARAMETERS, (distances,)),
+        validator.run('continuity', (), check_route_continuity, model, digests),
+        validator.run('travel time', (), check_travel_time, model, digests, (lookup,)),
+    ]
+
+
+def main():
+    lookup = DistanceLookup(make_distance_matrix())
+    for n_blocks in SIZES:
+        planning = make_planning(n_blocks)
+        model = PlanningModel.from_frame(planning)
+        validator = IncrementalValidator()
+        run_checks(validator, model, planning_distances(model, lookup), lookup)
+
+        # Move the end of a trip in the middle of the planning
+        edited = planning.copy()
+        row = edited.index[edited['omloop nummer'] == n_blocks // 2][10]
+        edited.loc[row, 'eindtijd'] = '23:59:00'
+        model = PlanningModel.from_frame(edited)
+        distances = planning_distances(model, lookup)
+
+        start = time.perf_counter()
+        expected = [
+            check_battery_status(model, distances, *PARAMETERS), check_route_continuity(model),
+            check_travel_time(model, lookup),
+        ]
+        full_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        results = run_checks(validator, model, distances, lookup)
+        incremental_seconds = time.perf_counter() - start
+
+        for result, full in zip(results, expected):
+            pd.testing.assert_frame_equal(result, full.reset_index(drop=True))
+
+        print(
+            f'{len(model):>7} rows: full {full_seconds * 1000:7.1f} ms, '
+            f'incremental {incremental_seconds * 1000:6.1f} ms '
+            f'({validator.checked_blocks("battery")} of {model.n_blocks} blocks checked)'
+        )
+
+
+if __name__ == '__main__':
+    main()
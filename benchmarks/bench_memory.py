@@ -0,0 +1,49 @@
+"""Benchmark of the memory of the loaded data in its compact column types.
+
+Run from the repository root with:
+
+    python -m benchmarks.bench_memory
+
+The synthetic workbooks are written to Excel and read back, so the frames
+start in the column types of `pd.read_excel` as an upload does.
+"""
+import io
+import time
+
+import pandas as pd
+
+from benchmarks.synthetic import make_dataset
+from bus_checker.loading import read_planning, read_timetable
+from bus_checker.schema import memory_report
+
+SIZES = [10, 100, 500]  # Blocks of 100 rows
+
+
+def _workbook(sheets):
+    """An .xlsx workbook in memory with the given sheets."""
+    with io.BytesIO() as buffer:
+        with pd.ExcelWriter(buffer) as writer:
+            for name, frame in sheets.items():
+                frame.to_excel(writer, sheet_name=name, index=False)
+        return buffer.getvalue()
+
+
+def main():
+    for n_blocks in SIZES:
+        planning, timetable, distance_matrix = make_dataset(n_blocks)
+        planning_file = _workbook({'Sheet1': planning})
+        timetable_file = _workbook({'Dienstregeling': timetable, 'Afstandsmatrix': distance_matrix})
+
+        start = time.perf_counter()
+        model = read_planning(io.BytesIO(planning_file))
+        timetable, distance_matrix = read_timetable(io.BytesIO(timetable_file))
+        seconds = time.perf_counter() - start
+
+        report = memory_report({'bus planning': model, 'timetable': timetable, 'distance matrix': distance_matrix})
+        before, after = report['as read (MB)'].sum(), report['stored (MB)'].sum()
+        print(f'{len(model):>6} rows: {before:7.2f} MB as read, {after:6.2f} MB stored '
+              f'({before / after:4.1f}x smaller), loaded in {seconds * 1000:8.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
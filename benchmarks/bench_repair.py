@@ -0,0 +1,48 @@
+"""Benchmark of the charging repairs on plannings whose blocks run out of battery.
+
+Run from the repository root with:
+
+    python -m benchmarks.bench_repair
+
+The charging sessions of the synthetic plannings are turned into idle time, so
+most blocks fail the battery check. After the repairs, the repaired planning is
+checked again in full to confirm that the repaired blocks pass.
+"""
+import time
+
+import numpy as np
+
+from benchmarks.synthetic import make_distance_matrix, make_planning
+from bus_checker.checks import check_battery_status, planning_distances
+from bus_checker.model import PlanningModel
+from bus_checker.repair import repair_battery
+
+SIZES = [10, 100, 300]  # Blocks of 100 rows
+SOH, MIN_SOC, CONSUMPTION_PER_KM = 90, 10, 1.6
+
+
+def main():
+    distance_matrix = make_distance_matrix()
+    for n_blocks in SIZES:
+        planning = make_planning(n_blocks)
+        planning.loc[planning['activiteit'] == 'opladen', 'activiteit'] = 'idle'
+        model = PlanningModel.from_frame(planning)
+
+        start = time.perf_counter()
+        repair = repair_battery(model, distance_matrix, SOH, MIN_SOC, CONSUMPTION_PER_KM)
+        seconds = time.perf_counter() - start
+
+        repaired = PlanningModel.from_frame(repair.planning)
+        failing = check_battery_status(
+            repaired, planning_distances(repaired, distance_matrix), SOH, MIN_SOC, CONSUMPTION_PER_KM
+        )
+        assert not np.isin(repair.repaired, failing.get('omloop nummer', [])).any()
+
+        print(
+            f'{len(model):>6} rows: {len(repair.repairs):>5} repairs in {seconds * 1000:8.1f} ms, '
+            f'{len(repair.repaired)} blocks repaired, {len(repair.unrepaired)} not repairable'
+        )
+
+
+if __name__ == '__main__':
+    main()
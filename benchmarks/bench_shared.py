@@ -0,0 +1,82 @@
+"""Memory and load time of one timetable used by many sessions at once.
+
+Run from the repository root with:
+
+    python -m benchmarks.bench_shared
+
+The timetable of a planning of 500 blocks is written to an .xlsx workbook.
+Every session reads it, compiles the distance matrix and indexes the
+timetable, first each with its own copy and then through one
+SharedTimetableCache. All sessions start at the same time, as when planners
+open the app together. The shared copy is then checked to be read-only.
+"""
+import io
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from benchmarks.synthetic import make_dataset
+from bus_checker.loading import read_timetable
+from bus_checker.shared import SharedTimetable, SharedTimetableCache
+
+SESSIONS = 30
+N_BLOCKS = 500
+
+
+def own_copy(content):
+    """A session that parses and indexes the timetable by itself."""
+    timetable, distance_matrix = read_timetable(io.BytesIO(content))
+    copy = SharedTimetable(None, timetable, distance_matrix)
+    # The lookup and the index are built on first use
+    copy.distance_lookup, copy.timetable_index
+    return copy
+
+
+def shared_copy(cache, session, content):
+    """A session that uses the shared timetable."""
+    shared = cache.acquire(f'session {session}', content)
+    shared.distance_lookup, shared.timetable_index
+    return shared
+
+
+def main():
+    _, timetable, distance_matrix = make_dataset(N_BLOCKS)
+    with io.BytesIO() as buffer:
+        with pd.ExcelWriter(buffer) as writer:
+            timetable.to_excel(writer, sheet_name='Dienstregeling', index=False)
+            distance_matrix.to_excel(writer, sheet_name='Afstandsmatrix', index=False)
+        content = buffer.getvalue()
+
+    with ThreadPoolExecutor(max_workers=SESSIONS) as executor:
+        start = time.perf_counter()
+        copies = list(executor.map(own_copy, [content] * SESSIONS))
+        own_seconds = time.perf_counter() - start
+        own_memory = sum(copy.memory() for copy in copies)
+
+        cache = SharedTimetableCache()
+        start = time.perf_counter()
+        shared = list(executor.map(shared_copy, [cache] * SESSIONS, range(SESSIONS), [content] * SESSIONS))
+        shared_seconds = time.perf_counter() - start
+        shared_memory = sum({id(copy): copy.memory() for copy in shared}.values())
+
+    # Writing a value of the shared data raises, and changing the columns of a frame only changes that session's copy
+    entry = shared[0]
+    for frame in (entry.timetable, entry.distance_matrix, entry.timetable_index.trips, entry.distance_lookup.routes):
+        try:
+            frame.iloc[0, 0] = frame.iloc[-1, 0]
+        except ValueError:
+            continue
+        raise AssertionError('A value of a shared frame could be changed')
+    own_timetable = entry.timetable
+    own_timetable['changed'] = True
+    assert 'changed' not in shared[1].timetable.columns
+
+    print(f'{SESSIONS} sessions, {len(timetable)} trips')
+    print(f'  own copies:  {own_memory / 1024 ** 2:8.2f} MB, loaded in {own_seconds:6.2f} s')
+    print(f'  shared:      {shared_memory / 1024 ** 2:8.2f} MB, loaded in {shared_seconds:6.2f} s, '
+          f'{cache.loads} parsed, {cache.hits} reused, {cache.sessions(shared[0].digest)} sessions sharing')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""Benchmark of the import time of the validation code.
+
+Run from the repository root with:
+
+    python -m benchmarks.bench_startup
+
+Every import is timed in a fresh interpreter, which is what a worker process
+or a run of the command line tool pays before it can start validating. The
+last line is the set of libraries the app used to import before the checks
+were available, for comparison.
+"""
+import statistics
+import subprocess
+import sys
+
+RUNS = 5
+
+IMPORTS = {
+    'bus_checker.checks': 'import bus_checker.checks',
+    'bus_checker.cli': 'import bus_checker.cli',
+    'bus_checker.plots': 'import bus_checker.plots',
+    'streamlit + pandas + matplotlib + seaborn': 'import streamlit, pandas, matplotlib.pyplot, seaborn',
+}
+
+# Libraries that must not be loaded by the validation code
+PLOTTING_MODULES = ['matplotlib', 'seaborn', 'streamlit']
+
+
+def import_seconds(statement):
+    """Time a single import statement in a new interpreter."""
+    code = (
+        'import time\n'
+        'start = time.perf_counter()\n'
+        f'{statement}\n'
+        'print(time.perf_counter() - start)\n'
+    )
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout
+    return float(output)
+
+
+def loaded_plotting_modules(statement):
+    """Plotting or UI libraries loaded as a side effect of an import statement."""
+    code = f'import sys\n{statement}\nprint(" ".join(sorted(set(sys.modules) & set({PLOTTING_MODULES!r}))))\n'
+    return subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout.split()
+
+
+def main():
+    for name, statement in IMPORTS.items():
+        seconds = statistics.median(import_seconds(statement) for _ in range(RUNS))
+        print(f'{name:<42} {seconds * 1000:8.1f} ms')
+
+    for name in ['bus_checker.checks', 'bus_checker.cli', 'bus_checker.plots']:
+        loaded = loaded_plotting_modules(IMPORTS[name])
+        assert not loaded, f'{name} imports {loaded}'
+
+
+if __name__ == '__main__':
+    main()
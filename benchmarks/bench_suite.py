@@ -0,0 +1,246 @@
+"""Benchmark suite of the loading, checks, KPIs and plots at several scales.
+
+Run from the repository root with:
+
+    python -m benchmarks.bench_suite [--sizes 10 100 500] [--repeat 3] [--memory]
+
+For every size a synthetic planning, timetable and distance matrix are
+generated and written to workbooks. Every step of a validation is timed with
+the RunProfiler of the app: reading the workbooks with `pd.read_excel`,
+building the lookups, every KPI and check, the parameter sweep and rendering
+every plot to PNG. The median of the repeats is reported.
+
+The results are stored as JSON in benchmarks/results, with the versions of
+the libraries and the commit they were measured on. Every run is compared
+with the previous stored run, or with the run given with --baseline, and
+steps that became more than --threshold times slower are marked.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import make_dataset, write_dataset
+from bus_checker.checks import planning_distances
+from bus_checker.kpis import fleet_kpis
+from bus_checker.loading import read_planning, read_timetable
+from bus_checker.plots import (
+    figure_png,
+    plot_activity_bar_chart,
+    plot_activity_pie_chart,
+    plot_charging_heatmap,
+    plot_feasibility_heatmap,
+    plot_schedule_from_excel,
+    plot_soc_series,
+)
+from bus_checker.profiling import RunProfiler
+from bus_checker.routes import DistanceLookup
+from bus_checker.runner import available_cpus, validation_tasks
+from bus_checker.soc import soc_series
+from bus_checker.sweep import battery_sweep
+from bus_checker.timetable import TimetableIndex
+
+SIZES = [10, 100, 500]  # Blocks
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+
+# Parameters of the checks, the defaults of the sliders in the app
+SOH, MIN_SOC, CONSUMPTION_PER_KM = 90, 10, 1.6
+
+PLOTS = {
+    'activity pie chart': plot_activity_pie_chart,
+    'activity bar chart': plot_activity_bar_chart,
+}
+
+
+def run_once(profiler, planning_path, timetable_path):
+    """Runs every step of a validation once, measured by the profiler."""
+    with profiler.step('read_excel bus planning', 'load') as step:
+        model = read_planning(planning_path)
+        step.rows = len(model)
+    with profiler.step('read_excel timetable', 'load') as step:
+        timetable, distance_matrix = read_timetable(timetable_path)
+        step.rows = len(timetable)
+
+    rows = len(model)
+    with profiler.step('distance lookup', 'prepare', rows):
+        lookup = DistanceLookup(distance_matrix)
+        distances = planning_distances(model, lookup)
+    with profiler.step('timetable index', 'prepare', len(timetable)):
+        index = TimetableIndex(timetable)
+
+    tasks = validation_tasks(model, index, lookup, distances, SOH, MIN_SOC, CONSUMPTION_PER_KM)
+    for name, (function, args) in tasks.items():
+        with profiler.step(name, 'kpi' if name == 'kpis' else 'check', rows):
+            function(*args)
+
+    with profiler.step('parameter sweep', 'check', rows):
+        sweep = battery_sweep(model, distances)
+
+    with profiler.step('Gantt chart', 'plot', rows):
+        figure_png(plot_schedule_from_excel(model))
+    with profiler.step('charging heatmap', 'plot', rows):
+        figure_png(plot_charging_heatmap(model))
+    with profiler.step('battery level chart', 'plot', rows):
+        figure_png(plot_soc_series(soc_series(model, distances, SOH, CONSUMPTION_PER_KM), MIN_SOC))
+
+    # The activity charts read from the KPIs of the planning
+    kpis = fleet_kpis(model)
+    for name, plot in PLOTS.items():
+        with profiler.step(name, 'plot', rows):
+            figure_png(plot(kpis))
+    with profiler.step('feasibility heatmap', 'plot', sweep.lowest_soc.size):
+        figure_png(plot_feasibility_heatmap(sweep, MIN_SOC))
+
+
+def benchmark(sizes, rows_per_block, repeat, trace_memory):
+    """
+    Times every step of a validation for every size.
+
+    Args:
+        sizes (list): Numbers of blocks.
+        rows_per_block (int): Number of activities per block.
+        repeat (int): Number of measured runs per size, the median is reported.
+        trace_memory (bool): Also measure the peak memory of every step.
+
+    Returns:
+        list: A dict per size and step with the median and fastest time in seconds.
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        # Import matplotlib and build its font cache before timing
+        planning_path, timetable_path = write_dataset(directory, *make_dataset(1, rows_per_block))
+        run_once(RunProfiler(capture=None), planning_path, timetable_path)
+
+        for n_blocks in sizes:
+            planning_path, timetable_path = write_dataset(directory, *make_dataset(n_blocks, rows_per_block))
+
+            records = defaultdict(list)
+            for _ in range(repeat):
+                with RunProfiler(trace_memory, capture=None) as profiler:
+                    run_once(profiler, planning_path, timetable_path)
+                for record in profiler.records:
+                    records[record.name].append(record)
+
+            for name, measured in records.items():
+                seconds = [record.seconds for record in measured]
+                peaks = [record.peak_memory for record in measured if record.peak_memory is not None]
+                results.append({
+                    'blocks': n_blocks,
+                    'rows': measured[0].rows,
+                    'name': name,
+                    'kind': measured[0].kind,
+                    'seconds': float(np.median(seconds)),
+                    'fastest': min(seconds),
+                    'peak_memory': max(peaks) if peaks else None,
+                })
+    return results
+
+
+def environment():
+    """Versions and hardware the results were measured with."""
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'machine': platform.machine(),
+        'cpus': available_cpus(),
+    }
+
+
+def latest_result(directory):
+    """Path of the most recent stored run, None if there is none."""
+    try:
+        names = sorted(name for name in os.listdir(directory) if name.endswith('.json'))
+    except FileNotFoundError:
+        return None
+    return os.path.join(directory, names[-1]) if names else None
+
+
+def compare(results, baseline, threshold):
+    """
+    Prints the results next to a baseline and marks regressions.
+
+    Args:
+        results (list): Results of this run, see benchmark.
+        baseline (list): Results of an earlier run.
+        threshold (float): Ratio above which a step counts as slower.
+
+    Returns:
+        int: Number of steps that became slower.
+    """
+    earlier = {(result['blocks'], result['name']): result['seconds'] for result in baseline}
+    slower = 0
+    for result in results:
+        line = f"{result['blocks']:>5} blocks {result['name']:<25} {result['seconds'] * 1000:10.1f} ms"
+        before = earlier.get((result['blocks'], result['name']))
+        if before:
+            ratio = result['seconds'] / before
+            line += f'   baseline {before * 1000:10.1f} ms  {ratio:5.2f}x'
+            # Steps of a few milliseconds vary too much between runs to flag them
+            if ratio > threshold and result['seconds'] - before > 0.005:
+                line += '  SLOWER'
+                slower += 1
+        if result['peak_memory'] is not None:
+            line += f"   peak {result['peak_memory'] / 1024 ** 2:7.1f} MB"
+        print(line)
+    return slower
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Time the loading, checks, KPIs and plots on synthetic plannings.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES, help='Numbers of blocks to benchmark.')
+    parser.add_argument('--rows-per-block', type=int, default=100, help='Number of activities per block.')
+    parser.add_argument('--repeat', type=int, default=3, help='Number of runs per size, the median is reported.')
+    parser.add_argument('--memory', action='store_true', help='Also measure the peak memory of every step.')
+    parser.add_argument('--results-dir', default=RESULTS_DIR, help='Directory the results are stored in.')
+    parser.add_argument('--baseline', help='Results to compare with, by default the previous run.')
+    parser.add_argument('--threshold', type=float, default=1.2, help='Slowdown ratio that counts as a regression.')
+    parser.add_argument('--fail-on-regression', action='store_true', help='Exit with status 1 if a step is slower.')
+    args = parser.parse_args(argv)
+
+    baseline_path = args.baseline or latest_result(args.results_dir)
+    results = benchmark(args.sizes, args.rows_per_block, args.repeat, args.memory)
+
+    settings = {'rows_per_block': args.rows_per_block, 'repeat': args.repeat, 'memory': args.memory}
+
+    baseline = []
+    if baseline_path is not None:
+        with open(baseline_path) as file:
+            stored = json.load(file)
+        baseline = stored['results']
+        print(f'Compared with {baseline_path}')
+        # Tracing memory slows every step down, and larger blocks change every time
+        if stored.get('settings', settings) != settings:
+            print(f"The baseline was measured with other settings: {stored['settings']}")
+    slower = compare(results, baseline, args.threshold)
+
+    os.makedirs(args.results_dir, exist_ok=True)
+    timestamp = datetime.datetime.now(datetime.timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+    path = os.path.join(args.results_dir, f'{timestamp}.json')
+    with open(path, 'w') as file:
+        json.dump(
+            {'timestamp': timestamp, 'environment': environment(), 'settings': settings, 'results': results},
+            file, indent=2,
+        )
+    print(f'Stored the results in {path}')
+
+    return 1 if slower and args.fail_on_regression else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
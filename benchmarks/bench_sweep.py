@@ -0,0 +1,47 @@
+"""Benchmark of the batched parameter sweep against one battery check per combination.
+
+Run from the repository root with:
+
+    python -m benchmarks.bench_sweep
+"""
+import time
+
+import numpy as np
+
+from benchmarks.synthetic import make_distance_matrix, make_planning
+from bus_checker.checks import check_battery_status, planning_distances
+from bus_checker.model import PlanningModel
+from bus_checker.sweep import CONSUMPTION_VALUES, SOH_VALUES, battery_sweep
+
+SIZES = [10, 100, 300]  # Blocks of 100 rows
+MIN_SOC = 10
+
+
+def main():
+    distance_matrix = make_distance_matrix()
+    for n_blocks in SIZES:
+        model = PlanningModel.from_frame(make_planning(n_blocks))
+        distances = planning_distances(model, distance_matrix)
+
+        start = time.perf_counter()
+        expected = np.array([
+            [check_battery_status(model, distances, SOH, MIN_SOC, consumption).empty for consumption in CONSUMPTION_VALUES]
+            for SOH in SOH_VALUES
+        ])
+        loop_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        feasible = battery_sweep(model, distances).feasible(MIN_SOC)
+        sweep_seconds = time.perf_counter() - start
+
+        assert np.array_equal(feasible, expected)
+
+        print(
+            f'{len(model):>6} rows, {feasible.size} combinations: per combination {loop_seconds * 1000:8.1f} ms, '
+            f'batched {sweep_seconds * 1000:7.1f} ms, speedup {loop_seconds / sweep_seconds:5.1f}x, '
+            f'{feasible.sum()} feasible'
+        )
+
+
+if __name__ == '__main__':
+    main()
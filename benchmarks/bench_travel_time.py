@@ -0,0 +1,69 @@
+"""Benchmark of the vectorized travel time check against the original loop.
+
+Run from the repository root with:
+
+    python -m benchmarks.bench_travel_time
+
+The distance matrix is compiled once, as the app and the command line tool do,
+and reused for every planning size.
+"""
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import make_distance_matrix, make_planning
+from bus_checker.checks import check_travel_time
+from bus_checker.model import MINUTES_PER_DAY, PlanningModel, format_minutes
+from bus_checker.routes import DistanceLookup
+
+SIZES = [10, 100, 500]  # Blocks of 100 rows
+
+
+def legacy_travel_time(model, distance_matrix):
+    """The merge and row loop that `check_travel_time` used before."""
+    # The planning stores its lines as a categorical, the original merge used the float lines of read_excel
+    bus_planning = model.frame[['omloop nummer', 'startlocatie', 'eindlocatie']].astype(object).assign(
+        buslijn=model.frame['buslijn'].astype(float),
+        difference_in_minutes=model.duration,
+        starttijd=format_minutes(model.start % MINUTES_PER_DAY),
+    )
+    merged_df = pd.merge(bus_planning, distance_matrix, on=['startlocatie', 'eindlocatie', 'buslijn'], how='inner')
+    issues = []
+    for _, row in merged_df.iterrows():
+        if not (row['min reistijd in min'] <= row['difference_in_minutes'] <= row['max reistijd in min']):
+            issues.append({'omloop nummer': row['omloop nummer'], 'reistijd': row['difference_in_minutes']})
+    return pd.DataFrame(issues)
+
+
+def main():
+    # Tighten the bounds of line 400 so some trips fall outside of them
+    distance_matrix = make_distance_matrix()
+    distance_matrix.loc[distance_matrix['buslijn'] == 400, 'max reistijd in min'] -= 2
+
+    start = time.perf_counter()
+    lookup = DistanceLookup(distance_matrix)
+    print(f'compiled {len(lookup)} routes in {(time.perf_counter() - start) * 1000:.2f} ms')
+
+    for n_blocks in SIZES:
+        model = PlanningModel.from_frame(make_planning(n_blocks))
+
+        start = time.perf_counter()
+        expected = legacy_travel_time(model, distance_matrix)
+        legacy_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        issues = check_travel_time(model, lookup)
+        vectorized_seconds = time.perf_counter() - start
+
+        assert np.array_equal(np.sort(issues['reistijd'].to_numpy()), np.sort(expected['reistijd'].to_numpy()))
+
+        print(
+            f'{len(model):>7} rows: loop {legacy_seconds * 1000:9.1f} ms, '
+            f'vectorized {vectorized_seconds * 1000:7.2f} ms, '
+            f'speedup {legacy_seconds / vectorized_seconds:7.0f}x, {len(issues)} issues'
+        )
+
+
+if __name__ == '__main__':
+    main()
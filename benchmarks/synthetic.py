@@ -0,0 +1,167 @@
+"""Synthetic bus plannings, timetables and distance matrices for benchmarks.
+
+The generated data follows the schema of the uploads the app expects: lines
+400 and 401 between Eindhoven Airport ('ehvapt') and Eindhoven Station
+('ehvbst'), deadhead trips and charging at the garage ('ehvgar'), and idle
+time between trips.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+SERVICE_DAY = pd.Timestamp('2024-06-03')
+
+# Route: (start, end, line) -> (distance in meters, min travel time, max travel time)
+ROUTES = {
+    ('ehvapt', 'ehvbst', 400): (10_100, 20, 24),
+    ('ehvbst', 'ehvapt', 400): (10_200, 20, 24),
+    ('ehvapt', 'ehvbst', 401): (10_900, 22, 26),
+    ('ehvbst', 'ehvapt', 401): (10_800, 22, 26),
+    ('ehvbst', 'ehvgar', None): (2_100, 4, 6),
+    ('ehvgar', 'ehvbst', None): (2_100, 4, 6),
+    ('ehvapt', 'ehvgar', None): (8_000, 15, 18),
+    ('ehvgar', 'ehvapt', None): (8_000, 15, 18),
+    ('ehvapt', 'ehvbst', None): (10_100, 20, 24),
+    ('ehvbst', 'ehvapt', None): (10_200, 20, 24),
+}
+
+PLANNING_COLUMNS = [
+    'startlocatie', 'eindlocatie', 'starttijd', 'eindtijd', 'activiteit',
+    'buslijn', 'energieverbruik', 'starttijd datum', 'eindtijd datum', 'omloop nummer',
+]
+
+
+def make_distance_matrix():
+    """The 'Afstandsmatrix' sheet for all generated routes."""
+    return pd.DataFrame([
+        {
+            'startlocatie': start, 'eindlocatie': end,
+            'min reistijd in min': min_time, 'max reistijd in min': max_time,
+            'afstand in meters': distance, 'buslijn': np.nan if line is None else line,
+        }
+        for (start, end, line), (distance, min_time, max_time) in ROUTES.items()
+    ])
+
+
+def _block_rows(rows_per_block, rng):
+    """Activities of a single block as tuples (start, end, activity, line, start minute, end minute)."""
+    rows = []
+    minute = int(rng.integers(5 * 60, 8 * 60))
+    location = 'ehvbst'
+
+    def add(end_location, activity, line, minutes):
+        nonlocal minute, location
+        rows.append((location, end_location, activity, line, minute, minute + minutes))
+        minute += minutes
+        location = end_location
+
+    while len(rows) < rows_per_block:
+        line = int(rng.choice([400, 401]))
+        destination = 'ehvapt' if location == 'ehvbst' else 'ehvbst'
+        _, min_time, max_time = ROUTES[(location, destination, line)]
+        add(destination, 'dienst rit', line, int(rng.integers(min_time, max_time + 1)))
+        add(location, 'idle', None, int(rng.integers(2, 15)))
+
+        # Charge at the garage after roughly every tenth trip
+        if rng.random() < 0.1:
+            back_to = location
+            add('ehvgar', 'materiaal rit', None, ROUTES[(location, 'ehvgar', None)][1])
+            add('ehvgar', 'opladen', None, int(rng.integers(15, 45)))
+            add(back_to, 'materiaal rit', None, ROUTES[('ehvgar', back_to, None)][1])
+
+    return rows[:rows_per_block]
+
+
+def make_planning(n_blocks, rows_per_block=100, error_rate=0.0, seed=0):
+    """
+    Generates a bus planning in the schema of the uploaded planning workbook.
+
+    Args:
+        n_blocks (int): Number of blocks ('omloop nummer').
+        rows_per_block (int): Number of activities per block.
+        error_rate (float): Fraction of rows whose start location is changed, to create continuity issues.
+        seed (int): Seed of the random generator.
+
+    Returns:
+        DataFrame: The bus planning.
+    """
+    rng = np.random.default_rng(seed)
+    records = []
+    for block in range(1, n_blocks + 1):
+        for start, end, activity, line, start_minute, end_minute in _block_rows(rows_per_block, rng):
+            records.append((start, end, activity, line, start_minute, end_minute, block))
+
+    frame = pd.DataFrame(records, columns=['startlocatie', 'eindlocatie', 'activiteit', 'buslijn', 'start', 'end', 'omloop nummer'])
+    frame['buslijn'] = frame['buslijn'].astype(float)
+
+    if error_rate:
+        wrong = rng.random(len(frame)) < error_rate
+        frame.loc[wrong, 'startlocatie'] = 'ehvgar'
+
+    start = SERVICE_DAY + pd.to_timedelta(frame.pop('start'), unit='min')
+    end = SERVICE_DAY + pd.to_timedelta(frame.pop('end'), unit='min')
+    frame['starttijd'] = start.dt.strftime('%H:%M:%S')
+    frame['eindtijd'] = end.dt.strftime('%H:%M:%S')
+    frame['starttijd datum'] = start
+    frame['eindtijd datum'] = end
+    frame['energieverbruik'] = np.where(frame['activiteit'] == 'opladen', -50.0, 10.0)
+    return frame[PLANNING_COLUMNS]
+
+
+def make_timetable(planning):
+    """
+    The 'Dienstregeling' sheet with every regular trip of a planning.
+
+    Args:
+        planning (DataFrame): A generated bus planning.
+
+    Returns:
+        DataFrame: The timetable.
+    """
+    rides = planning[planning['activiteit'] == 'dienst rit']
+    return pd.DataFrame({
+        'startlocatie': rides['startlocatie'].to_numpy(),
+        'vertrektijd': rides['starttijd'].str[:5].to_numpy(),
+        'eindlocatie': rides['eindlocatie'].to_numpy(),
+        'buslijn': rides['buslijn'].astype(int).to_numpy(),
+    })
+
+
+def make_dataset(n_blocks, rows_per_block=100, error_rate=0.0, seed=0):
+    """
+    Generates a bus planning with its timetable and distance matrix.
+
+    Args:
+        n_blocks (int): Number of blocks ('omloop nummer').
+        rows_per_block (int): Number of activities per block.
+        error_rate (float): Fraction of rows whose start location is changed, to create continuity issues.
+        seed (int): Seed of the random generator.
+
+    Returns:
+        tuple: The bus planning, the timetable ('Dienstregeling') and the distance matrix ('Afstandsmatrix').
+    """
+    planning = make_planning(n_blocks, rows_per_block, error_rate, seed)
+    return planning, make_timetable(planning), make_distance_matrix()
+
+
+def write_dataset(directory, planning, timetable, distance_matrix):
+    """
+    Writes a generated dataset to the two workbooks users upload in the app.
+
+    Args:
+        directory (str): Directory of the workbooks.
+        planning (DataFrame): The bus planning.
+        timetable (DataFrame): The timetable.
+        distance_matrix (DataFrame): The distance matrix.
+
+    Returns:
+        tuple: Paths of the bus planning and the timetable workbook.
+    """
+    planning_path = os.path.join(directory, f'planning_{planning["omloop nummer"].nunique()}.xlsx')
+    timetable_path = os.path.join(directory, f'timetable_{len(timetable)}.xlsx')
+    planning.to_excel(planning_path, index=False)
+    with pd.ExcelWriter(timetable_path) as writer:
+        timetable.to_excel(writer, sheet_name='Dienstregeling', index=False)
+        distance_matrix.to_excel(writer, sheet_name='Afstandsmatrix', index=False)
+    return planning_path, timetable_path
@@ -0,0 +1,5 @@
+"""Validation logic for the Bus Planning Checker.
+
+The modules in this package contain the computational parts of the app and do
+not depend on Streamlit, so they can be used from scripts and worker processes.
+"""
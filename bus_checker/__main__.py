@@ -0,0 +1,5 @@
+import sys
+
+from bus_checker.cli import main
+
+sys.exit(main())
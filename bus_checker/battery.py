@@ -0,0 +1,128 @@
+"""Vectorized battery state of charge (SOC) simulation.
+
+The simulation reproduces the battery model of the Bus Planning Checker:
+every block ('omloop nummer') starts with a full battery, driving and idling
+consume energy, and charging adds energy at a fast rate up to 90% and at a
+slow rate beyond that, capped at the maximum capacity.
+
+Instead of walking the rows one by one, each block is cut into segments that
+end at a charging activity. Within a segment the battery level is a cumulative
+sum of the consumption, and only the charging steps are resolved in a loop,
+batched over all blocks at once. The number of loop iterations is therefore
+the largest number of charging sessions in a single block, not the number of rows.
+
+The simulation can also run for many battery capacities and consumption
+profiles at once, along a leading parameter axis, which is how parameter
+sweeps evaluate a full grid of scenarios in one batched computation.
+"""
+import numpy as np
+
+# Charging speeds for different battery levels
+CHARGING_SPEED_90 = 450 / 60  # Charging speed below 90% SOC in kWh per minute
+CHARGING_SPEED_10 = 60 / 60   # Charging speed above 90% SOC in kWh per minute
+
+# Idle activities consume minimal power
+IDLE_CONSUMPTION = 0.01
+
+# Location of the garage, where every block starts and where buses charge
+GARAGE = 'ehvgar'
+
+
+def _charge(level, charge_minutes, max_capacity):
+    """Apply a charging session to the battery levels at its start."""
+    with np.errstate(invalid='ignore'):
+        speed = np.where(level <= max_capacity * 0.9, CHARGING_SPEED_90, CHARGING_SPEED_10)
+    charged = np.minimum(level + speed * charge_minutes, max_capacity)
+    return np.maximum(charged, 0)
+
+
+def simulate_battery_levels(blocks, is_charging, consumption, charge_minutes, max_capacity):
+    """
+    Simulates the battery level after every activity for all blocks at once.
+
+    Rows are processed in the given order. A new block starts whenever the
+    block number differs from the one on the previous row, exactly like the
+    row-by-row simulation it replaces. A missing consumption value (NaN) makes
+    the battery level unknown for the rest of its block, as it did in the loop.
+
+    Passing a 2D `consumption` (one row per scenario) or a 1D `max_capacity`
+    (one value per scenario) simulates all scenarios at once; both are
+    broadcast against each other along the scenario axis.
+
+    Args:
+        blocks (array-like): Block number ('omloop nummer') per row.
+        is_charging (array-like): Boolean mask of charging ('opladen') rows.
+        consumption (array-like): Energy consumed per row in kWh, ignored for charging rows.
+        charge_minutes (array-like): Duration of every row in minutes, used for charging rows.
+        max_capacity (float or array-like): Maximum battery capacity in kWh.
+
+    Returns:
+        ndarray: Battery level in kWh after every row, with a leading scenario axis if scenarios were given.
+    """
+    blocks = np.asarray(blocks)
+    is_charging = np.asarray(is_charging, dtype=bool)
+    consumption = np.asarray(consumption, dtype=float)
+    charge_minutes = np.asarray(charge_minutes, dtype=float)
+    capacity = np.asarray(max_capacity, dtype=float)
+
+    # Scenarios along the first axis, a single scenario is simulated as a batch of one
+    batched = consumption.ndim == 2 or capacity.ndim == 1
+    n = len(blocks)
+    n_scenarios = np.broadcast_shapes(np.atleast_2d(consumption).shape[:1], capacity.reshape(-1).shape)[0]
+    used = np.broadcast_to(np.atleast_2d(consumption), (n_scenarios, n))
+    capacity = np.broadcast_to(capacity.reshape(-1, 1), (n_scenarios, 1))
+
+    if n == 0:
+        return np.empty((n_scenarios, 0) if batched else 0, dtype=float)
+
+    # A block starts where the block number changes, a segment starts at every
+    # block start and directly after every charging activity within a block
+    block_start = np.ones(n, dtype=bool)
+    block_start[1:] = blocks[1:] != blocks[:-1]
+    segment_start = block_start.copy()
+    segment_start[1:] |= is_charging[:-1]
+
+    segment_id = np.cumsum(segment_start) - 1
+    first_row = np.flatnonzero(segment_start)
+    last_row = np.r_[first_row[1:] - 1, n - 1]
+
+    # Position of every segment within its block (0 for the first segment)
+    block_id = np.cumsum(block_start) - 1
+    first_segment_of_block = segment_id[block_start]
+    segment_ordinal = (segment_id - first_segment_of_block[block_id])[first_row]
+
+    # Segmented cumulative consumption, charging rows consume nothing. NaN
+    # values are tracked separately so they do not leak into other segments.
+    used = np.where(is_charging, 0.0, used)
+    missing = np.isnan(used)
+    used[missing] = 0.0
+    total_used = np.cumsum(used, axis=1)
+    total_missing = np.cumsum(missing, axis=1)
+    offset_used = (total_used - used)[:, first_row]
+    offset_missing = (total_missing - missing)[:, first_row]
+    cumulative = total_used - offset_used[:, segment_id]
+    cumulative[(total_missing - offset_missing[:, segment_id]) > 0] = np.nan
+
+    # A segment continues the block of the previous segment when it does not
+    # start a new block; its starting level is the result of that charge
+    continues_block = np.zeros(len(first_row), dtype=bool)
+    continues_block[:-1] = ~block_start[first_row[1:]]
+
+    start_level = np.repeat(capacity, len(first_row), axis=1)
+    order = np.argsort(segment_ordinal, kind='stable')
+    bounds = np.searchsorted(segment_ordinal[order], np.arange(segment_ordinal.max() + 2))
+
+    # Resolve the charging sessions one ordinal at a time for all blocks and scenarios at once
+    for ordinal in range(len(bounds) - 1):
+        segments = order[bounds[ordinal]:bounds[ordinal + 1]]
+        segments = segments[continues_block[segments]]
+        if len(segments) == 0:
+            continue
+        rows = last_row[segments]
+        level_before = np.maximum(start_level[:, segments] - cumulative[:, rows], 0)
+        start_level[:, segments + 1] = _charge(level_before, charge_minutes[rows], capacity)
+
+    # Battery level after every row given the starting level of its segment
+    level = np.maximum(start_level[:, segment_id] - cumulative, 0)
+    level[:, is_charging] = _charge(level[:, is_charging], charge_minutes[is_charging], capacity)
+    return level if batched else level[0]
@@ -0,0 +1,274 @@
+"""Bus plannings built from the timetable.
+
+The trips of the 'Dienstregeling' sheet are assigned to buses greedily in
+order of departure, as in interval scheduling. A trip goes to a bus that can
+reach its start location in time, with a deadhead trip ('materiaal rit') if it
+is elsewhere, and that keeps enough battery to drive the trip and get back to
+the garage. Among those buses, one already at the start location that became
+free last is preferred, so buses wait as little as possible. A trip that no bus
+can take starts a new block at the garage. A bus that could not drive another
+trip of the timetable and still return afterwards is sent to the garage to
+charge until its battery is full.
+
+The fleet is kept in arrays with one element per bus, so the buses that can
+take a trip are found with a few NumPy operations per trip. The greedy pass
+only records the bus of every trip, where and when that bus was free before
+it, and how long it charges afterwards. The deadhead trips, charging sessions
+and idle time of all blocks are built from these arrays afterwards, at once.
+The battery level follows the battery check: a bus uses the idle consumption
+once for every idle activity it waits in. This replaces the fixed pattern of
+ten trips per charging cycle of the planning notebook, which looped over the
+trips row by row.
+
+Trips and deadhead trips take their maximum travel time from the distance
+matrix, so a planning built here passes the travel time check.
+"""
+import numpy as np
+import pandas as pd
+
+from bus_checker.battery import CHARGING_SPEED_10, CHARGING_SPEED_90, GARAGE, IDLE_CONSUMPTION
+from bus_checker.model import DATE_COLUMNS, MINUTES_PER_DAY, format_minutes
+from bus_checker.routes import DistanceLookup, route_keys
+from bus_checker.schema import parse_clock_minutes
+
+# Departures before this minute belong to the night after the service day
+SERVICE_DAY_START = 4 * 60
+
+# Date in the date columns of a built planning, fixed so the same timetable always gives the same planning
+DEFAULT_SERVICE_DAY = pd.Timestamp('2024-06-03')
+
+# Columns of a bus planning, in the order of the uploaded plannings
+PLANNING_COLUMNS = [
+    'startlocatie', 'eindlocatie', 'starttijd', 'eindtijd', 'activiteit', 'buslijn', 'energieverbruik',
+    'starttijd datum', 'eindtijd datum', 'omloop nummer',
+]
+
+
+def _deadhead_matrix(distance_matrix, locations):
+    """
+    Travel time and distance of the deadhead trips between every pair of locations.
+
+    Args:
+        distance_matrix (DistanceLookup): The compiled distance matrix.
+        locations (ndarray): Names of the locations, the position of a location is its code.
+
+    Returns:
+        tuple: Minutes and meters by start and end location code, infinity where there is no route and zero
+            from a location to itself.
+    """
+    n = len(locations)
+    start, end = np.divmod(np.arange(n * n), n)
+    pairs = pd.DataFrame({'startlocatie': locations[start], 'eindlocatie': locations[end], 'buslijn': np.nan})
+    codes = distance_matrix.route_codes(pairs)
+    minutes = np.nan_to_num(distance_matrix.max_time[codes], nan=np.inf).reshape(n, n)
+    meters = np.nan_to_num(distance_matrix.distance[codes], nan=np.inf).reshape(n, n)
+    np.fill_diagonal(minutes, 0)
+    np.fill_diagonal(meters, 0)
+    return minutes, meters
+
+
+def _timetable_trips(timetable, distance_matrix):
+    """
+    The trips of the timetable as arrays, sorted by departure.
+
+    Args:
+        timetable (DataFrame): The 'Dienstregeling' sheet.
+        distance_matrix (DistanceLookup): The compiled distance matrix.
+
+    Returns:
+        DataFrame: Route, departure and arrival in minutes since midnight of the service day, and distance in meters.
+
+    Raises:
+        ValueError: If departures cannot be read or trips have no travel time in the distance matrix.
+    """
+    time_column = 'vertrektijd' if 'vertrektijd' in timetable.columns else 'starttijd'
+    if time_column not in timetable.columns:
+        raise ValueError("Missing 'vertrektijd' column in timetable.")
+
+    trips = route_keys(timetable)
+    departure = parse_clock_minutes(timetable[time_column]).to_numpy()
+    if np.isnan(departure).any():
+        raise ValueError(f"Could not read 'vertrektijd' in rows: {list(timetable.index[np.isnan(departure)][:10])}")
+    departure = departure % MINUTES_PER_DAY
+    departure = np.where(departure < SERVICE_DAY_START, departure + MINUTES_PER_DAY, departure).astype(np.int64)
+
+    codes = distance_matrix.route_codes(trips)
+    minutes, meters = distance_matrix.max_time[codes], distance_matrix.distance[codes]
+    unknown = np.isnan(minutes) | np.isnan(meters)
+    if unknown.any():
+        missing = trips[unknown].drop_duplicates()
+        raise ValueError(f'Routes missing in the distance matrix: {missing.to_dict("records")[:10]}')
+
+    trips = trips.assign(vertrektijd=departure, aankomsttijd=departure + minutes.astype(np.int64), afstand=meters)
+    return trips.sort_values('vertrektijd', kind='stable').reset_index(drop=True)
+
+
+def _fill_idle(activities):
+    """Adds an idle activity wherever a block waits between two activities."""
+    activities = activities.sort_values(['omloop nummer', 'start'], kind='stable').reset_index(drop=True)
+    block, start, end = (activities[column].to_numpy() for column in ('omloop nummer', 'start', 'end'))
+    gap = np.flatnonzero((block[1:] == block[:-1]) & (start[1:] > end[:-1]))
+
+    idle = pd.DataFrame({
+        'omloop nummer': block[gap],
+        'start': end[gap],
+        'end': start[gap + 1],
+        'startlocatie': activities['eindlocatie'].to_numpy()[gap],
+        'eindlocatie': activities['eindlocatie'].to_numpy()[gap],
+        'activiteit': 'idle',
+        'buslijn': np.nan,
+        'afstand': 0.0,
+    })
+    return pd.concat([activities, idle], ignore_index=True).sort_values(['omloop nummer', 'start'], kind='stable')
+
+
+def build_planning(timetable, distance_matrix, SOH=90, min_SOC=10, consumption_per_km=1.6,
+                   service_day=DEFAULT_SERVICE_DAY):
+    """
+    Builds a bus planning that covers every trip of the timetable.
+
+    Args:
+        timetable (DataFrame): The 'Dienstregeling' sheet.
+        distance_matrix (DataFrame or DistanceLookup): Distances and travel times between locations.
+        SOH (float): State of Health of the battery as a percentage.
+        min_SOC (float): Minimum state of charge required as a percentage.
+        consumption_per_km (float): Energy consumption per kilometer in kWh.
+        service_day (str or Timestamp): Date of the service day in the date columns.
+
+    Returns:
+        DataFrame: The bus planning, in the columns of the uploaded plannings.
+
+    Raises:
+        ValueError: If trips are missing in the distance matrix, or a trip uses more energy than a full battery.
+    """
+    if not isinstance(distance_matrix, DistanceLookup):
+        distance_matrix = DistanceLookup(distance_matrix)
+    max_capacity = 300 * (SOH / 100)
+    min_battery = max_capacity * (min_SOC / 100)
+    kwh_per_meter = max(consumption_per_km, 0.7) / 1000
+
+    trips = _timetable_trips(timetable, distance_matrix)
+    locations = np.unique(np.r_[trips['startlocatie'], trips['eindlocatie'], [GARAGE]].astype(str))
+    trip_start = np.searchsorted(locations, trips['startlocatie'].astype(str))
+    trip_end = np.searchsorted(locations, trips['eindlocatie'].astype(str))
+    garage = np.searchsorted(locations, GARAGE)
+
+    dead_minutes, dead_meters = _deadhead_matrix(distance_matrix, locations)
+    dead_energy = dead_meters * kwh_per_meter
+    trip_meters = trips['afstand'].to_numpy()
+    trip_energy = trip_meters * kwh_per_meter
+
+    # Energy to drive back to the garage from every location, buses that cannot get there do not charge
+    to_garage = dead_energy[:, garage]
+    can_charge = np.isfinite(to_garage)
+    to_garage = np.where(can_charge, to_garage, 0)
+
+    # A bus charges when it could not drive the most demanding trip of the timetable and still return
+    reachable = np.isfinite(dead_energy)
+    reserve = (
+        np.where(reachable, dead_energy, 0).max() + (trip_energy + to_garage[trip_end]).max() + IDLE_CONSUMPTION
+    )
+    if reserve > max_capacity - min_battery:
+        raise ValueError(
+            f'A trip and the deadhead trips around it need {reserve:.0f} kWh, more than the '
+            f'{max_capacity - min_battery:.0f} kWh a full battery can use.'
+        )
+
+    # State of every bus while the trips are assigned
+    location = np.empty(0, dtype=np.int64)
+    free = np.empty(0, dtype=np.int64)
+    level = np.empty(0)
+
+    # The assignment of every trip: its bus, where and when that bus was free before it, and its charge afterwards
+    n_trips = len(trips)
+    trip_bus = np.empty(n_trips, dtype=np.int64)
+    origin = np.empty(n_trips, dtype=np.int64)
+    ready = np.empty(n_trips, dtype=np.int64)
+    charge_minutes = np.zeros(n_trips, dtype=np.int64)
+
+    departures, arrivals = trips['vertrektijd'].to_numpy(), trips['aankomsttijd'].to_numpy()
+    for trip in range(n_trips):
+        start, end, departure = trip_start[trip], trip_end[trip], departures[trip]
+
+        # Buses that reach the start in time and keep enough battery to drive the trip and return to the garage,
+        # a bus that arrives before the departure waits in an idle activity
+        arrival = free + dead_minutes[location, start]
+        waits = arrival < departure
+        needed = dead_energy[location, start] + trip_energy[trip] + to_garage[end] + IDLE_CONSUMPTION * waits
+        feasible = np.flatnonzero((arrival <= departure) & (level - needed >= min_battery))
+        if len(feasible):
+            # Prefer no deadhead trip, then the bus that waits the shortest
+            bus = feasible[np.lexsort((-free[feasible], dead_meters[location[feasible], start]))[0]]
+        else:
+            # A new bus leaves the garage just in time, or starts at the start location without a route to it
+            first = garage if np.isfinite(dead_minutes[garage, start]) else start
+            bus = len(free)
+            location = np.r_[location, first]
+            free = np.r_[free, departure - int(dead_minutes[first, start])]
+            level = np.r_[level, max_capacity]
+            waits = np.r_[waits, False]
+
+        trip_bus[trip], origin[trip], ready[trip] = bus, location[bus], free[bus]
+        level[bus] -= dead_energy[location[bus], start] + trip_energy[trip] + IDLE_CONSUMPTION * waits[bus]
+        location[bus], free[bus] = end, arrivals[trip]
+
+        # Charge until full when the bus could not drive another trip and return
+        if can_charge[end] and level[bus] - reserve < min_battery:
+            level[bus] -= dead_energy[end, garage]
+            speed = CHARGING_SPEED_90 if level[bus] <= max_capacity * 0.9 else CHARGING_SPEED_10
+            charge_minutes[trip] = max(int(np.ceil((max_capacity - level[bus]) / speed)), 1)
+            location[bus], level[bus] = garage, max_capacity
+            free[bus] += int(dead_minutes[end, garage]) + charge_minutes[trip]
+
+    def activity_rows(selected, step, start, end, first, last, activity, line=np.nan, meters=0.0):
+        """Activities of one kind for the selected trips, ordered by the trip and their step around it."""
+        rows = np.flatnonzero(np.broadcast_to(selected, n_trips))
+
+        def column(values):
+            return np.broadcast_to(values, n_trips)[rows]
+
+        return pd.DataFrame({
+            'omloop nummer': trip_bus[rows] + 1,
+            'order': rows * 4 + step,
+            'start': column(start),
+            'end': column(end),
+            'startlocatie': locations[column(first)],
+            'eindlocatie': locations[column(last)],
+            'activiteit': activity,
+            'buslijn': column(line),
+            'afstand': column(meters),
+        })
+
+    # The deadhead trip to every trip, the trip, and the deadhead trip to the garage and charge after it, for all
+    # trips at once
+    to_start = origin != trip_start
+    deadhead_end = ready + dead_minutes[origin, trip_start].astype(np.int64)
+    charges = charge_minutes > 0
+    to_garage_after = charges & (trip_end != garage)
+    charge_start = arrivals + np.where(to_garage_after, dead_minutes[trip_end, garage], 0).astype(np.int64)
+    lines = pd.to_numeric(trips['buslijn'], errors='coerce').to_numpy(dtype=float)
+    activities = pd.concat([
+        activity_rows(to_start, 0, ready, deadhead_end, origin, trip_start, 'materiaal rit',
+                      meters=dead_meters[origin, trip_start]),
+        activity_rows(True, 1, departures, arrivals, trip_start, trip_end, 'dienst rit', lines, trip_meters),
+        activity_rows(to_garage_after, 2, arrivals, charge_start, trip_end, garage, 'materiaal rit',
+                      meters=dead_meters[trip_end, garage]),
+        activity_rows(charges, 3, charge_start, charge_start + charge_minutes, garage, garage, 'opladen'),
+    ], ignore_index=True)
+    activities = activities.sort_values(['omloop nummer', 'order'], kind='stable').drop(columns='order')
+    planning = _fill_idle(activities)
+
+    # Times as in the uploaded plannings, with the full dates for activities past midnight
+    start, end = planning['start'].to_numpy(), planning['end'].to_numpy()
+    activity = planning['activiteit'].to_numpy()
+    day = pd.Timestamp(service_day).normalize()
+    planning['starttijd'] = np.char.add(format_minutes(start % MINUTES_PER_DAY), ':00')
+    planning['eindtijd'] = np.char.add(format_minutes(end % MINUTES_PER_DAY), ':00')
+    planning[DATE_COLUMNS['starttijd']] = day + pd.to_timedelta(start, unit='min')
+    planning[DATE_COLUMNS['eindtijd']] = day + pd.to_timedelta(end, unit='min')
+    planning['energieverbruik'] = np.select(
+        [activity == 'opladen', activity == 'idle'],
+        [-(end - start) * CHARGING_SPEED_90, IDLE_CONSUMPTION],
+        planning['afstand'].to_numpy() * kwh_per_meter,
+    )
+    return planning[PLANNING_COLUMNS].reset_index(drop=True)
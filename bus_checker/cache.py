@@ -0,0 +1,168 @@
+"""Local columnar cache of parsed workbook sheets.
+
+Parsing .xlsx files is the slowest step of a validation, while the same
+workbooks, the timetable in particular, are uploaded again and again. Every
+parsed sheet is therefore stored once as an Arrow IPC file named after the
+hash of the workbook content. A later load of the same workbook memory-maps
+that file instead of parsing Excel, also from another process or after the
+app restarted.
+
+pyarrow is optional: without it `SheetCache.available` is False and nothing
+is cached. The cache keeps its total size below a limit by removing the least
+recently used files.
+"""
+import hashlib
+import os
+import re
+import tempfile
+
+# Location and size limit of the cache, can be changed with environment variables
+DEFAULT_CACHE_DIR = os.environ.get('BUS_CHECKER_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'bus_checker_cache'))
+DEFAULT_MAX_BYTES = int(os.environ.get('BUS_CHECKER_CACHE_MAX_BYTES', 512 * 1024 ** 2))
+
+SUFFIX = '.arrow'
+
+
+def content_digest(content):
+    """Return the SHA-256 hash of the content of a file."""
+    return hashlib.sha256(content).hexdigest()
+
+
+class SheetCache:
+    """
+    Parsed sheets stored as Arrow files, keyed by the hash of their workbook.
+
+    Attributes:
+        directory (str): Directory of the cache files.
+        max_bytes (int): Largest total size of the cache files.
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    @property
+    def available(self):
+        """Whether pyarrow is installed, without it nothing is cached."""
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def _path(self, digest, sheet):
+        name = re.sub(r'[^\w-]', '_', str(sheet))
+        return os.path.join(self.directory, f'{digest}.{name}{SUFFIX}')
+
+    def load(self, digest, sheets):
+        """
+        Loads sheets of a workbook from the cache.
+
+        The Arrow files are memory-mapped, so columns without missing values
+        are used by pandas without copying them into memory.
+
+        Args:
+            digest (str): Hash of the workbook content.
+            sheets (list): Names of the sheets.
+
+        Returns:
+            dict: Sheet name mapped to its DataFrame, or None if a sheet is not in the cache.
+        """
+        if not self.available:
+            return None
+        import pyarrow as pa
+
+        frames = {}
+        for sheet in sheets:
+            path = self._path(digest, sheet)
+            try:
+                # The table keeps the memory map open for as long as its columns are used
+                table = pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+                os.utime(path)
+            except (OSError, pa.ArrowInvalid):
+                return None
+            frames[sheet] = table.to_pandas(split_blocks=True)
+        return frames
+
+    def store(self, digest, frames):
+        """
+        Stores the sheets of a workbook, then evicts old files when the cache is too large.
+
+        Sheets that Arrow cannot represent, such as columns mixing text and
+        numbers, are not stored; loading the workbook then parses Excel again.
+
+        Args:
+            digest (str): Hash of the workbook content.
+            frames (dict): Sheet name mapped to its DataFrame.
+
+        Returns:
+            bool: Whether all sheets were stored.
+        """
+        if not self.available:
+            return False
+        import pyarrow as pa
+
+        os.makedirs(self.directory, exist_ok=True)
+        for sheet, frame in frames.items():
+            path = self._path(digest, sheet)
+            try:
+                table = pa.Table.from_pandas(frame, preserve_index=False)
+            except (pa.ArrowException, TypeError, ValueError):
+                return False
+
+            # Write to a temporary file first, so other processes never read a partial file
+            handle, temporary = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            try:
+                with os.fdopen(handle, 'wb') as file, pa.ipc.new_file(file, table.schema) as writer:
+                    writer.write_table(table)
+                os.replace(temporary, path)
+            except OSError:
+                if os.path.exists(temporary):
+                    os.remove(temporary)
+                return False
+
+        self.evict()
+        return True
+
+    def entries(self):
+        """List the cache files as (path, size, last use) tuples, least recently used first."""
+        entries = []
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return entries
+        for name in names:
+            if not name.endswith(SUFFIX):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                status = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((path, status.st_size, status.st_mtime))
+        return sorted(entries, key=lambda entry: entry[2])
+
+    def size(self):
+        """Total size of the cache files in bytes."""
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self):
+        """Removes the least recently used files until the cache fits in `max_bytes`."""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def clear(self):
+        """Removes all cache files."""
+        for path, _, _ in self.entries():
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
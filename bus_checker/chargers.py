@@ -0,0 +1,180 @@
+"""Occupancy of the depot chargers over the planning day.
+
+Every charging activity ('opladen') occupies a charger from its start to its
+end. While the battery is not full it also draws power from the grid, at the
+charging rate of the battery model. The number of chargers in use and the
+power drawn change only where a session starts or stops, so they are computed
+with a sweep line over these events: the events are sorted once and their
+changes added up, which takes O(n log n) time for n sessions. The result is
+then sampled on a grid of one value per minute.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from bus_checker.battery import CHARGING_SPEED_10, CHARGING_SPEED_90, simulate_battery_levels
+from bus_checker.checks import energy_per_row
+from bus_checker.model import MINUTES_PER_DAY, format_minutes
+
+# Power drawn by a charging bus in kW, the fast charging rate of the battery model
+CHARGER_POWER = CHARGING_SPEED_90 * 60
+
+# Limits of the depot used when none are given
+DEFAULT_MAX_CHARGERS = 10
+DEFAULT_MAX_POWER = 3000
+
+
+@dataclass(frozen=True)
+class ChargerOccupancy:
+    """
+    Chargers in use and power drawn for every minute of the planning day.
+
+    Attributes:
+        minutes (ndarray): Minute since midnight of the service day of every sample.
+        chargers (ndarray): Number of chargers in use during every minute.
+        power (ndarray): Power drawn from the grid in kW during every minute.
+        session_start (ndarray): Start minute of every charging session.
+        session_end (ndarray): End minute of every charging session.
+        session_blocks (ndarray): Block number ('omloop nummer') of every charging session.
+    """
+    minutes: np.ndarray
+    chargers: np.ndarray
+    power: np.ndarray
+    session_start: np.ndarray
+    session_end: np.ndarray
+    session_blocks: np.ndarray
+
+    @property
+    def peak_chargers(self):
+        """Largest number of chargers in use at the same time."""
+        return int(self.chargers.max(initial=0))
+
+    @property
+    def peak_power(self):
+        """Largest power drawn at the same time in kW."""
+        return float(self.power.max(initial=0))
+
+    def windows(self, max_chargers=None, max_power=None):
+        """
+        Periods in which the depot cannot serve all charging sessions.
+
+        Args:
+            max_chargers (int, optional): Number of chargers at the depot, not checked if None.
+            max_power (float, optional): Grid power available for charging in kW, not checked if None.
+
+        Returns:
+            DataFrame: One row per period with the limits that are exceeded, its start and end, the peak
+                chargers and power and the blocks charging in it.
+        """
+        over_chargers = self.chargers > max_chargers if max_chargers is not None else np.zeros(len(self.minutes), bool)
+        over_power = self.power > max_power if max_power is not None else np.zeros(len(self.minutes), bool)
+        over = over_chargers | over_power
+        if not over.any():
+            return pd.DataFrame()
+
+        # Runs of consecutive minutes above a limit
+        edges = np.diff(np.r_[0, over.astype(np.int8), 0])
+        first, stop = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+        start, end = self.minutes[first], self.minutes[stop - 1] + 1
+
+        issue = np.where(
+            np.logical_or.reduceat(over_chargers, first) & np.logical_or.reduceat(over_power, first),
+            'chargers and power',
+            np.where(np.logical_or.reduceat(over_chargers, first), 'chargers', 'power'),
+        )
+        blocks = [
+            ', '.join(map(str, np.unique(self.session_blocks[(self.session_start < e) & (self.session_end > s)])))
+            for s, e in zip(start, end)
+        ]
+        return pd.DataFrame({
+            'issue': issue,
+            'starttijd': format_minutes(start % MINUTES_PER_DAY),
+            'eindtijd': format_minutes(end % MINUTES_PER_DAY),
+            'minutes': end - start,
+            'peak chargers': np.maximum.reduceat(self.chargers, first),
+            'peak power (kW)': np.maximum.reduceat(self.power, first),
+            'omloop nummers': blocks,
+        })
+
+
+def charging_power(model, distances, SOH, consumption_per_km):
+    """
+    Power and charging time of every charging session, following the battery model.
+
+    A session charges at the rate that belongs to the battery level at its
+    start, until the battery is full or the session ends. Sessions whose
+    starting level is unknown are assumed to charge for their whole duration.
+
+    Args:
+        model (PlanningModel): The bus planning.
+        distances (ndarray): Distance in meters for every row, see planning_distances.
+        SOH (float): State of Health of the battery as a percentage.
+        consumption_per_km (float): Energy consumption per kilometer in kWh.
+
+    Returns:
+        tuple: Power in kW and minutes of charging of every charging row.
+    """
+    max_capacity = 300 * (SOH / 100)
+    is_charging = model.is_activity('opladen')
+    consumption = energy_per_row(model, distances, consumption_per_km)
+    levels = simulate_battery_levels(model.blocks, is_charging, consumption, model.duration, max_capacity)
+
+    # Level before every session: after the previous row of the block, or full at the start of a block
+    rows = np.flatnonzero(is_charging)
+    previous = np.maximum(rows - 1, 0)
+    continues_block = (rows > 0) & (model.blocks[previous] == model.blocks[rows])
+    level = np.where(continues_block, levels[previous], max_capacity)
+
+    with np.errstate(invalid='ignore'):
+        speed = np.where(level <= max_capacity * 0.9, CHARGING_SPEED_90, CHARGING_SPEED_10)
+        minutes_to_full = np.ceil((max_capacity - level) / speed)
+    duration = model.duration[rows]
+    minutes = np.where(np.isnan(minutes_to_full), duration, np.minimum(minutes_to_full, duration))
+    return speed * 60, minutes
+
+
+def charger_occupancy(model, power=CHARGER_POWER, power_minutes=None):
+    """
+    Sweeps the charging sessions to count the chargers in use and the power drawn per minute.
+
+    Args:
+        model (PlanningModel): The bus planning.
+        power (float or ndarray): Power drawn by every charging session in kW.
+        power_minutes (ndarray, optional): Minutes every session draws power, by default its whole duration.
+
+    Returns:
+        ChargerOccupancy: Chargers in use and power drawn from the first session start to the last session end.
+    """
+    is_charging = model.is_activity('opladen')
+    start, end = model.start[is_charging], model.end[is_charging]
+    power = np.broadcast_to(np.asarray(power, dtype=float), start.shape)
+    power_end = end if power_minutes is None else start + np.minimum(power_minutes, end - start).astype(start.dtype)
+
+    if len(start) == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return ChargerOccupancy(empty, empty, np.empty(0), empty, empty, model.blocks[is_charging])
+
+    # A session starts using a charger at its start and releases it at its end,
+    # the power is drawn from its start until the battery is full
+    times = np.concatenate([start, end, start, power_end])
+    no_change = np.zeros(len(start))
+    charger_change = np.concatenate([np.ones(len(start)), -np.ones(len(start)), no_change, no_change])
+    power_change = np.concatenate([no_change, no_change, power, -power])
+
+    order = np.argsort(times, kind='stable')
+    event_times, first = np.unique(times[order], return_index=True)
+    chargers = np.add.reduceat(charger_change[order], first).cumsum()
+    drawn = np.add.reduceat(power_change[order], first).cumsum()
+
+    # Sample the step functions once per minute, rounding away floating point residue
+    minutes = np.arange(event_times[0], event_times[-1])
+    event = np.searchsorted(event_times, minutes, side='right') - 1
+    return ChargerOccupancy(
+        minutes=minutes,
+        chargers=np.rint(chargers[event]).astype(np.int64),
+        power=np.maximum(np.round(drawn[event], 6), 0),
+        session_start=start,
+        session_end=end,
+        session_blocks=model.blocks[is_charging],
+    )
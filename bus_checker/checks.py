@@ -0,0 +1,207 @@
+"""Validity checks of a bus planning.
+
+Every check returns a DataFrame with the rows that do not adhere to the
+criterium it checks, or an empty DataFrame if no problems were found.
+All checks read from a `PlanningModel` and leave it unchanged.
+"""
+import numpy as np
+import pandas as pd
+
+from bus_checker.battery import IDLE_CONSUMPTION, simulate_battery_levels
+from bus_checker.model import MINUTES_PER_DAY, format_minutes
+from bus_checker.routes import DistanceLookup
+from bus_checker.timetable import TimetableIndex
+
+# Maximum difference in minutes between a planned departure and the timetable
+COVERAGE_TOLERANCE = 1
+
+
+def planning_distances(model, distance_matrix):
+    """
+    Looks up the distance of every row of the bus planning in the distance matrix.
+
+    Args:
+        model (PlanningModel): The bus planning.
+        distance_matrix (DataFrame or DistanceLookup): Distances between locations, or a lookup compiled from them.
+
+    Returns:
+        ndarray: Distance in meters for every row of the planning, NaN if the route is not in the distance matrix.
+    """
+    if not isinstance(distance_matrix, DistanceLookup):
+        distance_matrix = DistanceLookup(distance_matrix)
+    return distance_matrix.distance[distance_matrix.route_codes(model.frame)]
+
+
+def energy_per_row(model, distances, consumption_per_km):
+    """
+    Calculates the energy consumed by every row of the bus planning.
+
+    Args:
+        model (PlanningModel): The bus planning.
+        distances (ndarray): Distance in meters for every row, see planning_distances.
+        consumption_per_km (float): Energy consumption per kilometer in kWh.
+
+    Returns:
+        ndarray: Energy consumption in kWh for every row.
+    """
+    # Calculate energy consumption based on distance and consumption per km
+    consumption = (distances / 1000) * max(consumption_per_km, 0.7)
+
+    # Idle activities consume minimal power
+    return np.where(model.is_activity('idle'), IDLE_CONSUMPTION, consumption)
+
+
+def check_battery_status(model, distances, SOH, min_SOC, consumption_per_km):
+    """
+    Validates battery status throughout the bus schedule.
+
+    The failing rows and their state of charge are those of the row loop this
+    check replaced, for a planning sorted by block and start time. The output
+    is in the order of the PlanningModel, by block and start time, with a new
+    index, and 'starttijd' is an 'HH:MM' string instead of a datetime.
+
+    Args:
+        model (PlanningModel): The bus planning.
+        distances (ndarray): Distance in meters for every row, see planning_distances.
+        SOH (float): State of Health of the battery as a percentage.
+        min_SOC (float): Minimum state of charge required as a percentage.
+        consumption_per_km (float): Energy consumption per kilometer in kWh.
+
+    Returns:
+        DataFrame: Rows where the battery is below the minimum, with 'omloop nummer', 'starttijd',
+            'consumption (kWh)' and 'state of charge' in percent.
+    """
+    # Calculate battery capacities based on SOH and min_SOC
+    max_capacity = 300 * (SOH / 100)  # Maximum battery capacity in kWh
+    min_battery = max_capacity * (min_SOC / 100)  # Minimum allowed battery level
+
+    consumption = energy_per_row(model, distances, consumption_per_km)
+
+    # Simulate the battery level of all blocks at once
+    battery_level = simulate_battery_levels(
+        model.blocks, model.is_activity('opladen'), consumption, model.duration, max_capacity
+    )
+
+    # Rows where the battery falls below the minimum SOC
+    failed = battery_level < min_battery
+    if not failed.any():
+        return pd.DataFrame()
+
+    return pd.DataFrame({
+        'omloop nummer': model.blocks[failed],
+        'starttijd': format_minutes(model.start[failed] % MINUTES_PER_DAY),
+        'consumption (kWh)': consumption[failed],
+        'state of charge': battery_level[failed] / max_capacity * 100,
+    })
+
+
+def check_route_continuity(model):
+    """
+    Checks for route continuity issues within the same loop number.
+
+    Every activity is compared with the next activity of the same block: the
+    end location must be the next start location, and the next activity must
+    start exactly when the current one ends, without overlap or unplanned gap.
+
+    Args:
+        model (PlanningModel): The bus planning.
+
+    Returns:
+        DataFrame: Pairs of consecutive rows with route continuity issues, with the overlap and gap in minutes.
+    """
+    # Compare every row with the next row, as long as both are in the same block
+    current, following = slice(None, -1), slice(1, None)
+    same_block = model.blocks[current] == model.blocks[following]
+    end_locations = np.asarray(model.frame['eindlocatie'], dtype=object)[current]
+    start_locations = np.asarray(model.frame['startlocatie'], dtype=object)[following]
+    location_mismatch = end_locations != start_locations
+
+    # Positive when the next activity starts before the current one has ended, negative for a gap
+    overlap = model.end[current] - model.start[following]
+
+    issue = same_block & (location_mismatch | (overlap != 0))
+    rows = np.flatnonzero(issue)
+
+    return pd.DataFrame({
+        'omloop nummer': model.blocks[rows],
+        'current end location': end_locations[rows],
+        'next start location': start_locations[rows],
+        'current end time': format_minutes(model.end[rows] % MINUTES_PER_DAY),
+        'next start time': format_minutes(model.start[rows + 1] % MINUTES_PER_DAY),
+        'overlap (min)': np.maximum(overlap[rows], 0),
+        'gap (min)': np.maximum(-overlap[rows], 0),
+    })
+
+
+def driven_rides(model):
+    """
+    Filters bus planning data for rides that include a bus line.
+
+    Args:
+        model (PlanningModel): The bus planning.
+
+    Returns:
+        DataFrame: Rides containing a bus line, with their start time in minutes since midnight.
+    """
+    rides = model.frame[['omloop nummer', 'startlocatie', 'activiteit', 'eindlocatie', 'buslijn']].assign(
+        starttijd=model.start % MINUTES_PER_DAY
+    )
+    return rides.dropna(subset=['buslijn'])
+
+
+def every_ride_covered(model, timetable, tolerance=COVERAGE_TOLERANCE):
+    """
+    Checks if every trip in the timetable is covered exactly once by the bus planning, and vice versa.
+
+    Args:
+        model (PlanningModel): The bus planning.
+        timetable (DataFrame or TimetableIndex): Timetable rides, or an index built from them.
+        tolerance (int): Maximum difference in minutes between a planned and a timetabled departure.
+
+    Returns:
+        DataFrame: Discrepancies between planning and timetable, with the kind of problem in 'issue':
+            'uncovered' for timetable trips without a ride in the planning, 'duplicate' for trips covered by more
+            than one ride and 'extra' for rides in the planning that are not in the timetable.
+    """
+    if not isinstance(timetable, TimetableIndex):
+        timetable = TimetableIndex(timetable)
+
+    # Find the timetable trip of every ride and count how often every trip is covered
+    rides = driven_rides(model)
+    matched = timetable.match(rides, tolerance)
+    covered = np.bincount(matched[matched >= 0], minlength=len(timetable))
+
+    extra = rides[matched < 0].assign(issue='extra')
+    duplicate = rides[(matched >= 0) & (covered[matched] > 1)].assign(issue='duplicate')
+    uncovered = timetable.trips[covered == 0].assign(issue='uncovered')
+
+    columns = ['issue', 'omloop nummer', 'startlocatie', 'eindlocatie', 'buslijn', 'activiteit', 'starttijd']
+    parts = [part for part in (uncovered, duplicate, extra) if not part.empty]
+    issues = pd.concat(parts, ignore_index=True).reindex(columns=columns) if parts else pd.DataFrame(columns=columns)
+    return issues.assign(starttijd=format_minutes(issues['starttijd']))
+
+
+def check_travel_time(model, distance_matrix):
+    """
+    Validates that travel times are within expected ranges.
+
+    Rows whose route is not in the distance matrix are not checked.
+
+    Args:
+        model (PlanningModel): The bus planning.
+        distance_matrix (DataFrame or DistanceLookup): Expected travel time data, or a lookup compiled from it.
+
+    Returns:
+        DataFrame: Discrepancies in travel times.
+    """
+    if not isinstance(distance_matrix, DistanceLookup):
+        distance_matrix = DistanceLookup(distance_matrix)
+
+    # Compare the travel time of every row with the bounds of its route
+    routes = distance_matrix.route_codes(model.frame)
+    duration = model.duration
+    within = (distance_matrix.min_time[routes] <= duration) & (duration <= distance_matrix.max_time[routes])
+    outside = (routes >= 0) & ~within
+
+    issues = model.frame.loc[outside, ['omloop nummer', 'startlocatie', 'eindlocatie']].reset_index(drop=True)
+    return issues.assign(reistijd=duration[outside], starttijd=format_minutes(model.start[outside] % MINUTES_PER_DAY))
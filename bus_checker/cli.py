@@ -0,0 +1,211 @@
+"""Command line batch validation of bus planning files.
+
+Validates many planning workbooks against one timetable workbook without
+Streamlit and writes a JSON or CSV report with the KPIs and the problems
+found per file. Example:
+
+    python -m bus_checker plannings/ --timetable "Connexxion data - 2024-2025.xlsx" --output report.json
+
+The timetable workbook is read and indexed once. Every worker process receives
+the timetable index and the compiled distance matrix a single time when it
+starts, and then validates planning files one after another. Parsed workbooks
+are kept in a local sheet cache, so validating the same files again skips
+parsing Excel. With --chunk-rows very large plannings are streamed in chunks
+of blocks instead of being loaded at once.
+"""
+import argparse
+import glob
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from bus_checker.cache import DEFAULT_CACHE_DIR, SheetCache
+from bus_checker.checks import planning_distances
+from bus_checker.kpis import KPI_NAMES
+from bus_checker.loading import read_planning, read_timetable
+from bus_checker.routes import DistanceLookup
+from bus_checker.runner import available_cpus, run_checks, validation_tasks
+from bus_checker.streaming import read_planning_chunks, stream_checks
+from bus_checker.timetable import TimetableIndex
+
+CHECK_NAMES = ['battery', 'continuity', 'coverage', 'travel time']
+
+# Timetable index, distance matrix and parameters shared by the checks in a worker process
+_shared = {}
+
+
+def find_planning_files(patterns):
+    """
+    Expands directories and glob patterns into a sorted list of .xlsx files.
+
+    Args:
+        patterns (list): File paths, directories or glob patterns.
+
+    Returns:
+        list: Paths of the planning files, without Excel lock files ('~$...').
+    """
+    files = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            files.update(glob.glob(os.path.join(pattern, '*.xlsx')))
+        elif glob.has_magic(pattern):
+            files.update(glob.glob(pattern))
+        else:
+            files.add(pattern)
+    return sorted(path for path in files if not os.path.basename(path).startswith('~$'))
+
+
+def _init_worker(timetable, distance_matrix, parameters, cache=None, chunk_rows=None):
+    """Stores the shared inputs in a worker process."""
+    _shared.update(
+        timetable=timetable, distance_matrix=distance_matrix, parameters=parameters, cache=cache, chunk_rows=chunk_rows
+    )
+
+
+def validate_file(path):
+    """
+    Validates a single planning file against the shared timetable.
+
+    Args:
+        path (str): Path of the planning workbook.
+
+    Returns:
+        dict: Report with the fleet KPIs and those per block, the number of problems per check and the affected rows.
+    """
+    start = time.perf_counter()
+    report = {'file': path, 'kpis': {}, 'block kpis': [], 'violations': {}, 'problems': {}, 'errors': {}}
+
+    try:
+        if _shared.get('chunk_rows'):
+            # Read and check the planning chunk by chunk, without the trip coverage check
+            chunks = read_planning_chunks(path, _shared['chunk_rows'])
+            results = list(stream_checks(chunks, _shared['distance_matrix'], **_shared['parameters']))
+        else:
+            model = read_planning(path, _shared.get('cache'))
+            distances = planning_distances(model, _shared['distance_matrix'])
+            tasks = validation_tasks(
+                model, _shared['timetable'], _shared['distance_matrix'], distances, **_shared['parameters']
+            )
+            results = run_checks(tasks, mode='serial')
+    except Exception as e:
+        report['errors']['load'] = str(e)
+        report['seconds'] = time.perf_counter() - start
+        return report
+
+    for result in results:
+        if result.error is not None:
+            report['errors'][result.name] = str(result.error)
+        elif result.name == 'kpis':
+            report['kpis'] = result.value.totals()
+            report['block kpis'] = json.loads(result.value.per_block().to_json(orient='records'))
+        else:
+            report['violations'][result.name] = len(result.value)
+            report['problems'][result.name] = json.loads(result.value.to_json(orient='records'))
+
+    report['seconds'] = time.perf_counter() - start
+    return report
+
+
+def validate_files(paths, timetable, distance_matrix, parameters, jobs=None, cache=None, chunk_rows=None):
+    """
+    Validates planning files in parallel across processes.
+
+    Args:
+        paths (list): Paths of the planning workbooks.
+        timetable (DataFrame or TimetableIndex): Timetable rides, or an index built from them.
+        distance_matrix (DataFrame or DistanceLookup): Distances and travel times between locations.
+        parameters (dict): Values for 'SOH', 'min_SOC' and 'consumption_per_km'.
+        jobs (int, optional): Number of worker processes, by default the number of available CPUs.
+        cache (SheetCache, optional): Cache of parsed sheets, shared by the worker processes through its directory.
+        chunk_rows (int, optional): Validate every planning in chunks of about this many rows, see stream_checks.
+
+    Returns:
+        list: A report per file, in the order of `paths`.
+    """
+    # Index the timetable and compile the distance matrix once for all planning files
+    if not isinstance(timetable, TimetableIndex):
+        timetable = TimetableIndex(timetable)
+    if not isinstance(distance_matrix, DistanceLookup):
+        distance_matrix = DistanceLookup(distance_matrix)
+
+    jobs = min(jobs or available_cpus(), len(paths))
+    if jobs <= 1:
+        _init_worker(timetable, distance_matrix, parameters, cache, chunk_rows)
+        return [validate_file(path) for path in paths]
+
+    with ProcessPoolExecutor(
+        max_workers=jobs, initializer=_init_worker, initargs=(timetable, distance_matrix, parameters, cache, chunk_rows)
+    ) as executor:
+        return list(executor.map(validate_file, paths))
+
+
+def summary_table(reports):
+    """
+    Flattens reports into one row per file with KPIs and problem counts.
+
+    Args:
+        reports (list): Reports returned by validate_files.
+
+    Returns:
+        DataFrame: One row per planning file.
+    """
+    rows = []
+    for report in reports:
+        row = {'file': report['file']}
+        row.update({name: report['kpis'].get(name) for name in KPI_NAMES})
+        row.update({f'{name} violations': report['violations'].get(name) for name in CHECK_NAMES})
+        row['errors'] = '; '.join(f'{name}: {error}' for name, error in report['errors'].items())
+        row['seconds'] = round(report['seconds'], 3)
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def write_report(reports, output):
+    """Writes the reports as JSON, or as a CSV summary if `output` ends with '.csv'."""
+    if output and output.endswith('.csv'):
+        summary_table(reports).to_csv(output, index=False)
+        return
+
+    text = json.dumps(reports, indent=2, default=str)
+    if output:
+        with open(output, 'w') as file:
+            file.write(text)
+    else:
+        print(text)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m bus_checker', description='Validate bus planning files in batch.')
+    parser.add_argument('plannings', nargs='+', help='planning .xlsx files, directories or glob patterns')
+    parser.add_argument('--timetable', required=True, help="workbook with the 'Dienstregeling' and 'Afstandsmatrix' sheets")
+    parser.add_argument('--soh', type=float, default=90, help='state of health of the battery in %% (default: 90)')
+    parser.add_argument('--min-soc', type=float, default=10, help='minimum state of charge in %% (default: 10)')
+    parser.add_argument('--consumption', type=float, default=1.6, help='battery consumption in kWh per km (default: 1.6)')
+    parser.add_argument('--jobs', type=int, default=None, help='number of worker processes (default: available CPUs)')
+    parser.add_argument('--output', help='report file, .json or .csv (default: JSON on stdout)')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help='directory of the parsed sheet cache (default: %(default)s)')
+    parser.add_argument('--no-cache', action='store_true', help='always parse the workbooks, without the sheet cache')
+    parser.add_argument(
+        '--chunk-rows', type=int, default=None,
+        help='stream every planning in chunks of about this many rows to bound memory use; skips the trip coverage check',
+    )
+    args = parser.parse_args(argv)
+
+    paths = find_planning_files(args.plannings)
+    if not paths:
+        parser.error('no planning files found')
+
+    cache = None if args.no_cache else SheetCache(args.cache_dir)
+    timetable, distance_matrix = read_timetable(args.timetable, cache)
+    parameters = {'SOH': args.soh, 'min_SOC': args.min_soc, 'consumption_per_km': args.consumption}
+
+    reports = validate_files(
+        paths, timetable, distance_matrix, parameters, jobs=args.jobs, cache=cache, chunk_rows=args.chunk_rows
+    )
+    write_report(reports, args.output)
+
+    # Exit with an error status if a planning could not be validated completely
+    return 1 if any(report['errors'] for report in reports) else 0
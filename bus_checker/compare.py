@@ -0,0 +1,154 @@
+"""Side-by-side comparison of candidate plannings for one timetable.
+
+The timetable is indexed and the distance matrix compiled once, and every
+candidate is validated against these same objects. The checks of all
+candidates run together in the threads of one process, so the candidates
+share the timetable index and the distance lookup in memory instead of each
+getting a copy. The candidates are then ranked on their number of problems,
+and on their KPIs when they have as many problems.
+
+A problem is a block that fails a check, a timetable trip that no block
+covers, or a driving row whose route is not in the distance matrix. Counting
+blocks rather than issue rows keeps a single block that runs out of battery
+from outweighing many separate problems. Rows with an unknown distance use no
+energy in the battery simulation, so they are counted as well, instead of
+making a corrupted planning look better.
+"""
+import numpy as np
+import pandas as pd
+
+from bus_checker.checks import energy_per_row, planning_distances
+from bus_checker.kpis import KPI_NAMES
+from bus_checker.routes import DistanceLookup
+from bus_checker.runner import run_checks, validation_tasks
+from bus_checker.timetable import TimetableIndex
+
+# Ranking of the candidates: fewest problems first, then fewest buses, energy and deadhead time
+RANK_BY = ['problems', 'errors', 'buses', 'energy', 'deadhead']
+
+
+def failing_blocks(issues):
+    """
+    Counts the problems in the issues of a check.
+
+    Args:
+        issues (DataFrame): Issue rows of a check.
+
+    Returns:
+        int: Number of distinct blocks in the issues, plus the rows without a block, such as uncovered trips.
+    """
+    if issues.empty:
+        return 0
+    blocks = issues['omloop nummer']
+    return blocks.nunique() + int(blocks.isna().sum())
+
+
+def unknown_distances(model, distances, consumption_per_km):
+    """
+    Counts the rows that use energy, but whose route is not in the distance matrix.
+
+    Args:
+        model (PlanningModel): The bus planning.
+        distances (ndarray): Distance in meters for every row, see planning_distances.
+        consumption_per_km (float): Energy consumption per kilometer in kWh.
+
+    Returns:
+        int: Number of rows without a known energy consumption, idle and charging rows excluded.
+    """
+    unknown = np.isnan(energy_per_row(model, distances, consumption_per_km)) & ~model.is_activity('opladen')
+    return int(unknown.sum())
+
+
+def comparison_tasks(models, timetable, distance_matrix, SOH, min_SOC, consumption_per_km):
+    """
+    Builds the checks and KPIs of every candidate.
+
+    Args:
+        models (dict): Name of every candidate mapped to its PlanningModel.
+        timetable (TimetableIndex): The indexed timetable, shared by all candidates.
+        distance_matrix (DistanceLookup): The compiled distance matrix, shared by all candidates.
+        SOH (float): State of Health of the battery as a percentage.
+        min_SOC (float): Minimum state of charge required as a percentage.
+        consumption_per_km (float): Energy consumption per kilometer in kWh.
+
+    Returns:
+        tuple: Tasks keyed by (candidate, check) and the errors of tasks that could not be built, by the same key.
+            The 'unknown distance' task of every candidate counts the rows whose energy cannot be simulated.
+    """
+    tasks, errors = {}, {}
+    for name, model in models.items():
+        try:
+            distances = planning_distances(model, distance_matrix)
+        except Exception as e:
+            # Without distances the battery check cannot run, and the energy consumption is unknown
+            distances = None
+            errors[(name, 'battery')] = e
+
+        for check, task in validation_tasks(
+            model, timetable, distance_matrix, distances, SOH, min_SOC, consumption_per_km
+        ).items():
+            if (name, check) not in errors:
+                tasks[(name, check)] = task
+        if distances is not None:
+            tasks[(name, 'unknown distance')] = (unknown_distances, (model, distances, consumption_per_km))
+    return tasks, errors
+
+
+def compare_plannings(models, timetable, distance_matrix, SOH, min_SOC, consumption_per_km, mode='auto',
+                      max_workers=None, initializer=None):
+    """
+    Validates candidate plannings concurrently and ranks them.
+
+    Args:
+        models (dict): Name of every candidate mapped to its PlanningModel.
+        timetable (DataFrame or TimetableIndex): Timetable rides, or an index built from them.
+        distance_matrix (DataFrame or DistanceLookup): Distances and travel times between locations.
+        SOH (float): State of Health of the battery as a percentage.
+        min_SOC (float): Minimum state of charge required as a percentage.
+        consumption_per_km (float): Energy consumption per kilometer in kWh.
+        mode (str): Execution mode of run_checks, 'process' copies the shared inputs to every worker.
+        max_workers (int, optional): Maximum number of workers.
+        initializer (callable, optional): Called in every worker before it runs tasks.
+
+    Returns:
+        DataFrame: One row per candidate with its rank, problems, KPIs, failing blocks per check, rows with an
+            unknown distance and errors, best candidate first.
+    """
+    # Index the timetable and compile the distance matrix once for all candidates
+    if not isinstance(timetable, TimetableIndex):
+        timetable = TimetableIndex(timetable)
+    if not isinstance(distance_matrix, DistanceLookup):
+        distance_matrix = DistanceLookup(distance_matrix)
+
+    tasks, errors = comparison_tasks(models, timetable, distance_matrix, SOH, min_SOC, consumption_per_km)
+    rows = {name: {'planning': name} for name in models}
+    checks = []
+    for result in run_checks(tasks, mode, max_workers, initializer):
+        name, check = result.name
+        if result.error is not None:
+            errors[result.name] = result.error
+        elif check == 'kpis':
+            rows[name].update(result.value.totals())
+        elif check == 'unknown distance':
+            rows[name]['unknown distances'] = result.value
+        else:
+            rows[name][f'{check} blocks'] = failing_blocks(result.value)
+            checks.append(check)
+
+    for (name, check), error in errors.items():
+        rows[name].setdefault('errors', []).append(f'{check}: {error}')
+
+    # Keep the order of the checks in validation_tasks
+    order = [check for check in dict.fromkeys(check for _, check in tasks) if check in checks]
+    counts = [*(f'{check} blocks' for check in order), 'unknown distances']
+    columns = ['planning', *KPI_NAMES, *counts]
+    table = pd.DataFrame(list(rows.values())).reindex(columns=columns + ['errors'])
+
+    table['problems'] = table[counts].sum(axis=1, min_count=1)
+    table['errors'] = table['errors'].map(lambda errors: '; '.join(errors) if isinstance(errors, list) else '')
+
+    # Candidates with errors or unknown KPIs rank below the ones that could be validated completely
+    ranking = table[RANK_BY].assign(errors=table['errors'] != '').fillna(np.inf)
+    table = table.loc[ranking.sort_values(RANK_BY, kind='stable').index].reset_index(drop=True)
+    table.insert(0, 'rank', np.arange(1, len(table) + 1))
+    return table[['rank', 'planning', 'problems', *columns[1:], 'errors']]
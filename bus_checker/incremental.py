@@ -0,0 +1,138 @@
+"""Incremental re-validation of an edited bus planning.
+
+The battery, continuity and travel time checks only compare rows within the
+same block ('omloop nummer'). When a planner edits a few rows and uploads the
+planning again, only the changed blocks need to be checked again: every block
+is hashed, and the results of blocks with the same hash as in the previously
+validated planning are reused.
+"""
+import hashlib
+import threading
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+
+def block_digests(model):
+    """
+    Hashes the rows of every block.
+
+    Args:
+        model (PlanningModel): The bus planning.
+
+    Returns:
+        dict: Block number mapped to the hash of its rows.
+    """
+    row_hashes = pd.util.hash_pandas_object(model.frame, index=False).to_numpy()
+    row_hashes = row_hashes ^ (model.start.astype(np.uint64) << np.uint64(32)) ^ model.end.astype(np.uint64)
+
+    bounds = model.block_bounds
+    return {
+        model.blocks[first]: hashlib.blake2b(row_hashes[first:last].tobytes(), digest_size=16).hexdigest()
+        for first, last in zip(bounds[:-1], bounds[1:])
+    }
+
+
+@dataclass
+class BlockResults:
+    """
+    Result of a per-block check and the blocks it was computed for.
+
+    Attributes:
+        digests (dict): Block number mapped to the hash of its rows.
+        issues (DataFrame): Rows returned by the check, with an 'omloop nummer' column.
+        checked (int): Number of blocks that were checked, the others were reused.
+    """
+    digests: dict
+    issues: pd.DataFrame
+    checked: int = 0
+
+
+def run_incremental(check, model, digests, previous=None, args=(), row_args=()):
+    """
+    Runs a per-block check on the blocks that changed since a previous result.
+
+    The check is called as `check(part, *row_args, *args)`, where `part` is a
+    PlanningModel with only the changed blocks and the arrays in `row_args`,
+    which hold one value per row of `model`, are cut to the same rows.
+
+    Args:
+        check (callable): A check that compares rows within the same block only.
+        model (PlanningModel): The bus planning.
+        digests (dict): Block hashes of the planning, see block_digests.
+        previous (BlockResults, optional): Result of the same check with the same arguments on an earlier planning.
+        args (tuple): Further arguments of the check.
+        row_args (tuple): Arguments of the check with one value per row of the planning.
+
+    Returns:
+        BlockResults: The result for the whole planning.
+    """
+    if previous is None:
+        return BlockResults(digests, check(model, *row_args, *args), checked=len(digests))
+
+    changed = [block for block, digest in digests.items() if previous.digests.get(block) != digest]
+    unchanged = [block for block, digest in digests.items() if previous.digests.get(block) == digest]
+
+    kept = previous.issues
+    if not kept.empty:
+        kept = kept[kept['omloop nummer'].isin(unchanged)]
+    if not changed:
+        return BlockResults(digests, kept.reset_index(drop=True), checked=0)
+
+    part, rows = model.select_blocks(changed)
+    new = check(part, *(np.asarray(values)[rows] for values in row_args), *args)
+
+    # Results of every block come from a single source, so a stable sort by block gives the order of a full check
+    parts = [issues for issues in (kept, new) if not issues.empty]
+    if not parts:
+        return BlockResults(digests, new, checked=len(changed))
+    issues = pd.concat(parts, ignore_index=True).sort_values('omloop nummer', kind='stable', ignore_index=True)
+    return BlockResults(digests, issues, checked=len(changed))
+
+
+class IncrementalValidator:
+    """
+    Keeps the result of every check for the last validated planning.
+
+    A result is reused for a later planning only when the check ran with the
+    same `key`, which should identify every other input of the check, such as
+    the timetable and the parameters. The validator can be shared by the
+    threads that run the checks.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._results = {}
+
+    def run(self, name, key, check, model, digests, args=(), row_args=()):
+        """
+        Runs a check incrementally and stores its result for the next planning.
+
+        Args:
+            name (str): Name of the check.
+            key (tuple): Identifies the inputs of the check other than the planning.
+            check (callable): A check that compares rows within the same block only.
+            model (PlanningModel): The bus planning.
+            digests (dict): Block hashes of the planning, see block_digests.
+            args (tuple): Further arguments of the check.
+            row_args (tuple): Arguments of the check with one value per row of the planning.
+
+        Returns:
+            DataFrame: The result of the check for the whole planning.
+        """
+        with self._lock:
+            previous_key, previous = self._results.get(name, (None, None))
+        if previous_key != key:
+            previous = None
+
+        result = run_incremental(check, model, digests, previous, args, row_args)
+        with self._lock:
+            self._results[name] = (key, result)
+        return result.issues
+
+    def checked_blocks(self, name):
+        """Number of blocks the last run of a check actually checked, None if it has not run."""
+        with self._lock:
+            _, result = self._results.get(name, (None, None))
+        return None if result is None else result.checked
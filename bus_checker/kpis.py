@@ -0,0 +1,204 @@
+"""Key performance indicators (KPIs) of a bus planning.
+
+All fleet KPIs are computed by `fleet_kpis` in one grouped pass: the minutes
+of every row are added up per block and activity with a single bincount over
+the combined block and activity codes, and the energy per block with a second
+one. The resulting `FleetKPIs` object holds these per-block sums, and the
+metrics, charts and batch reports read their numbers from it.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from bus_checker.checks import energy_per_row
+
+# Activities with their own KPI, by name of the KPI
+SERVICE, DEADHEAD, IDLE, CHARGING = 'dienst rit', 'materiaal rit', 'idle', 'opladen'
+
+# Names of the fleet totals, in the order they are reported
+KPI_NAMES = ['buses', 'deadhead', 'energy', 'idle', 'charging', 'revenue ratio']
+
+
+@dataclass(frozen=True)
+class FleetKPIs:
+    """
+    Minutes per activity and energy of every block of a bus planning.
+
+    Attributes:
+        blocks (ndarray): Block number ('omloop nummer') of every block.
+        activities (ndarray): Name of every activity ('activiteit').
+        minutes (ndarray): Minutes per block and activity.
+        energy (ndarray): Energy consumed per block in kWh, None if the distances are unknown.
+    """
+    blocks: np.ndarray
+    activities: np.ndarray
+    minutes: np.ndarray
+    energy: np.ndarray = None
+
+    @classmethod
+    def concat(cls, parts):
+        """
+        Combines the KPIs of plannings with different blocks, such as the chunks of a streamed planning.
+
+        Args:
+            parts (list): FleetKPIs of every part.
+
+        Returns:
+            FleetKPIs: The KPIs of all blocks.
+        """
+        activities = np.unique(np.concatenate([part.activities for part in parts])) if parts else np.empty(0, str)
+        minutes = []
+        for part in parts:
+            aligned = np.zeros((len(part.blocks), len(activities)))
+            aligned[:, np.searchsorted(activities, part.activities)] = part.minutes
+            minutes.append(aligned)
+
+        known = parts and all(part.energy is not None for part in parts)
+        return cls(
+            blocks=np.concatenate([part.blocks for part in parts]) if parts else np.empty(0),
+            activities=activities,
+            minutes=np.vstack(minutes) if minutes else np.zeros((0, len(activities))),
+            energy=np.concatenate([part.energy for part in parts]) if known else None,
+        )
+
+    def activity_minutes(self, activity):
+        """Minutes spent on an activity per block, zero if it does not occur."""
+        column = np.flatnonzero(self.activities == activity)
+        return self.minutes[:, column[0]] if len(column) else np.zeros(len(self.blocks))
+
+    @property
+    def buses(self):
+        """Number of blocks, every block is driven by one bus."""
+        return len(self.blocks)
+
+    @property
+    def revenue_ratio(self):
+        """Fraction of the planned time spent on regular trips ('dienst rit') per block."""
+        total = self.minutes.sum(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(total > 0, self.activity_minutes(SERVICE) / total, np.nan)
+
+    def totals(self):
+        """
+        The KPIs of the whole fleet.
+
+        Returns:
+            dict: Buses, deadhead, idle and charging minutes, energy in kWh (None if unknown) and the revenue
+                service ratio, by name in KPI_NAMES.
+        """
+        planned = self.minutes.sum()
+        return {
+            'buses': self.buses,
+            'deadhead': float(self.activity_minutes(DEADHEAD).sum()),
+            'energy': None if self.energy is None else round(float(np.nansum(self.energy)), 0),
+            'idle': float(self.activity_minutes(IDLE).sum()),
+            'charging': float(self.activity_minutes(CHARGING).sum()),
+            'revenue ratio': float(self.activity_minutes(SERVICE).sum() / planned) if planned else None,
+        }
+
+    def per_block(self):
+        """
+        The KPIs of every block.
+
+        Returns:
+            DataFrame: One row per block with the minutes per activity, the energy and the revenue service ratio.
+        """
+        return pd.DataFrame({
+            'omloop nummer': self.blocks,
+            'service minutes': self.activity_minutes(SERVICE),
+            'deadhead minutes': self.activity_minutes(DEADHEAD),
+            'idle minutes': self.activity_minutes(IDLE),
+            'charging minutes': self.activity_minutes(CHARGING),
+            'energy (kWh)': np.nan if self.energy is None else self.energy,
+            'revenue ratio': self.revenue_ratio,
+        })
+
+    def activity_hours(self):
+        """
+        Total time spent on each activity in hours.
+
+        Charging and idle are always included, with zero hours if they do not occur in the planning.
+        """
+        labels = sorted(set(self.activities) | {CHARGING, IDLE})
+        hours = [self.activity_minutes(label).sum() / 60 for label in labels]
+        return pd.DataFrame({'activiteit': labels, 'duur': hours})
+
+
+def fleet_kpis(model, distances=None, consumption_per_km=None):
+    """
+    Computes the KPIs of every block in one grouped pass over the planning.
+
+    Args:
+        model (PlanningModel): The bus planning.
+        distances (ndarray, optional): Distance in meters for every row, see planning_distances.
+        consumption_per_km (float, optional): Energy consumption per kilometer in kWh, needed with distances.
+
+    Returns:
+        FleetKPIs: Minutes per block and activity, and the energy per block if the distances are given.
+    """
+    # Rows without a block number are not driven by a bus
+    known = ~pd.isna(model.blocks)
+    block_numbers, block_id = np.unique(model.blocks[known], return_inverse=True)
+
+    # Number the activities that occur, rows without an activity have code -1
+    activity = model.frame['activiteit'].astype('category').cat
+    codes = activity.codes.to_numpy()[known]
+    has_activity = codes >= 0
+    observed, activity_id = np.unique(codes[has_activity], return_inverse=True)
+    activities = np.asarray(activity.categories, dtype=str)[observed]
+
+    # Sum the minutes per block and activity in a single bincount
+    n_blocks, n_activities = len(block_numbers), len(activities)
+    key = block_id[has_activity] * n_activities + activity_id
+    minutes = np.bincount(key, weights=model.duration[known][has_activity], minlength=n_blocks * n_activities)
+
+    energy = None
+    if distances is not None:
+        consumed = energy_per_row(model, distances, consumption_per_km)[known]
+        energy = np.bincount(block_id, weights=np.nan_to_num(consumed), minlength=n_blocks)
+
+    return FleetKPIs(
+        blocks=block_numbers,
+        activities=activities,
+        minutes=minutes.reshape(n_blocks, n_activities),
+        energy=energy,
+    )
+
+
+def count_buses(model):
+    """Count the number of unique 'omloop nummer' values in the bus planning data.
+
+    Args:
+        model (PlanningModel): The bus planning.
+
+    Returns:
+        int: Number of unique 'omloop nummer' values.
+    """
+    return fleet_kpis(model).totals()['buses']
+
+
+def calculate_deadhead_time(model):
+    """Calculate the total time spent on deadhead trips in minutes.
+
+    Args:
+        model (PlanningModel): The bus planning.
+
+    Returns:
+        float: Total deadhead time in minutes.
+    """
+    return fleet_kpis(model).totals()['deadhead']
+
+
+def calculate_energy_consumption(model, distances, consumption_per_km):
+    """Calculate the total energy consumed for the bus planning.
+
+    Args:
+        model (PlanningModel): The bus planning.
+        distances (ndarray): Distance in meters for every row, see planning_distances.
+        consumption_per_km (float): Energy consumption per kilometer in kWh.
+
+    Returns:
+        float: Total energy consumed in kWh.
+    """
+    return fleet_kpis(model, distances, consumption_per_km).totals()['energy']
@@ -0,0 +1,89 @@
+"""Reading bus plannings and timetable workbooks.
+
+The functions accept anything `pd.read_excel` accepts: a path, or a file-like
+object such as an upload wrapped in `io.BytesIO`. With a `SheetCache` the
+parsed sheets are stored by the hash of the workbook content, and a workbook
+that was read before is loaded from the cache instead of parsing Excel.
+"""
+import io
+
+import pandas as pd
+
+from bus_checker.cache import content_digest
+from bus_checker.model import PlanningModel
+from bus_checker.schema import compact_distance_matrix, compact_timetable
+
+# Sheets of the timetable workbook
+TIMETABLE_SHEETS = ['Dienstregeling', 'Afstandsmatrix']
+
+
+def _read_bytes(source):
+    """Content of a path or file-like object."""
+    if hasattr(source, 'read'):
+        return source.read()
+    with open(source, 'rb') as file:
+        return file.read()
+
+
+def read_sheets(source, sheets, cache=None, digest=None):
+    """
+    Reads sheets of a workbook, through the cache when one is given.
+
+    Args:
+        source: Path or file-like object of the .xlsx file.
+        sheets (list): Names or positions of the sheets.
+        cache (SheetCache, optional): Cache of parsed sheets.
+        digest (str, optional): Hash of the workbook content, computed when not given.
+
+    Returns:
+        dict: Sheet mapped to its DataFrame.
+    """
+    if cache is not None and cache.available:
+        content = _read_bytes(source)
+        digest = digest or content_digest(content)
+        frames = cache.load(digest, sheets)
+        if frames is not None:
+            return frames
+        source = io.BytesIO(content)
+
+    with pd.ExcelFile(source) as workbook:
+        frames = {sheet: pd.read_excel(workbook, sheet_name=sheet) for sheet in sheets}
+
+    if cache is not None and cache.available:
+        cache.store(digest, frames)
+    return frames
+
+
+def read_planning(source, cache=None, digest=None):
+    """
+    Reads a bus planning workbook into a PlanningModel.
+
+    Args:
+        source: Path or file-like object of the .xlsx file.
+        cache (SheetCache, optional): Cache of parsed sheets.
+        digest (str, optional): Hash of the workbook content, computed when not given.
+
+    Returns:
+        PlanningModel: The normalized bus planning.
+    """
+    return PlanningModel.from_frame(read_sheets(source, [0], cache, digest)[0])
+
+
+def read_timetable(source, cache=None, digest=None):
+    """
+    Reads the timetable and the distance matrix from a timetable workbook.
+
+    Args:
+        source: Path or file-like object of the .xlsx file.
+        cache (SheetCache, optional): Cache of parsed sheets.
+        digest (str, optional): Hash of the workbook content, computed when not given.
+
+    Returns:
+        tuple: The timetable ('Dienstregeling') and the distance matrix ('Afstandsmatrix'), in their compact
+            column types.
+
+    Raises:
+        ValueError: If departures cannot be read, or lines are not whole numbers.
+    """
+    frames = read_sheets(source, TIMETABLE_SHEETS, cache, digest)
+    return compact_timetable(frames['Dienstregeling']), compact_distance_matrix(frames['Afstandsmatrix'])
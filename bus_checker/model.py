@@ -0,0 +1,181 @@
+"""Normalized, read-only representation of a bus planning.
+
+A `PlanningModel` is built once when a planning is loaded. Start and end times
+are parsed a single time into integer minutes since midnight of the service
+day, so every check and KPI can work with plain NumPy arrays instead of
+re-parsing the time columns with its own format.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from bus_checker.schema import compact_planning, parse_clock_minutes
+
+MINUTES_PER_DAY = 24 * 60
+
+# Columns every bus planning needs
+REQUIRED_COLUMNS = ['startlocatie', 'eindlocatie', 'starttijd', 'eindtijd', 'activiteit', 'buslijn', 'omloop nummer']
+
+# Optional columns with the full start and end date and time of an activity
+DATE_COLUMNS = {'starttijd': 'starttijd datum', 'eindtijd': 'eindtijd datum'}
+
+
+def format_minutes(minutes):
+    """
+    Formats minutes since midnight as 'HH:MM' strings.
+
+    Times past midnight keep counting hours ('24:15'), as is common in timetables.
+
+    Args:
+        minutes (array-like): Minutes since midnight.
+
+    Returns:
+        ndarray: Formatted times.
+    """
+    minutes = np.asarray(minutes, dtype=np.int64)
+    if minutes.size == 0:
+        return np.empty(0, dtype=str)
+    hours, rest = np.divmod(minutes, 60)
+    return np.char.add(np.char.add(np.char.zfill(hours.astype(str), 2), ':'), np.char.zfill(rest.astype(str), 2))
+
+
+def _day_offsets(frame):
+    """Minutes to add to the clock times of every row for services past midnight."""
+    # Use the full dates when the planning has them
+    if all(column in frame.columns for column in DATE_COLUMNS.values()):
+        dates = {column: pd.to_datetime(frame[column], errors='coerce') for column in DATE_COLUMNS.values()}
+        if not any(date.isna().any() for date in dates.values()):
+            first_day = dates[DATE_COLUMNS['starttijd']].min().normalize()
+            return {
+                time_column: ((dates[date_column].dt.normalize() - first_day).dt.days * MINUTES_PER_DAY).to_numpy()
+                for time_column, date_column in DATE_COLUMNS.items()
+            }
+
+    # Otherwise a start time more than half a day earlier than the previous
+    # start within the same block means the block continued past midnight
+    start = parse_clock_minutes(frame['starttijd']).to_numpy()
+    block = frame['omloop nummer'].to_numpy()
+    same_block = np.r_[False, block[1:] == block[:-1]]
+    wraps = np.r_[False, np.diff(start) < -MINUTES_PER_DAY / 2] & same_block
+    total = np.cumsum(wraps)
+    block_start = np.flatnonzero(~same_block)
+    block_id = np.cumsum(~same_block) - 1
+    offsets = (total - total[block_start][block_id]) * MINUTES_PER_DAY
+    return {'starttijd': offsets, 'eindtijd': offsets}
+
+
+@dataclass(frozen=True)
+class PlanningModel:
+    """
+    A bus planning parsed once and shared by all checks, KPIs and plots.
+
+    Rows are sorted by block ('omloop nummer') and start time. The frame and the
+    arrays are read-only: functions that need extra columns build their own
+    arrays instead of adding columns to the frame.
+
+    Attributes:
+        frame (DataFrame): The planning with categorical location, activity and line columns.
+        start (ndarray): Start time of every row in minutes since midnight of the service day.
+        end (ndarray): End time of every row in minutes since midnight of the service day.
+        blocks (ndarray): Block number of every row.
+        block_bounds (ndarray): Row offsets where every block starts, followed by the number of rows.
+    """
+    frame: pd.DataFrame
+    start: np.ndarray
+    end: np.ndarray
+    blocks: np.ndarray
+    block_bounds: np.ndarray
+
+    @classmethod
+    def from_frame(cls, bus_planning):
+        """
+        Builds the model from a bus planning as read from Excel.
+
+        Args:
+            bus_planning (DataFrame): The raw bus planning.
+
+        Returns:
+            PlanningModel: The normalized planning.
+
+        Raises:
+            ValueError: If required columns are missing or times cannot be read.
+        """
+        frame = bus_planning.dropna(how='all').copy()
+        frame.columns = frame.columns.astype(str).str.strip()
+
+        missing_columns = set(REQUIRED_COLUMNS) - set(frame.columns)
+        if missing_columns:
+            raise ValueError(f"Missing columns in 'bus_planning': {missing_columns}")
+        if frame.empty:
+            raise ValueError("The bus planning contains no rows.")
+
+        # Locations, activities, lines and clock times as categoricals, block numbers and energies as small types
+        frame = compact_planning(frame)
+
+        # Parse the clock times once and move them onto the service day
+        offsets = _day_offsets(frame)
+        start = parse_clock_minutes(frame['starttijd']) + offsets['starttijd']
+        end = parse_clock_minutes(frame['eindtijd']) + offsets['eindtijd']
+
+        invalid = start.isna() | end.isna()
+        if invalid.any():
+            raise ValueError(f"Could not read 'starttijd' or 'eindtijd' in rows: {list(frame.index[invalid][:10])}")
+
+        # Activities that end before they start continue past midnight
+        end = end.where(end >= start, end + MINUTES_PER_DAY)
+
+        # Sort by block and time, keeping the file order for equal start times
+        frame['_start'] = start.astype(np.int32)
+        frame['_end'] = end.astype(np.int32)
+        frame = frame.sort_values(['omloop nummer', '_start'], kind='stable').reset_index(drop=True)
+        start = frame.pop('_start').to_numpy()
+        end = frame.pop('_end').to_numpy()
+
+        blocks = frame['omloop nummer'].to_numpy()
+        new_block = np.r_[True, blocks[1:] != blocks[:-1]]
+        block_bounds = np.r_[np.flatnonzero(new_block), len(blocks)]
+
+        for array in (start, end, blocks, block_bounds):
+            array.flags.writeable = False
+
+        return cls(frame=frame, start=start, end=end, blocks=blocks, block_bounds=block_bounds)
+
+    def __len__(self):
+        return len(self.frame)
+
+    @property
+    def duration(self):
+        """Duration of every row in minutes."""
+        return self.end - self.start
+
+    @property
+    def n_blocks(self):
+        """Number of blocks in the planning."""
+        return len(self.block_bounds) - 1
+
+    def select_blocks(self, block_numbers):
+        """
+        Returns a model with only the rows of the given blocks, without parsing the planning again.
+
+        Args:
+            block_numbers (array-like): Block numbers ('omloop nummer') to keep.
+
+        Returns:
+            tuple: The smaller PlanningModel and the boolean mask of the selected rows in this model.
+        """
+        rows = np.isin(self.blocks, np.asarray(block_numbers))
+        blocks = self.blocks[rows]
+        new_block = np.r_[True, blocks[1:] != blocks[:-1]] if len(blocks) else np.zeros(0, dtype=bool)
+        block_bounds = np.r_[np.flatnonzero(new_block), len(blocks)]
+
+        arrays = [self.start[rows], self.end[rows], blocks, block_bounds]
+        for array in arrays:
+            array.flags.writeable = False
+
+        frame = self.frame[rows].reset_index(drop=True)
+        return type(self)(frame, *arrays), rows
+
+    def is_activity(self, activity):
+        """Boolean mask of the rows with the given 'activiteit'."""
+        return (self.frame['activiteit'] == activity).to_numpy()
@@ -0,0 +1,212 @@
+"""Background tasks of a script run, cancelled when the run is stale.
+
+Streamlit runs the whole app script again whenever a slider moves or a file is
+uploaded. A `Pipeline` is kept per browser session and runs the loading,
+checks and charts of the latest script run as tasks on a thread pool. The
+script reserves a place for every result and fills it in as soon as its task
+is done, so the first results are shown while the slower charts are still
+being drawn.
+
+Starting a new run cancels the tasks of the previous run that have not
+started yet, and sets its `cancelled` event. A task that is already running
+cannot be interrupted; it finishes in the background and its result is
+dropped, although the caches it filled are kept for the next run.
+
+While the script waits for a result, it calls a yield point every
+`POLL_SECONDS`. In Streamlit, reading `st.session_state` is such a point: it
+raises when a rerun has been requested, so a stale script stops waiting right
+away instead of when its slowest task is done.
+
+The thread pools are shared by the pipelines of all sessions in the process,
+so the number of threads does not grow with the number of sessions.
+"""
+import threading
+from concurrent.futures import FIRST_COMPLETED, CancelledError, Future, ThreadPoolExecutor, wait
+
+from bus_checker.runner import CheckResult, available_cpus, timed_call
+
+# Ways to execute the tasks of a run
+MODES = ('auto', 'serial', 'thread')
+
+# Seconds between two yield points while the script waits for a result
+POLL_SECONDS = 0.1
+
+# Workers of the shared thread pool, at least two so a stale task that is still running does not hold up a new run
+MIN_WORKERS = 2
+
+_EXECUTORS = {}
+_EXECUTORS_LOCK = threading.Lock()
+
+
+def shared_executor(workers):
+    """Thread pool with the given number of workers, shared by all pipelines of the process."""
+    with _EXECUTORS_LOCK:
+        if workers not in _EXECUTORS:
+            _EXECUTORS[workers] = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bus-checker')
+        return _EXECUTORS[workers]
+
+
+class PipelineRun:
+    """
+    The tasks of a single script run.
+
+    Use it as a context manager, so the tasks are cancelled when the script
+    stops with an exception, such as a rerun request.
+
+    Attributes:
+        cancelled (Event): Set when a newer run started or the script stopped.
+    """
+
+    def __init__(self, executor=None, prepare=None, yield_point=None):
+        """
+        Args:
+            executor (Executor, optional): Runs the tasks, None runs them in the calling thread when submitted.
+            prepare (callable, optional): Called in the worker thread before every task.
+            yield_point (callable, optional): Called by the waiting thread every POLL_SECONDS.
+        """
+        self.cancelled = threading.Event()
+        self._executor = executor
+        self._prepare = prepare
+        self._yield_point = yield_point
+        self._futures = {}
+        self._pending = set()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self.cancel()
+        return False
+
+    def _call(self, name, function, args):
+        """Runs a task in a worker thread, unless the run was cancelled before it started."""
+        if self.cancelled.is_set():
+            return CheckResult(name, error=CancelledError(f"'{name}' belongs to a stale run"))
+        if self._prepare is not None:
+            self._prepare()
+        return timed_call(name, function, args)
+
+    def submit(self, name, function, *args):
+        """
+        Starts a task.
+
+        Args:
+            name (str): Name of the task, unique within the run.
+            function (callable): The task.
+            *args: Arguments of the task.
+
+        Returns:
+            Future: Resolves to the CheckResult of the task.
+
+        Raises:
+            ValueError: If a task with the same name was already submitted.
+        """
+        if name in self._futures:
+            raise ValueError(f"Task '{name}' was already submitted to this run")
+
+        if self._executor is None:
+            future = Future()
+            future.set_result(timed_call(name, function, args))
+        else:
+            future = self._executor.submit(self._call, name, function, args)
+        self._futures[name] = future
+        self._pending.add(future)
+        return future
+
+    def _wait(self, futures):
+        """Waits until one of the futures is done, calling the yield point while waiting."""
+        while True:
+            done, _ = wait(futures, timeout=POLL_SECONDS, return_when=FIRST_COMPLETED)
+            if done:
+                return done
+            if self._yield_point is not None:
+                self._yield_point()
+
+    def result(self, name):
+        """
+        Waits for a task.
+
+        Args:
+            name (str): Name of the task.
+
+        Returns:
+            CheckResult: The result of the task, which as_completed does not yield again.
+        """
+        future = self._futures[name]
+        self._wait([future])
+        self._pending.discard(future)
+        return future.result()
+
+    def as_completed(self):
+        """
+        Yields the results that were not collected yet, in order of completion.
+
+        Tasks submitted while iterating, for example to draw the result of a
+        check, are yielded as well.
+
+        Yields:
+            CheckResult: The result of every task.
+        """
+        while self._pending:
+            for future in self._wait(self._pending):
+                self._pending.discard(future)
+                yield future.result()
+
+    def cancel(self):
+        """
+        Cancels the tasks that have not started yet.
+
+        Returns:
+            int: The number of tasks that were cancelled.
+        """
+        self.cancelled.set()
+        return sum(future.cancel() for future in self._futures.values())
+
+
+class Pipeline:
+    """
+    Runs the tasks of the latest script run of a session.
+
+    Attributes:
+        cancelled_tasks (int): Number of tasks of stale runs that were cancelled before they started.
+    """
+
+    def __init__(self):
+        self.cancelled_tasks = 0
+        self._run = None
+        self._lock = threading.Lock()
+
+    def start(self, mode='auto', max_workers=None, prepare=None, yield_point=None):
+        """
+        Starts a new run and cancels the tasks of the previous one.
+
+        The 'auto' and 'thread' modes run the tasks on a shared thread pool,
+        also with a single CPU, so the script thread stays free to show
+        results. The 'serial' mode runs every task in the script thread when
+        it is submitted, so a profiler of that thread sees all of them.
+
+        Args:
+            mode (str): One of 'auto', 'serial' or 'thread'.
+            max_workers (int, optional): Workers of the thread pool, by default one per available CPU.
+            prepare (callable, optional): Called in the worker thread before every task.
+            yield_point (callable, optional): Called by the waiting thread every POLL_SECONDS.
+
+        Returns:
+            PipelineRun: The new run.
+        """
+        if mode not in MODES:
+            raise ValueError(f"Unknown mode '{mode}', expected one of {MODES}")
+
+        executor = None
+        if mode != 'serial':
+            executor = shared_executor(max_workers or max(available_cpus(), MIN_WORKERS))
+        run = PipelineRun(executor, prepare, yield_point)
+
+        with self._lock:
+            previous, self._run = self._run, run
+        if previous is not None:
+            cancelled = previous.cancel()
+            with self._lock:
+                self.cancelled_tasks += cancelled
+        return run
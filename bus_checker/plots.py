@@ -0,0 +1,338 @@
+"""Charts of a bus planning.
+
+Every function returns a matplotlib Figure, which the app displays with
+`st.pyplot`. Matplotlib and seaborn are imported when the first chart is
+drawn, so the checks, the command line tool and worker processes that import
+this package do not pay for loading the plotting libraries.
+"""
+import io
+
+import numpy as np
+import pandas as pd
+
+from bus_checker.soc import lttb_downsample, minmax_downsample
+
+
+def _subplots(figsize):
+    """Create a figure with a single axis without using the global pyplot state."""
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=figsize)
+    return fig, fig.subplots()
+
+
+# Colors of the Gantt chart: regular trips by line, other rows by activity
+LINE_COLORS = {400: 'blue', 401: 'yellow'}
+ACTIVITY_COLORS = {'materiaal rit': 'green', 'idle': 'red', 'opladen': 'orange'}
+OTHER_COLOR = 'gray'
+
+# Above this number of blocks the Gantt chart is zoomed out: the bars are aggregated
+# into an image with one pixel row per block and about ZOOMED_OUT_LABELS labelled blocks
+DETAIL_BLOCKS = 50
+ZOOMED_OUT_LABELS = 25
+
+# Number of time bins of a zoomed out Gantt chart
+ZOOMED_OUT_RESOLUTION = 1200
+
+
+def schedule_bars(model):
+    """
+    Computes the bars of the Gantt chart.
+
+    Args:
+        model (PlanningModel): The bus planning.
+
+    Returns:
+        dict: Arrays 'row' (position of the block), 'start' and 'end' in hours and 'color' (index into the list
+            'colors') for every row of the planning.
+    """
+    # Vectorized color of every row: the line for regular trips, otherwise the activity
+    colors = list(LINE_COLORS.values()) + list(ACTIVITY_COLORS.values()) + [OTHER_COLOR]
+    lines = pd.to_numeric(model.frame['buslijn'].astype(object), errors='coerce').to_numpy()
+    activity = model.frame['activiteit'].astype(object).to_numpy()
+    color = np.full(len(model), len(colors) - 1)
+    for code, name in enumerate(ACTIVITY_COLORS):
+        color[activity == name] = len(LINE_COLORS) + code
+    for code, line in enumerate(LINE_COLORS):
+        color[lines == line] = code
+
+    # Start and end in hours, ensuring a minimum duration for visibility
+    start = model.start / 60
+    end = start + np.maximum(model.duration / 60, 0.05)
+    row = np.repeat(np.arange(model.n_blocks), np.diff(model.block_bounds))
+    return {'row': row, 'start': start, 'end': end, 'color': color, 'colors': colors}
+
+
+def schedule_raster(bars, n_rows, resolution=ZOOMED_OUT_RESOLUTION):
+    """
+    Aggregates the bars of the Gantt chart into time bins.
+
+    Every bin takes the color of the bar that covers its center. The bars must
+    be sorted by row and start, as the rows of a PlanningModel are.
+
+    Args:
+        bars (dict): Bars as returned by schedule_bars.
+        n_rows (int): Number of blocks.
+        resolution (int): Number of time bins.
+
+    Returns:
+        tuple: Color index per block and bin (-1 where no bar is), and the start and end of the time axis in hours.
+    """
+    first, last = bars['start'].min(), bars['end'].max()
+    edges = np.linspace(first, last, resolution + 1)
+    centers = (edges[:-1] + edges[1:]) / 2
+
+    # Find the last bar starting before the center of every bin with one search
+    stride = last + 1
+    bar_keys = bars['row'] * stride + bars['start']
+    cell_rows = np.repeat(np.arange(n_rows), resolution)
+    cell_times = np.tile(centers, n_rows)
+    bar = np.searchsorted(bar_keys, cell_rows * stride + cell_times, side='right') - 1
+
+    covered = (bar >= 0) & (bars['row'][bar] == cell_rows) & (cell_times < bars['end'][bar])
+    raster = np.full(n_rows * resolution, -1)
+    raster[covered] = bars['color'][bar[covered]]
+    return raster.reshape(n_rows, resolution), (first, last)
+
+
+def plot_schedule_from_excel(model):
+    """Plot a Gantt chart for bus scheduling based on a PlanningModel."""
+    from matplotlib.collections import PolyCollection
+    from matplotlib.colors import to_rgba_array
+    from matplotlib.patches import Patch
+
+    bars = schedule_bars(model)
+    zoomed_out = model.n_blocks > DETAIL_BLOCKS
+    fig, ax = _subplots(figsize=(12, 6))
+
+    if zoomed_out:
+        # Draw the aggregated bars as a single image, empty bins stay white
+        raster, (first, last) = schedule_raster(bars, model.n_blocks)
+        palette = np.vstack([to_rgba_array(bars['colors']), to_rgba_array(['white'])])
+        ax.imshow(
+            palette[raster], aspect='auto', interpolation='nearest', origin='lower',
+            extent=(first, last, -0.5, model.n_blocks - 0.5),
+        )
+    else:
+        # Draw the bars of every color as a single collection of rectangles
+        for code, color in enumerate(bars['colors']):
+            selected = bars['color'] == code
+            if not selected.any():
+                continue
+            left, right = bars['start'][selected], bars['end'][selected]
+            bottom = bars['row'][selected] - 0.4
+            top = bottom + 0.8
+            vertices = np.stack([
+                np.column_stack([left, bottom]), np.column_stack([left, top]),
+                np.column_stack([right, top]), np.column_stack([right, bottom]),
+            ], axis=1)
+            ax.add_collection(PolyCollection(vertices, facecolors=color, edgecolors='black'))
+        ax.autoscale_view()
+
+    # Add labels and legend to the chart
+    block_numbers = model.blocks[model.block_bounds[:-1]]
+    step = -(-model.n_blocks // ZOOMED_OUT_LABELS) if zoomed_out else 1
+    ax.set_yticks(np.arange(0, model.n_blocks, step))
+    ax.set_yticklabels(block_numbers[::step])
+    ax.set_xlabel('Time (hours)')
+    ax.set_ylabel('Bus Number')
+    ax.set_title('Gantt Chart for Bus Scheduling')
+
+    # Define legend elements
+    legend_elements = [
+        Patch(facecolor=LINE_COLORS[400], edgecolor='black', label='Regular trip 400'),
+        Patch(facecolor=LINE_COLORS[401], edgecolor='black', label='Regular trip 401'),
+        Patch(facecolor=ACTIVITY_COLORS['materiaal rit'], edgecolor='black', label='Deadhead trip'),
+        Patch(facecolor=ACTIVITY_COLORS['idle'], edgecolor='black', label='Idle'),
+        Patch(facecolor=ACTIVITY_COLORS['opladen'], edgecolor='black', label='Charging')
+    ]
+
+    # A fixed position beside the chart, finding the 'best' position is slow with many bars
+    ax.legend(handles=legend_elements, title='Legend', loc='upper left', bbox_to_anchor=(1, 1))
+
+    return fig
+
+
+def figure_png(fig):
+    """Render a figure to PNG bytes, so a rendered chart can be cached and shown again without drawing it."""
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png', bbox_inches='tight')
+    return buffer.getvalue()
+
+
+def plot_activity_pie_chart(kpis):
+    """
+    Create a pie chart showing the distribution of activities in the total planning, from its FleetKPIs.
+    """
+    # Total duration per activity
+    stapel_data = kpis.activity_hours()
+
+    nieuwe_labels = ['Regular Trip', 'Idle', 'Deadhead Trip', 'Charging']
+
+    # Create the pie chart
+    fig, ax = _subplots(figsize=(8, 8))
+    ax.pie(
+        stapel_data['duur'], 
+        labels=None, 
+        autopct=lambda pct: f'{pct:.1f}%', 
+        startangle=90, 
+        colors=['blue', 'red', 'green', 'orange'], 
+        textprops={'fontsize': 14, 'fontweight': 'bold'}
+    )
+    ax.legend(nieuwe_labels, loc="best")
+    ax.set_title('Distribution of Activities in the Total Planning')
+    return fig
+
+
+def plot_charging_heatmap(model):
+    """
+    Create a heatmap showing the 'Charging' activity by hour of the day.
+    """
+    # Hour of the day in which each charging session starts
+    uur = (model.start[model.is_activity('opladen')] // 60) % 24
+
+    # Count occurrences of charging by hour
+    heatmap_data = np.bincount(uur, minlength=24)
+
+    # Create the heatmap
+    import seaborn as sns
+
+    fig, ax = _subplots(figsize=(10, 6))
+    sns.heatmap(
+        heatmap_data.reshape(1, -1), 
+        cmap='YlGnBu', 
+        annot=True, 
+        cbar=True, 
+        ax=ax, 
+        xticklabels=[f"{hour}:00" for hour in range(24)], 
+        yticklabels=["Charging"]
+    )
+    ax.set_title('Heatmap of Activity "Charging" per Hour')
+    ax.set_xlabel('Hour of the Day')
+    ax.set_ylabel('Activity')
+    return fig
+
+
+def plot_activity_bar_chart(kpis):
+    """
+    Create a bar chart showing the total time spent on each activity, from the FleetKPIs of the planning.
+    """
+    # Total duration per activity
+    stapel_data = kpis.activity_hours()
+
+    # Create the bar chart
+    fig, ax = _subplots(figsize=(10, 6))
+    ax.bar(stapel_data['activiteit'], stapel_data['duur'], color=['blue', 'red', 'green', 'orange'])
+    nieuwe_labels = ['Regular Trip', 'Idle', 'Deadhead Trip', 'Charging']
+    ax.set_xticks(range(len(nieuwe_labels)))
+    ax.set_xticklabels(nieuwe_labels, fontsize=12)
+    ax.set_title('Total Time per Activity')
+    ax.set_xlabel('Activity')
+    ax.set_ylabel('Total Time (Hours)')
+    return fig
+
+
+def plot_feasibility_heatmap(sweep, min_SOC):
+    """
+    Create a heatmap of the lowest State Of Charge of the planning for every SOH and consumption per km.
+
+    Cells below the minimum SOC, where the planning fails the battery check, are red.
+    """
+    # Lowest SOC of all blocks per combination, 100% where no level is known
+    lowest = np.minimum(sweep.planning_lowest_soc(), 100)
+
+    import seaborn as sns
+    from matplotlib.colors import TwoSlopeNorm
+
+    fig, ax = _subplots(figsize=(12, 6))
+    sns.heatmap(
+        lowest,
+        cmap='RdYlGn',
+        norm=TwoSlopeNorm(vcenter=min_SOC, vmin=0, vmax=100),
+        annot=True,
+        fmt='.0f',
+        cbar_kws={'label': 'Lowest State Of Charge (%)'},
+        ax=ax,
+        xticklabels=[f'{value:g}' for value in sweep.consumption_per_km],
+        yticklabels=[f'{value:g}' for value in sweep.SOH],
+    )
+    ax.invert_yaxis()
+    ax.set_title(f'Lowest State Of Charge per Scenario (feasible from {min_SOC}%)')
+    ax.set_xlabel('Consumption (kWh per km)')
+    ax.set_ylabel('State Of Health (%)')
+    return fig
+
+
+def plot_charger_occupancy(occupancy, max_chargers, max_power):
+    """
+    Create a line chart of the chargers in use and the power drawn during the day.
+
+    The limits of the depot are drawn as dashed lines, and the periods in which a limit is exceeded are shaded.
+    """
+    hours = occupancy.minutes / 60
+
+    fig, ax = _subplots(figsize=(12, 4))
+    ax.step(hours, occupancy.chargers, where='post', color='orange', linewidth=2.5, label='Chargers in use')
+    ax.axhline(max_chargers, color='orange', linestyle='--', label='Chargers at the depot')
+    ax.set_xlabel('Hour of the Day')
+    ax.set_ylabel('Chargers')
+
+    power_ax = ax.twinx()
+    power_ax.step(hours, occupancy.power, where='post', color='blue', alpha=0.6, label='Power drawn')
+    power_ax.axhline(max_power, color='blue', linestyle='--', label='Grid power limit')
+    power_ax.set_ylabel('Power (kW)')
+
+    # Shade every run of minutes above a limit
+    over = (occupancy.chargers > max_chargers) | (occupancy.power > max_power)
+    edges = np.diff(np.r_[0, over.astype(np.int8), 0])
+    for first, stop in zip(np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)):
+        ax.axvspan(hours[first], hours[stop - 1] + 1 / 60, color='red', alpha=0.15)
+
+    handles = ax.get_legend_handles_labels()[0] + power_ax.get_legend_handles_labels()[0]
+    ax.legend(handles=handles, loc='upper left', bbox_to_anchor=(1.08, 1))
+    ax.set_title('Charger Occupancy During the Day')
+    return fig
+
+
+# Points drawn per block in the battery chart
+SOC_POINTS = 600
+
+
+def plot_soc_series(series, min_SOC, points=SOC_POINTS, method='minmax'):
+    """
+    Create a line chart of the state of charge of every block during the day.
+
+    The series are downsampled to about `points` points per block before drawing, and all blocks are drawn as
+    a single collection of lines. Blocks that drop below the minimum SOC are red.
+
+    Args:
+        series (SOCSeries): State of charge of every block on a minute grid.
+        min_SOC (float): Minimum state of charge in percent, drawn as a dashed line.
+        points (int): Number of points per block.
+        method (str): 'minmax' keeps the lowest and highest value of every bin, 'lttb' the shape of every line.
+    """
+    from matplotlib.collections import LineCollection
+
+    if method == 'minmax':
+        # Two points per bin
+        x, y = minmax_downsample(series.minutes, series.soc, points // 2)
+    else:
+        x, y = lttb_downsample(series.minutes, series.soc, points)
+    failing = np.isin(series.blocks, series.below(min_SOC))
+
+    # Lines of many blocks are drawn transparent, so the busy parts of the chart are darker
+    fig, ax = _subplots(figsize=(12, 6))
+    alpha = min(1, max(0.1, 20 / max(len(y), 1)))
+    lines = np.stack([np.broadcast_to(x, y.shape) / 60, y], axis=2)
+    ax.add_collection(LineCollection(lines[~failing], colors='tab:blue', linewidths=1, alpha=alpha))
+    ax.add_collection(LineCollection(lines[failing], colors='red', linewidths=1, alpha=alpha))
+    ax.axhline(min_SOC, color='black', linestyle='--', label=f'Minimum State Of Charge ({min_SOC}%)')
+    if len(series.minutes):
+        ax.set_xlim(series.minutes[0] / 60, series.minutes[-1] / 60)
+    ax.set_ylim(0, 100)
+
+    ax.set_xlabel('Hour of the Day')
+    ax.set_ylabel('State Of Charge (%)')
+    ax.set_title(f'State Of Charge of {len(y)} Buses ({failing.sum()} below the minimum)')
+    ax.legend(loc='lower left')
+    return fig
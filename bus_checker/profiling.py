@@ -0,0 +1,268 @@
+"""Timing and memory instrumentation of a validation run.
+
+A `RunProfiler` records the wall time and the number of rows of every step of
+a run: loading the files, every check, KPI and plot. Every step is also
+logged as a JSON line on the 'bus_checker.performance' logger, so the timings
+can be collected from production logs. The lines are only written when a
+handler is configured for that logger at INFO level; `enable_json_log` adds
+one, and the app calls it when the BUS_CHECKER_PERFORMANCE_LOG environment
+variable is set.
+
+Measuring peak memory (with tracemalloc) and capturing a full profile (with
+cProfile or pyinstrument) slow a run down, so both are opt-in. The profile
+capture can also be switched on with the BUS_CHECKER_PROFILE environment
+variable, without changing code. Both only see the thread that runs the
+profiler, so checks should run one after another while they are on.
+"""
+import io
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+
+import pandas as pd
+
+LOGGER = logging.getLogger('bus_checker.performance')
+
+# Ways to capture a profile of a whole run
+CAPTURE_MODES = ('cprofile', 'pyinstrument')
+
+# Profile capture of every run, switched on without changing code with the environment variable
+DEFAULT_CAPTURE = os.environ.get('BUS_CHECKER_PROFILE', '').lower() or None
+
+# JSON lines of every run on standard error, switched on without changing code with the environment variable
+DEFAULT_JSON_LOG = os.environ.get('BUS_CHECKER_PERFORMANCE_LOG', '').lower() not in ('', '0', 'false', 'no', 'off')
+
+# Number of functions in a cProfile report
+REPORT_FUNCTIONS = 30
+
+_JSON_HANDLER = None
+_JSON_HANDLER_LOCK = threading.Lock()
+
+
+def enable_json_log(stream=None):
+    """
+    Writes the JSON lines of the performance logger to a stream, one line per record.
+
+    The handler is added once, so the function can be called on every rerun of the app.
+
+    Args:
+        stream (file, optional): Where the lines are written, standard error by default.
+
+    Returns:
+        Handler: The handler of the JSON lines.
+    """
+    global _JSON_HANDLER
+    with _JSON_HANDLER_LOCK:
+        if _JSON_HANDLER is None:
+            _JSON_HANDLER = logging.StreamHandler(stream)
+            _JSON_HANDLER.setFormatter(logging.Formatter('%(message)s'))
+            LOGGER.addHandler(_JSON_HANDLER)
+            LOGGER.setLevel(logging.INFO)
+        return _JSON_HANDLER
+
+
+@dataclass
+class StepRecord:
+    """
+    Measurements of a single step of a run.
+
+    Attributes:
+        name (str): Name of the step.
+        kind (str): Kind of step, such as 'load', 'check', 'kpi' or 'plot'.
+        seconds (float): Wall time of the step in seconds.
+        rows (int): Number of rows the step processed, None if not applicable.
+        peak_memory (int): Peak memory allocated during the step in bytes, None if memory was not traced.
+        error (str): The error raised by the step, None if it succeeded.
+    """
+    name: str
+    kind: str
+    seconds: float = 0.0
+    rows: int = None
+    peak_memory: int = None
+    error: str = None
+
+
+class RunProfiler:
+    """
+    Collects the measurements of the steps of one run.
+
+    Use it as a context manager around the run, and `step` or `timed` around
+    every step. The records can be read while the run is in progress.
+
+    Attributes:
+        run_id (str): Identifier of the run in the JSON logs.
+        trace_memory (bool): Whether the peak memory of every step is measured.
+        capture (str): 'cprofile', 'pyinstrument' or None.
+        records (list): A StepRecord per finished step.
+        report (str): Text report of the captured profile, None until the run has finished.
+    """
+
+    def __init__(self, trace_memory=False, capture=DEFAULT_CAPTURE):
+        """
+        Args:
+            trace_memory (bool): Measure the peak memory of every step.
+            capture (str, optional): Capture a profile of the whole run, by default from BUS_CHECKER_PROFILE.
+
+        Raises:
+            ValueError: If the capture is not one of CAPTURE_MODES.
+        """
+        if capture is not None and capture.lower() not in CAPTURE_MODES:
+            raise ValueError(f"Unknown profile capture '{capture}', expected one of {CAPTURE_MODES}")
+
+        self.run_id = uuid.uuid4().hex[:12]
+        self.trace_memory = trace_memory
+        self.capture = capture and capture.lower()
+        self.records = []
+        self.report = None
+        self._lock = threading.Lock()
+        self._memory_steps = 0
+        self._started_tracing = False
+        self._profiler = None
+        self._start = None
+
+    @property
+    def serial(self):
+        """Whether checks should run one after another for the measurements to be attributable."""
+        return self.trace_memory or self.capture is not None
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+        if self.capture == 'cprofile':
+            import cProfile
+
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        elif self.capture == 'pyinstrument':
+            try:
+                from pyinstrument import Profiler
+            except ImportError:
+                self.report = 'pyinstrument is not installed, no profile was captured.'
+            else:
+                self._profiler = Profiler()
+                self._profiler.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.capture == 'cprofile' and self._profiler is not None:
+            import pstats
+
+            self._profiler.disable()
+            stream = io.StringIO()
+            pstats.Stats(self._profiler, stream=stream).sort_stats('cumulative').print_stats(REPORT_FUNCTIONS)
+            self.report = stream.getvalue()
+        elif self.capture == 'pyinstrument' and self._profiler is not None:
+            self._profiler.stop()
+            self.report = self._profiler.output_text()
+
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+        self._log({
+            'event': 'run',
+            'seconds': time.perf_counter() - self._start,
+            'steps': len(self.records),
+            'capture': self.capture,
+        })
+        return False
+
+    @contextmanager
+    def step(self, name, kind, rows=None):
+        """
+        Measures a step.
+
+        The yielded record can be updated inside the block, for example with
+        the number of rows once they are known. The peak memory is only
+        measured for steps that do not overlap with another measured step.
+
+        Args:
+            name (str): Name of the step.
+            kind (str): Kind of step, such as 'load', 'check', 'kpi' or 'plot'.
+            rows (int, optional): Number of rows the step processes.
+
+        Yields:
+            StepRecord: The record of the step.
+        """
+        record = StepRecord(name, kind, rows=rows)
+        measure_memory = False
+        if self.trace_memory and tracemalloc.is_tracing():
+            with self._lock:
+                measure_memory = self._memory_steps == 0
+                self._memory_steps += 1
+            if measure_memory:
+                tracemalloc.reset_peak()
+                baseline = tracemalloc.get_traced_memory()[0]
+
+        start = time.perf_counter()
+        try:
+            yield record
+        except Exception as e:
+            record.error = str(e)
+            raise
+        finally:
+            record.seconds = time.perf_counter() - start
+            if self.trace_memory and tracemalloc.is_tracing():
+                if measure_memory:
+                    record.peak_memory = max(tracemalloc.get_traced_memory()[1] - baseline, 0)
+                with self._lock:
+                    self._memory_steps -= 1
+            with self._lock:
+                self.records.append(record)
+            self._log({'event': 'step', **asdict(record)})
+
+    def timed(self, name, kind, function, rows=None):
+        """
+        Wraps a function so every call is measured as a step.
+
+        Args:
+            name (str): Name of the step.
+            kind (str): Kind of step.
+            function (callable): The function to measure.
+            rows (int or callable, optional): Number of rows the function processes, or a function that counts
+                them in its return value.
+
+        Returns:
+            callable: The measured function.
+        """
+        def measured(*args, **kwargs):
+            with self.step(name, kind, None if callable(rows) else rows) as record:
+                value = function(*args, **kwargs)
+                if callable(rows):
+                    record.rows = rows(value)
+                return value
+        return measured
+
+    def to_frame(self):
+        """The records as a DataFrame, with the peak memory in MB."""
+        with self._lock:
+            records = [asdict(record) for record in self.records]
+        frame = pd.DataFrame(records, columns=list(StepRecord.__dataclass_fields__))
+        frame['peak_memory'] = frame['peak_memory'] / 1024 ** 2
+        return frame.rename(columns={'peak_memory': 'peak memory (MB)'})
+
+    def to_json(self):
+        """The run and its records as a JSON document."""
+        with self._lock:
+            records = [asdict(record) for record in self.records]
+        return json.dumps({
+            'run_id': self.run_id,
+            'trace_memory': self.trace_memory,
+            'capture': self.capture,
+            'steps': records,
+            'report': self.report,
+        }, indent=2)
+
+    def _log(self, fields):
+        """Writes a JSON line to the performance logger."""
+        if LOGGER.isEnabledFor(logging.INFO):
+            LOGGER.info(json.dumps({'run_id': self.run_id, **fields}, default=str))
@@ -0,0 +1,310 @@
+"""Charging repairs for blocks that fail the battery check.
+
+Only idle time is changed, so every regular trip keeps its place in the
+timetable. An idle activity at the garage can become a charging activity
+('opladen'). An idle activity elsewhere can make room for a deadhead
+trip ('materiaal rit') to the garage, a charging session and a deadhead trip
+back, when the idle time is long enough for both trips, which take their
+minimum travel time from the distance matrix, and a charge.
+
+A block is repaired greedily, much like the fixed charging pattern of the
+planning notebook but only where the battery needs it: as long as the battery
+drops below the minimum, every idle activity before the first failing row is
+tried, and the repair that moves the first failure furthest, or removes all
+of them, is kept. Every candidate is checked by simulating only its own block
+again, so the cost of a repair does not depend on the size of the planning.
+A block that still fails after its repairs is left as it was, so the repaired
+planning only changes blocks that pass.
+"""
+import io
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from bus_checker.battery import CHARGING_SPEED_90, GARAGE, IDLE_CONSUMPTION, simulate_battery_levels
+from bus_checker.checks import check_battery_status, planning_distances
+from bus_checker.model import DATE_COLUMNS, MINUTES_PER_DAY, format_minutes
+from bus_checker.routes import DistanceLookup
+
+# Shortest charging session worth driving to the garage for, in minutes
+MIN_CHARGE_MINUTES = 5
+
+# Most repairs tried per block before it is reported as not repairable
+MAX_REPAIRS_PER_BLOCK = 10
+
+
+@dataclass(frozen=True)
+class RepairResult:
+    """
+    A bus planning with charging repairs.
+
+    Attributes:
+        planning (DataFrame): The repaired planning, in the schema of the uploaded planning.
+        repairs (DataFrame): One row per repair of a repaired block, with its block, kind, location, times and
+            extra distance.
+        unrepaired (ndarray): Blocks that still fail the battery check, left unchanged in the planning.
+    """
+    planning: pd.DataFrame
+    repairs: pd.DataFrame
+    unrepaired: np.ndarray
+
+    @property
+    def repaired(self):
+        """Blocks that pass the battery check after their repairs."""
+        return self.repairs['omloop nummer'].unique()
+
+
+class _Block:
+    """
+    The activities of one block being repaired, as arrays.
+
+    Attributes:
+        source (ndarray): Row of the planning every activity comes from, the idle row for inserted activities.
+        changed (ndarray): Whether the activity was inserted by a repair.
+    """
+
+    def __init__(self, source, activity, locations, start, end, distances, changed=None):
+        self.source = source
+        self.activity = activity
+        self.locations = locations
+        self.start = start
+        self.end = end
+        self.distances = distances
+        self.changed = np.zeros(len(source), bool) if changed is None else changed
+
+    def replaced(self, position, new_rows, locations):
+        """
+        The block with one row replaced by new rows.
+
+        Args:
+            position (int): Position of the replaced row.
+            new_rows (list): New rows as (activity, distance, minutes), starting where the replaced row starts.
+            locations (list): Start and end location of every new row, None to keep those of the replaced row.
+
+        Returns:
+            _Block: The changed block.
+        """
+        activity, distance, minutes = (np.array(values) for values in zip(*new_rows))
+        start = self.start[position] + np.r_[0, np.cumsum(minutes)[:-1]]
+        if locations is None:
+            locations = [self.locations[position]] * len(new_rows)
+
+        def splice(values, new):
+            return np.concatenate([values[:position], np.asarray(new, dtype=values.dtype), values[position + 1:]])
+
+        return _Block(
+            source=splice(self.source, np.full(len(new_rows), self.source[position])),
+            activity=splice(self.activity, activity),
+            locations=splice(self.locations, np.array(locations, dtype=object).reshape(-1, 2)),
+            start=splice(self.start, start),
+            end=splice(self.end, start + minutes),
+            distances=splice(self.distances, distance),
+            changed=splice(self.changed, np.ones(len(new_rows), bool)),
+        )
+
+    def first_failure(self, max_capacity, min_battery, consumption_per_km):
+        """Start minute of the first activity below the minimum battery level, infinity if there is none."""
+        is_charging = self.activity == 'opladen'
+        consumption = np.where(
+            self.activity == 'idle', IDLE_CONSUMPTION, self.distances / 1000 * max(consumption_per_km, 0.7)
+        )
+        levels = simulate_battery_levels(
+            np.zeros(len(self.activity)), is_charging, consumption, self.end - self.start, max_capacity
+        )
+        failed = np.flatnonzero(levels < min_battery)
+        return self.start[failed[0]] if len(failed) else np.inf
+
+
+def _candidates(block, before, charging_stop):
+    """
+    Possible repairs of the idle activities that start before a minute.
+
+    Args:
+        block (_Block): The block being repaired.
+        before (float): Only idle activities starting before this minute can help.
+        charging_stop (callable): Maps a location to the (minutes, meters) of the trips to and from the garage.
+
+    Yields:
+        tuple: Position of the idle row, kind of repair, new rows as (activity, distance, minutes), their
+            locations and the extra meters.
+    """
+    for position in np.flatnonzero((block.activity == 'idle') & (block.start < before)):
+        location = block.locations[position, 0]
+        minutes = block.end[position] - block.start[position]
+        if location == GARAGE:
+            yield position, 'charge while idle', [('opladen', 0.0, minutes)], None, 0.0
+            continue
+
+        trips = charging_stop(location)
+        if trips is None:
+            continue
+        (to_minutes, to_meters), (back_minutes, back_meters) = trips
+        charge = minutes - to_minutes - back_minutes
+        if charge >= MIN_CHARGE_MINUTES:
+            new_rows = [
+                ('materiaal rit', to_meters, to_minutes), ('opladen', 0.0, charge), ('materiaal rit', back_meters, back_minutes)
+            ]
+            locations = [(location, GARAGE), (GARAGE, GARAGE), (GARAGE, location)]
+            yield position, 'charging stop', new_rows, locations, to_meters + back_meters
+
+
+def _planning_rows(frame, blocks, consumption_per_km, first_day):
+    """
+    Rows of the planning for the repaired blocks, in the columns of the uploaded planning.
+
+    Args:
+        frame (DataFrame): The rows of the planning.
+        blocks (list): The repaired blocks.
+        consumption_per_km (float): Energy consumption per kilometer in kWh.
+        first_day (Timestamp): Service day of the date columns, None if the planning has none.
+
+    Returns:
+        DataFrame: The rows of the blocks, the inserted ones filled in from the idle row they replace.
+    """
+    def joined(name):
+        return np.concatenate([getattr(block, name) for block in blocks])
+
+    changed, start, end = joined('changed'), joined('start'), joined('end')
+    rows = frame.iloc[joined('source')].reset_index(drop=True).assign(_start=start)
+    if not changed.any():
+        return rows
+
+    activity, locations = joined('activity')[changed], joined('locations')[changed]
+    start, end = start[changed], end[changed]
+    rows.loc[changed, 'startlocatie'] = locations[:, 0]
+    rows.loc[changed, 'eindlocatie'] = locations[:, 1]
+    rows.loc[changed, 'activiteit'] = activity
+    rows.loc[changed, 'buslijn'] = np.nan
+    rows.loc[changed, 'starttijd'] = np.char.add(format_minutes(start % MINUTES_PER_DAY), ':00')
+    rows.loc[changed, 'eindtijd'] = np.char.add(format_minutes(end % MINUTES_PER_DAY), ':00')
+    if first_day is not None:
+        rows.loc[changed, DATE_COLUMNS['starttijd']] = first_day + pd.to_timedelta(start, unit='min')
+        rows.loc[changed, DATE_COLUMNS['eindtijd']] = first_day + pd.to_timedelta(end, unit='min')
+    if 'energieverbruik' in rows.columns:
+        rows['energieverbruik'] = rows['energieverbruik'].astype(float)
+        rows.loc[changed, 'energieverbruik'] = np.select(
+            [activity == 'opladen', activity == 'idle'],
+            [-(end - start) * CHARGING_SPEED_90, IDLE_CONSUMPTION],
+            joined('distances')[changed] / 1000 * consumption_per_km,
+        )
+    return rows
+
+
+def repair_battery(model, distance_matrix, SOH, min_SOC, consumption_per_km, max_repairs=MAX_REPAIRS_PER_BLOCK):
+    """
+    Proposes charging repairs for every block that fails the battery check.
+
+    Args:
+        model (PlanningModel): The bus planning.
+        distance_matrix (DataFrame or DistanceLookup): Distances and travel times between locations.
+        SOH (float): State of Health of the battery as a percentage.
+        min_SOC (float): Minimum state of charge required as a percentage.
+        consumption_per_km (float): Energy consumption per kilometer in kWh.
+        max_repairs (int): Most repairs per block.
+
+    Returns:
+        RepairResult: The repaired planning, the repairs and the blocks that could not be repaired.
+    """
+    if not isinstance(distance_matrix, DistanceLookup):
+        distance_matrix = DistanceLookup(distance_matrix)
+    max_capacity = 300 * (SOH / 100)
+    min_battery = max_capacity * (min_SOC / 100)
+
+    distances = planning_distances(model, distance_matrix)
+    failing = check_battery_status(model, distances, SOH, min_SOC, consumption_per_km)
+    failing_blocks = np.unique(failing['omloop nummer']) if not failing.empty else np.empty(0)
+
+    # Travel time and distance of the trips to and from the garage, per location
+    stops = {}
+
+    def charging_stop(location):
+        if location not in stops:
+            trips = pd.DataFrame(
+                {'startlocatie': [location, GARAGE], 'eindlocatie': [GARAGE, location], 'buslijn': np.nan}
+            )
+            codes = distance_matrix.route_codes(trips)
+            minutes, meters = np.ceil(distance_matrix.min_time[codes]), distance_matrix.distance[codes]
+            known = not np.isnan(minutes).any() and not np.isnan(meters).any()
+            stops[location] = tuple(zip(minutes.astype(int), meters)) if known else None
+        return stops[location]
+
+    # The rows of the planning in the columns of the upload, categoricals as plain values
+    frame = model.frame
+    frame = frame.astype({column: object for column in frame.select_dtypes('category')})
+    locations = frame[['startlocatie', 'eindlocatie']].to_numpy(dtype=object)
+    activity = frame['activiteit'].to_numpy(dtype=object)
+
+    repairs, unrepaired, repaired_blocks = [], [], {}
+    for block_number in failing_blocks:
+        rows = np.flatnonzero(model.blocks == block_number)
+        block = _Block(rows, activity[rows], locations[rows], model.start[rows], model.end[rows], distances[rows])
+
+        failure = block.first_failure(max_capacity, min_battery, consumption_per_km)
+        block_repairs = []
+        for _ in range(max_repairs):
+            if failure == np.inf:
+                break
+
+            # Keep the repair that moves the first failure furthest, preferring the least extra distance
+            best, best_key = None, (failure, 0)
+            for position, kind, new_rows, new_locations, extra in _candidates(block, failure, charging_stop):
+                repaired = block.replaced(position, new_rows, new_locations)
+                key = (repaired.first_failure(max_capacity, min_battery, consumption_per_km), -extra)
+                if key > best_key:
+                    best, best_key = (position, kind, new_rows, repaired, extra), key
+            if best is None:
+                break
+
+            position, kind, new_rows, repaired, extra = best
+            block_repairs.append({
+                'omloop nummer': block_number,
+                'repair': kind,
+                'locatie': block.locations[position, 0],
+                'starttijd': format_minutes(block.start[position:position + 1] % MINUTES_PER_DAY)[0],
+                'eindtijd': format_minutes(block.end[position:position + 1] % MINUTES_PER_DAY)[0],
+                'charging minutes': next(minutes for activity, _, minutes in new_rows if activity == 'opladen'),
+                'extra distance (m)': extra,
+            })
+            block, failure = repaired, best_key[0]
+
+        # A block that still fails keeps its original rows, its partial repairs are dropped
+        if failure != np.inf:
+            unrepaired.append(block_number)
+        else:
+            repairs.extend(block_repairs)
+            repaired_blocks[block_number] = block
+
+    # Put the repaired blocks back in place of their original rows
+    first_day = None
+    if all(column in frame.columns for column in DATE_COLUMNS.values()):
+        first_day = pd.to_datetime(frame[DATE_COLUMNS['starttijd']], errors='coerce').min().normalize()
+    kept = ~np.isin(model.blocks, list(repaired_blocks))
+    parts = [frame[kept].assign(_start=model.start[kept])]
+    if repaired_blocks:
+        parts.append(_planning_rows(frame, list(repaired_blocks.values()), consumption_per_km, first_day))
+    planning = pd.concat(parts, ignore_index=True)
+    planning = planning.sort_values(['omloop nummer', '_start'], kind='stable').reset_index(drop=True)
+
+    return RepairResult(
+        planning=planning.drop(columns='_start'),
+        repairs=pd.DataFrame(repairs, columns=[
+            'omloop nummer', 'repair', 'locatie', 'starttijd', 'eindtijd', 'charging minutes', 'extra distance (m)'
+        ]),
+        unrepaired=np.array(unrepaired),
+    )
+
+
+def planning_workbook(planning):
+    """
+    Writes a bus planning to an .xlsx workbook, in the layout of the uploaded planning.
+
+    Args:
+        planning (DataFrame): The bus planning, such as a repaired planning.
+
+    Returns:
+        bytes: Content of the workbook.
+    """
+    buffer = io.BytesIO()
+    planning.to_excel(buffer, index=False)
+    return buffer.getvalue()
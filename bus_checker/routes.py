@@ -0,0 +1,86 @@
+"""Integer-coded routes and the compiled distance matrix.
+
+A route is a combination of start location, end location and line
+('buslijn', empty for deadhead trips). Routes are numbered once, so the
+checks can look up route attributes for all rows of a planning with plain
+NumPy indexing instead of merging DataFrames in every check.
+"""
+import numpy as np
+import pandas as pd
+
+ROUTE_KEYS = ['startlocatie', 'eindlocatie', 'buslijn']
+
+
+def route_keys(frame):
+    """
+    Selects the route columns of a frame in a form that can be compared across files.
+
+    Lines are read as numbers, so line 400 in the timetable matches line 400.0
+    in a bus planning.
+
+    Args:
+        frame (DataFrame): Rows with 'startlocatie', 'eindlocatie' and 'buslijn' columns.
+
+    Returns:
+        DataFrame: The route columns, without categoricals.
+    """
+    return frame[['startlocatie', 'eindlocatie']].astype(object).assign(
+        buslijn=pd.to_numeric(frame['buslijn'].astype(object), errors='coerce')
+    )
+
+
+def route_codes(routes, rides):
+    """
+    Looks up the route code of rides.
+
+    Args:
+        routes (DataFrame): Distinct routes as returned by route_keys, the position of a route is its code.
+        rides (DataFrame): Rides with 'startlocatie', 'eindlocatie' and 'buslijn' columns.
+
+    Returns:
+        ndarray: Route code of every ride, -1 for routes that are not in `routes`.
+    """
+    codes = routes.assign(route=np.arange(len(routes)))
+    merged = route_keys(rides).merge(codes, on=ROUTE_KEYS, how='left')
+    return merged['route'].fillna(-1).to_numpy(dtype=np.int64)
+
+
+class DistanceLookup:
+    """
+    The distance matrix compiled into arrays indexed by route code.
+
+    Every array has one extra element at the end holding NaN, so indexing with
+    the code -1 of an unknown route gives NaN without a separate mask.
+
+    Attributes:
+        routes (DataFrame): The distinct routes of the distance matrix.
+        distance (ndarray): Distance in meters per route.
+        min_time (ndarray): Minimum travel time in minutes per route.
+        max_time (ndarray): Maximum travel time in minutes per route.
+    """
+
+    def __init__(self, distance_matrix):
+        """
+        Compiles the distance matrix.
+
+        Args:
+            distance_matrix (DataFrame): The 'Afstandsmatrix' sheet. The first row of a route is used when it
+                occurs more than once.
+        """
+        keys = route_keys(distance_matrix)
+        first = ~keys.duplicated().to_numpy()
+        self.routes = keys[first].reset_index(drop=True)
+
+        def column(name):
+            return np.r_[pd.to_numeric(distance_matrix[name], errors='coerce').to_numpy(dtype=float)[first], np.nan]
+
+        self.distance = column('afstand in meters')
+        self.min_time = column('min reistijd in min')
+        self.max_time = column('max reistijd in min')
+
+    def __len__(self):
+        return len(self.routes)
+
+    def route_codes(self, rides):
+        """Route code of every ride, -1 for routes that are not in the distance matrix."""
+        return route_codes(self.routes, rides)
@@ -0,0 +1,138 @@
+"""Concurrent execution of the validity checks and KPIs.
+
+The checks are independent of each other, so they can run at the same time.
+`run_checks` yields every result as soon as its check has finished, which
+lets the app show the first results while the slower checks are still
+running. In a container with a single CPU the checks run one after another.
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+
+from bus_checker.checks import (
+    check_battery_status,
+    check_route_continuity,
+    check_travel_time,
+    every_ride_covered,
+)
+from bus_checker.kpis import fleet_kpis
+
+# Ways to execute the checks
+MODES = ('auto', 'serial', 'thread', 'process')
+
+
+@dataclass
+class CheckResult:
+    """
+    Outcome of a single check or KPI.
+
+    Attributes:
+        name (str): Name of the check.
+        value (object): Return value of the check, None if it failed.
+        error (Exception): The exception raised by the check, None if it succeeded.
+        seconds (float): Wall time of the check in seconds.
+    """
+    name: str
+    value: object = None
+    error: Exception = None
+    seconds: float = 0.0
+
+
+def available_cpus():
+    """
+    Returns the number of CPUs this process may use.
+
+    Takes the CPU affinity and a cgroup (v2) CPU quota into account, so a
+    container limited to one CPU on a large host is recognised as such.
+    """
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as file:
+            quota, period = file.read().split()
+        if quota != 'max':
+            cpus = min(cpus, max(1, int(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+
+    return cpus
+
+
+def validation_tasks(model, timetable, distance_matrix, distances, SOH, min_SOC, consumption_per_km):
+    """
+    Builds the checks and KPIs of the Validity Checks tab.
+
+    Args:
+        model (PlanningModel): The bus planning.
+        timetable (DataFrame or TimetableIndex): Timetable rides, or an index built from them.
+        distance_matrix (DataFrame or DistanceLookup): Distances and travel times between locations.
+        distances (ndarray): Distance in meters for every row, see planning_distances.
+        SOH (float): State of Health of the battery as a percentage.
+        min_SOC (float): Minimum state of charge required as a percentage.
+        consumption_per_km (float): Energy consumption per kilometer in kWh.
+
+    Returns:
+        dict: Name of every task mapped to a tuple of the function and its arguments.
+    """
+    return {
+        'kpis': (fleet_kpis, (model, distances, consumption_per_km)),
+        'battery': (check_battery_status, (model, distances, SOH, min_SOC, consumption_per_km)),
+        'continuity': (check_route_continuity, (model,)),
+        'coverage': (every_ride_covered, (model, timetable)),
+        'travel time': (check_travel_time, (model, distance_matrix)),
+    }
+
+
+def timed_call(name, function, args):
+    """Runs a single task and wraps its outcome in a CheckResult."""
+    start = time.perf_counter()
+    try:
+        value = function(*args)
+    except Exception as e:
+        return CheckResult(name, error=e, seconds=time.perf_counter() - start)
+    return CheckResult(name, value=value, seconds=time.perf_counter() - start)
+
+
+def run_checks(tasks, mode='auto', max_workers=None, initializer=None):
+    """
+    Runs tasks concurrently and yields their results as they finish.
+
+    In 'thread' mode the tasks share the planning in memory, which suits the
+    NumPy and pandas based checks. In 'process' mode the arguments are
+    pickled to worker processes, so the functions must be importable. The
+    'auto' mode uses threads, or runs the tasks one after another when only
+    a single CPU is available.
+
+    Args:
+        tasks (dict): Name of every task mapped to a tuple of the function and its arguments.
+        mode (str): One of 'auto', 'serial', 'thread' or 'process'.
+        max_workers (int, optional): Maximum number of workers, by default one per task up to the available CPUs.
+        initializer (callable, optional): Called in every worker before it runs tasks.
+
+    Yields:
+        CheckResult: The result of every task, in order of completion.
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown mode '{mode}', expected one of {MODES}")
+
+    cpus = available_cpus()
+    if mode == 'auto':
+        mode = 'serial' if cpus <= 1 else 'thread'
+
+    if mode == 'serial' or len(tasks) <= 1:
+        if initializer is not None:
+            initializer()
+        for name, (function, args) in tasks.items():
+            yield timed_call(name, function, args)
+        return
+
+    workers = max_workers or min(len(tasks), cpus)
+    executor_class = ProcessPoolExecutor if mode == 'process' else ThreadPoolExecutor
+    with executor_class(max_workers=workers, initializer=initializer) as executor:
+        futures = [executor.submit(timed_call, name, function, args) for name, (function, args) in tasks.items()]
+        for future in as_completed(futures):
+            yield future.result()
@@ -0,0 +1,237 @@
+"""Compact column types of the planning, timetable and distance matrix.
+
+`pd.read_excel` stores text as Python strings in object columns and numbers as
+64-bit values. Locations, activities and clock times repeat on many rows, so
+they are stored as categoricals, which keep every distinct value once and a
+small integer code per row. Line and block numbers are stored as 16-bit
+integers when they fit, minutes as 32-bit integers and energies as 32-bit
+floats. The conversion happens once when a workbook is loaded, and a value
+that does not fit its column type is reported then instead of in a check.
+
+Streamlit keeps the loaded files of every browser session in memory, so the
+size of these frames is multiplied by the number of sessions. The memory of a
+frame before it was made compact is kept in its `attrs`, so `memory_report`
+can show what the conversion saved.
+"""
+import sys
+
+import numpy as np
+import pandas as pd
+
+# Key in DataFrame.attrs holding the memory of the frame as it was read, in bytes
+RAW_MEMORY = 'raw memory'
+
+# Text columns with few distinct values
+PLANNING_CATEGORIES = ['startlocatie', 'eindlocatie', 'activiteit', 'starttijd', 'eindtijd']
+LOCATION_CATEGORIES = ['startlocatie', 'eindlocatie']
+
+# Number columns of the distance matrix
+DISTANCE_COLUMNS = {'afstand in meters': np.int32, 'min reistijd in min': np.int16, 'max reistijd in min': np.int16}
+
+
+def parse_clock_minutes(values):
+    """
+    Parses clock times into minutes since midnight.
+
+    Accepts 'HH:MM' and 'HH:MM:SS' strings, `datetime.time` objects and
+    datetimes. Seconds are ignored. Hours of 24 and later are kept, so
+    '24:15' means a quarter past midnight of the next day. Numbers are read as
+    minutes, as stored by compact_timetable, and categoricals are parsed once
+    per distinct time.
+
+    Args:
+        values (Series): Time values.
+
+    Returns:
+        Series: Minutes since midnight as floats, NaN where no time could be read.
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        minutes = parse_clock_minutes(pd.Series(values.cat.categories)).to_numpy()
+        codes = values.cat.codes.to_numpy()
+        return pd.Series(np.where(codes >= 0, minutes[codes], np.nan), index=values.index)
+    if pd.api.types.is_numeric_dtype(values):
+        return values.astype(float)
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return (values.dt.hour * 60 + values.dt.minute).astype(float)
+    if pd.api.types.is_timedelta64_dtype(values):
+        return (values.dt.total_seconds() // 60).astype(float)
+
+    parts = values.astype(str).str.extract(r'(\d{1,2}):(\d{2})')
+    return parts[0].astype(float) * 60 + parts[1].astype(float)
+
+
+def frame_memory(frame):
+    """Memory used by a frame in bytes, including the Python strings in object columns."""
+    # pandas cannot measure object columns whose array is read-only, such as those of the shared timetables
+    read_only = [
+        column for column, dtype in frame.dtypes.items()
+        if dtype == object and not frame[column].to_numpy().flags.writeable
+    ]
+    memory = frame.drop(columns=read_only).memory_usage(index=True, deep=True).sum()
+    for column in read_only:
+        values = frame[column].to_numpy()
+        memory += values.nbytes + sum(map(sys.getsizeof, values))
+    return int(memory)
+
+
+def _smallest_integer(values, name, dtypes=(np.int16, np.int32, np.int64)):
+    """
+    Stores whole numbers in the smallest of the given integer types they fit in.
+
+    Args:
+        values (Series): The column.
+        name (str): Name of the column, used in error messages.
+        dtypes (tuple): Integer types to try, from small to large.
+
+    Returns:
+        Series: The column as integers, unchanged if it has missing values or is not numeric.
+
+    Raises:
+        ValueError: If the column holds numbers that are not whole.
+    """
+    numbers = pd.to_numeric(values, errors='coerce')
+    if numbers.isna().any() or not pd.api.types.is_numeric_dtype(values):
+        return values
+    if (numbers % 1 != 0).any():
+        raise ValueError(f"'{name}' must hold whole numbers, found {list(numbers[numbers % 1 != 0].unique()[:10])}")
+    for dtype in dtypes:
+        info = np.iinfo(dtype)
+        if numbers.between(info.min, info.max).all():
+            return numbers.astype(dtype)
+    return values
+
+
+def _line_numbers(values, name='buslijn'):
+    """
+    Stores line numbers as a categorical of 16-bit integers, empty for rows that are not regular trips.
+
+    Raises:
+        ValueError: If a line is not a whole number.
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        values = values.astype(object)
+    numbers = pd.to_numeric(values, errors='coerce')
+    unreadable = numbers.isna() & values.notna()
+    if unreadable.any():
+        raise ValueError(f"Could not read '{name}' as a line number in rows: {list(values.index[unreadable][:10])}")
+    if (numbers.dropna() % 1 != 0).any():
+        raise ValueError(f"'{name}' must hold whole numbers.")
+
+    lines = np.unique(numbers.dropna())
+    dtype = np.int16 if len(lines) == 0 or np.abs(lines).max() <= np.iinfo(np.int16).max else np.int64
+    categories = pd.Index(lines.astype(dtype))
+    return pd.Series(pd.Categorical(numbers, categories=categories), index=values.index, name=values.name)
+
+
+def _categories(frame, columns):
+    """Converts the text columns of a frame to categoricals."""
+    return frame.assign(**{column: frame[column].astype('category') for column in columns if column in frame.columns})
+
+
+def compact_planning(frame):
+    """
+    Converts a bus planning to its compact column types.
+
+    Locations, activities and clock times become categoricals, lines a categorical of integers, block numbers
+    16-bit integers when they are whole numbers that fit, and the energy consumption 32-bit floats.
+
+    Args:
+        frame (DataFrame): The bus planning with the required columns.
+
+    Returns:
+        DataFrame: The compact planning, with the memory of `frame` in attrs[RAW_MEMORY].
+
+    Raises:
+        ValueError: If line or block numbers are not whole numbers.
+    """
+    raw_memory = frame.attrs.get(RAW_MEMORY, frame_memory(frame))
+    frame = _categories(frame, PLANNING_CATEGORIES)
+    frame['buslijn'] = _line_numbers(frame['buslijn'])
+    frame['omloop nummer'] = _smallest_integer(frame['omloop nummer'], 'omloop nummer')
+    if 'energieverbruik' in frame.columns:
+        frame['energieverbruik'] = pd.to_numeric(frame['energieverbruik'], errors='coerce').astype(np.float32)
+    frame.attrs[RAW_MEMORY] = raw_memory
+    return frame
+
+
+def compact_timetable(timetable):
+    """
+    Converts the timetable to its compact column types.
+
+    Locations become categoricals, lines 16-bit integers and the departures 32-bit minutes since midnight.
+
+    Args:
+        timetable (DataFrame): The 'Dienstregeling' sheet.
+
+    Returns:
+        DataFrame: The compact timetable, with the memory of `timetable` in attrs[RAW_MEMORY].
+
+    Raises:
+        ValueError: If departures cannot be read, or lines are not whole numbers.
+    """
+    raw_memory = frame_memory(timetable)
+    timetable = _categories(timetable, LOCATION_CATEGORIES)
+    if 'buslijn' in timetable.columns:
+        timetable['buslijn'] = _smallest_integer(timetable['buslijn'], 'buslijn')
+    if 'vertrektijd' in timetable.columns:
+        minutes = parse_clock_minutes(timetable['vertrektijd'])
+        if minutes.isna().any():
+            raise ValueError(f"Could not read 'vertrektijd' in rows: {list(timetable.index[minutes.isna()][:10])}")
+        timetable['vertrektijd'] = minutes.astype(np.int32)
+    timetable.attrs[RAW_MEMORY] = raw_memory
+    return timetable
+
+
+def compact_distance_matrix(distance_matrix):
+    """
+    Converts the distance matrix to its compact column types.
+
+    Locations become categoricals, lines a categorical of integers (empty for deadhead trips), distances 32-bit
+    and travel times 16-bit integers when they are whole numbers.
+
+    Args:
+        distance_matrix (DataFrame): The 'Afstandsmatrix' sheet.
+
+    Returns:
+        DataFrame: The compact distance matrix, with the memory of `distance_matrix` in attrs[RAW_MEMORY].
+
+    Raises:
+        ValueError: If lines are not whole numbers.
+    """
+    raw_memory = frame_memory(distance_matrix)
+    distance_matrix = _categories(distance_matrix, LOCATION_CATEGORIES)
+    if 'buslijn' in distance_matrix.columns:
+        distance_matrix['buslijn'] = _line_numbers(distance_matrix['buslijn'])
+    for column, dtype in DISTANCE_COLUMNS.items():
+        if column in distance_matrix.columns:
+            distance_matrix[column] = _smallest_integer(distance_matrix[column], column, (dtype, np.int64))
+    distance_matrix.attrs[RAW_MEMORY] = raw_memory
+    return distance_matrix
+
+
+def memory_report(frames):
+    """
+    Memory of loaded frames before and after they were made compact.
+
+    Args:
+        frames (dict): Name mapped to a compact frame, or to a PlanningModel whose arrays are counted as well.
+
+    Returns:
+        DataFrame: One row per frame with its rows, the memory as read and as stored in MB, and the reduction.
+    """
+    rows = []
+    for name, frame in frames.items():
+        arrays = 0
+        if not isinstance(frame, pd.DataFrame):
+            arrays = frame.start.nbytes + frame.end.nbytes + frame.blocks.nbytes + frame.block_bounds.nbytes
+            frame = frame.frame
+        after = frame_memory(frame) + arrays
+        before = frame.attrs.get(RAW_MEMORY, after)
+        rows.append({
+            'data': name,
+            'rows': len(frame),
+            'as read (MB)': before / 1024 ** 2,
+            'stored (MB)': after / 1024 ** 2,
+            'reduction': before / after if after else np.nan,
+        })
+    return pd.DataFrame(rows, columns=['data', 'rows', 'as read (MB)', 'stored (MB)', 'reduction'])
@@ -0,0 +1,242 @@
+"""Timetables shared by all sessions of the app process.
+
+Planners upload the same timetable workbook again and again, and every
+Streamlit session used to hold its own parsed copy of it. A
+`SharedTimetableCache` keeps one copy of every distinct workbook, keyed by
+the hash of its content, for the whole process. The distance lookup and the
+timetable index are built on first use and shared as well, so a timetable is
+parsed and indexed once however many sessions use it.
+
+Every session holds at most one timetable. The cache counts the sessions
+holding every entry, and only evicts entries no session holds, least
+recently used first. Streamlit does not report closed browser tabs to the
+script, so a session that has not used its timetable for `session_ttl`
+seconds stops holding it.
+
+The shared data is read-only: the arrays of the lookup and the index, and
+the arrays behind the columns of every shared frame, are marked as not
+writeable, so writing a value raises a ValueError instead of changing the
+checks of every other session. Sessions get shallow copies of the timetable
+and distance matrix frames, so adding, dropping or sorting columns in place
+only changes the copy of that session.
+"""
+import io
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+import pandas as pd
+
+from bus_checker.cache import content_digest
+from bus_checker.loading import read_timetable
+from bus_checker.routes import DistanceLookup
+from bus_checker.schema import frame_memory
+from bus_checker.timetable import TimetableIndex
+
+# Distinct timetables kept when no session holds them
+DEFAULT_MAX_ENTRIES = 8
+
+# Seconds after which a session that did not use its timetable stops holding it
+DEFAULT_SESSION_TTL = 60 * 60
+
+
+def _read_only_frame(frame):
+    """Marks the arrays behind the columns of a frame as not writeable and returns the frame."""
+    for array in frame._mgr.arrays:
+        # Extension arrays keep their values in an ndarray, categoricals keep their codes
+        values = getattr(array, '_ndarray', getattr(array, '_codes', array))
+        if isinstance(values, np.ndarray):
+            values.setflags(write=False)
+    return frame
+
+
+def _read_only(value):
+    """Marks the arrays and the arrays behind the frames of an object as not writeable and returns the object."""
+    for attribute in vars(value).values():
+        if isinstance(attribute, np.ndarray):
+            attribute.setflags(write=False)
+        elif isinstance(attribute, pd.DataFrame):
+            _read_only_frame(attribute)
+    return value
+
+
+def _memory(value):
+    """Memory of the frames and arrays of an object in bytes."""
+    return sum(
+        frame_memory(attribute) if isinstance(attribute, pd.DataFrame) else attribute.nbytes
+        for attribute in vars(value).values()
+        if isinstance(attribute, (pd.DataFrame, np.ndarray))
+    )
+
+
+class SharedTimetable:
+    """
+    A timetable workbook parsed once, with its distance lookup and timetable index built on first use.
+
+    Attributes:
+        digest (str): Hash of the workbook content.
+    """
+
+    def __init__(self, digest, timetable, distance_matrix):
+        self.digest = digest
+        self._timetable = _read_only_frame(timetable)
+        self._distance_matrix = _read_only_frame(distance_matrix)
+        self._distance_lookup = None
+        self._timetable_index = None
+        self._lock = threading.Lock()
+
+    @property
+    def timetable(self):
+        """The 'Dienstregeling' sheet in its compact column types, as a shallow copy of the shared frame."""
+        return self._timetable.copy(deep=False)
+
+    @property
+    def distance_matrix(self):
+        """The 'Afstandsmatrix' sheet in its compact column types, as a shallow copy of the shared frame."""
+        return self._distance_matrix.copy(deep=False)
+
+    @property
+    def distance_lookup(self):
+        """The compiled distance matrix, built by the first session that needs it."""
+        with self._lock:
+            if self._distance_lookup is None:
+                self._distance_lookup = _read_only(DistanceLookup(self._distance_matrix))
+            return self._distance_lookup
+
+    @property
+    def timetable_index(self):
+        """The index of the timetable trips, built by the first session that needs it."""
+        with self._lock:
+            if self._timetable_index is None:
+                self._timetable_index = _read_only(TimetableIndex(self._timetable))
+            return self._timetable_index
+
+    def memory(self):
+        """Memory of the frames and of the lookup and index built so far in bytes."""
+        built = [value for value in (self._distance_lookup, self._timetable_index) if value is not None]
+        return frame_memory(self._timetable) + frame_memory(self._distance_matrix) + sum(map(_memory, built))
+
+
+class SharedTimetableCache:
+    """
+    Parsed timetable workbooks by the hash of their content, shared by all sessions of the process.
+
+    Attributes:
+        sheet_cache (SheetCache): Cache of parsed sheets on disk, used when a workbook is not in memory.
+        max_entries (int): Largest number of entries kept when no session holds them.
+        session_ttl (float): Seconds after which a session that did not use its timetable stops holding it.
+        loads (int): Number of workbooks parsed.
+        hits (int): Number of times a session got a workbook that was parsed before.
+    """
+
+    def __init__(self, sheet_cache=None, max_entries=DEFAULT_MAX_ENTRIES, session_ttl=DEFAULT_SESSION_TTL):
+        self.sheet_cache = sheet_cache
+        self.max_entries = max_entries
+        self.session_ttl = session_ttl
+        self._entries = {}
+        self._last_used = {}
+        self._loading = {}
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.hits = 0
+
+    def acquire(self, session_id, content, digest=None):
+        """
+        Returns the shared copy of a timetable workbook and records that the session holds it.
+
+        A session holds one timetable; acquiring another releases the previous
+        one. When several sessions upload a new workbook at the same time, it
+        is parsed once and the other sessions wait for it.
+
+        Args:
+            session_id (str): Identifier of the session.
+            content (bytes): Content of the .xlsx file.
+            digest (str, optional): Hash of the content, computed when not given.
+
+        Returns:
+            SharedTimetable: The parsed timetable.
+
+        Raises:
+            ValueError: If the workbook cannot be read.
+        """
+        digest = digest or content_digest(content)
+        with self._lock:
+            entry = self._entries.get(digest)
+            loading = self._loading.get(digest) if entry is None else None
+            parse = entry is None and loading is None
+            if parse:
+                loading = self._loading[digest] = Future()
+
+        if parse:
+            try:
+                timetable, distance_matrix = read_timetable(io.BytesIO(content), self.sheet_cache, digest)
+            except Exception as e:
+                with self._lock:
+                    del self._loading[digest]
+                loading.set_exception(e)
+                raise
+            entry = SharedTimetable(digest, timetable, distance_matrix)
+            with self._lock:
+                self._entries[digest] = entry
+                del self._loading[digest]
+                self.loads += 1
+            loading.set_result(entry)
+        elif entry is None:
+            entry = loading.result()
+
+        now = time.monotonic()
+        with self._lock:
+            if not parse:
+                self.hits += 1
+            self._last_used[digest] = now
+            self._sessions[session_id] = (digest, now)
+            self._prune(now)
+        return entry
+
+    def release(self, session_id):
+        """Records that the session no longer holds a timetable."""
+        with self._lock:
+            self._sessions.pop(session_id, None)
+            self._prune(time.monotonic())
+
+    def sessions(self, digest):
+        """Number of sessions holding the timetable with the given hash."""
+        with self._lock:
+            return sum(held == digest for held, _ in self._sessions.values())
+
+    def _prune(self, now):
+        """Drops idle sessions, then the least recently used entries beyond max_entries that no session holds."""
+        for session_id, (_, seen) in list(self._sessions.items()):
+            if now - seen > self.session_ttl:
+                del self._sessions[session_id]
+
+        held = {digest for digest, _ in self._sessions.values()}
+        unheld = sorted((digest for digest in self._entries if digest not in held), key=self._last_used.get)
+        for digest in unheld[:max(len(self._entries) - self.max_entries, 0)]:
+            del self._entries[digest], self._last_used[digest]
+
+    def report(self, session_id=None):
+        """
+        The shared timetables and the sessions holding them.
+
+        Args:
+            session_id (str, optional): Session whose timetable is marked.
+
+        Returns:
+            DataFrame: One row per timetable with its hash, trips, the sessions sharing it, its memory in MB and
+                whether the given session holds it.
+        """
+        with self._lock:
+            entries = list(self._entries.values())
+            sessions = [digest for digest, _ in self._sessions.values()]
+            own = self._sessions.get(session_id, (None, None))[0]
+        rows = [{
+            'timetable': entry.digest[:12],
+            'trips': len(entry.timetable),
+            'sessions': sessions.count(entry.digest),
+            'memory (MB)': entry.memory() / 1024 ** 2,
+            'yours': entry.digest == own,
+        } for entry in entries]
+        return pd.DataFrame(rows, columns=['timetable', 'trips', 'sessions', 'memory (MB)', 'yours'])
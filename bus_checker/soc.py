@@ -0,0 +1,196 @@
+"""State of charge of every block on a minute grid.
+
+The battery simulation gives the level after every row of the planning. The
+level during a row follows from the levels before and after it: driving and
+idling use energy at a constant rate over the row, and charging adds energy at
+a constant rate until the battery is full. Every row therefore adds three
+points to the curve of its block: its start, the moment its rate changes
+(the battery is full, or the row ends) and its end.
+
+The curves of all blocks are evaluated on one shared grid with a single
+`np.interp`: the times of every block are shifted by a multiple of a stride
+larger than the day, so the points of all blocks form one increasing
+sequence. Minutes outside the first and last row of a block are NaN.
+
+Hundreds of curves of a whole day do not need all of their minutes to be
+drawn. `minmax_downsample` keeps the lowest and highest value of every bin, so
+dips below the minimum stay visible, and `lttb_downsample` keeps the points
+that preserve the shape of every curve (Largest Triangle Three Buckets). Both
+work on all blocks at once.
+"""
+import warnings
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from bus_checker.battery import CHARGING_SPEED_10, CHARGING_SPEED_90, simulate_battery_levels
+from bus_checker.checks import energy_per_row
+
+
+@dataclass(frozen=True)
+class SOCSeries:
+    """
+    State of charge of every block for every minute of the planning day.
+
+    Attributes:
+        minutes (ndarray): Minute since midnight of the service day of every grid point.
+        blocks (ndarray): Block number ('omloop nummer') of every block.
+        soc (ndarray): State of charge in percent as float32 per block and minute, NaN where a block is not planned.
+    """
+    minutes: np.ndarray
+    blocks: np.ndarray
+    soc: np.ndarray
+
+    def lowest(self):
+        """Lowest state of charge of every block in percent, NaN where it is unknown."""
+        known = ~np.isnan(self.soc).all(axis=1)
+        lowest = np.full(len(self.blocks), np.nan, dtype=np.float32)
+        lowest[known] = np.nanmin(self.soc[known], axis=1)
+        return lowest
+
+    def below(self, min_SOC):
+        """Blocks whose state of charge drops below the minimum during the day."""
+        with np.errstate(invalid='ignore'):
+            return self.blocks[self.lowest() < min_SOC]
+
+    def to_frame(self):
+        """The series as a table with one column per block and one row per minute."""
+        return pd.DataFrame(self.soc.T, index=pd.Index(self.minutes, name='minute'), columns=self.blocks)
+
+
+def soc_series(model, distances, SOH, consumption_per_km, step=1):
+    """
+    Computes the state of charge of every block on a shared minute grid.
+
+    Args:
+        model (PlanningModel): The bus planning.
+        distances (ndarray): Distance in meters for every row, see planning_distances.
+        SOH (float): State of Health of the battery as a percentage.
+        consumption_per_km (float): Energy consumption per kilometer in kWh.
+        step (int): Minutes between grid points.
+
+    Returns:
+        SOCSeries: The state of charge of every block from the first start to the last end of the planning.
+    """
+    max_capacity = 300 * (SOH / 100)
+    is_charging = model.is_activity('opladen')
+    consumption = energy_per_row(model, distances, consumption_per_km)
+    after = simulate_battery_levels(model.blocks, is_charging, consumption, model.duration, max_capacity)
+
+    # Level before every row: full at the start of a block, otherwise the level after the previous row
+    first_row = np.zeros(len(model), dtype=bool)
+    first_row[model.block_bounds[:-1]] = True
+    before = np.where(first_row, max_capacity, np.r_[max_capacity, after[:-1]])
+
+    # A charging row stops adding energy when the battery is full, other rows change the level until they end
+    start, end = model.start.astype(float), model.end.astype(float)
+    with np.errstate(invalid='ignore'):
+        speed = np.where(before <= max_capacity * 0.9, CHARGING_SPEED_90, CHARGING_SPEED_10)
+        knee = np.where(is_charging, np.minimum(start + (after - before) / speed, end), end)
+    knee = np.where(np.isnan(knee), end, knee)
+
+    # Shift every block by a stride, so the points of all blocks form one increasing sequence
+    n_blocks = model.n_blocks
+    block_id = np.repeat(np.arange(n_blocks), np.diff(model.block_bounds))
+    first, last = int(start.min()), int(end.max())
+    stride = last - first + 2
+    offset = block_id * stride - first
+    times = np.column_stack([start, knee, end]) + offset[:, np.newaxis]
+    levels = np.column_stack([before, after, after])
+
+    # Overlapping rows are reported by the continuity check; here a row starts no earlier than the previous one ends,
+    # as np.interp needs increasing times. The stride keeps the blocks apart, so this never crosses a block.
+    times = np.maximum.accumulate(times.ravel())
+
+    minutes = np.arange(first, last + 1, step)
+    grid = (np.arange(n_blocks)[:, np.newaxis] * stride + (minutes - first)).ravel()
+    soc = np.interp(grid, times, levels.ravel()).reshape(n_blocks, len(minutes))
+
+    # Minutes before the first and after the last row of a block are not part of it
+    bounds = model.block_bounds
+    outside = (minutes < model.start[bounds[:-1], np.newaxis]) | (minutes > model.end[bounds[1:] - 1, np.newaxis])
+    soc[outside] = np.nan
+    return SOCSeries(
+        minutes=minutes,
+        blocks=model.blocks[bounds[:-1]],
+        soc=(soc / max_capacity * 100).astype(np.float32),
+    )
+
+
+def minmax_downsample(x, y, bins):
+    """
+    Keeps the lowest and highest point of every bin of every series.
+
+    Args:
+        x (ndarray): Shared positions of the points.
+        y (ndarray): Values per series and position.
+        bins (int): Number of bins, the result has two points per bin.
+
+    Returns:
+        tuple: Positions and values of the kept points, per series, in the order of the positions.
+    """
+    n_series, n = y.shape
+    if n <= 2 * bins:
+        return np.broadcast_to(x, y.shape), y
+
+    # Pad the last bin by repeating the last point, so all bins have the same width
+    width = -(-n // bins)
+    index = np.minimum(np.arange(bins * width), n - 1).reshape(bins, width)
+    values = y[:, index]
+    filled = np.where(np.isnan(values), np.inf, values)
+    low = np.argmin(filled, axis=2)
+    high = np.argmax(np.where(np.isnan(values), -np.inf, values), axis=2)
+
+    # Every bin contributes its two extremes in the order they occur
+    picked = np.stack([np.minimum(low, high), np.maximum(low, high)], axis=2)
+    positions = index[np.arange(bins)[:, np.newaxis], picked].reshape(n_series, 2 * bins)
+    return x[positions], np.take_along_axis(y, positions, axis=1)
+
+
+def lttb_downsample(x, y, threshold):
+    """
+    Selects the points that best preserve the shape of every series (Largest Triangle Three Buckets).
+
+    The first and last points are kept. In between, every bucket keeps the point that forms the largest
+    triangle with the point kept in the previous bucket and the average of the next bucket. The buckets
+    are walked once, for all series at the same time.
+
+    Args:
+        x (ndarray): Shared positions of the points.
+        y (ndarray): Values per series and position, NaN values are only kept when a bucket has no others.
+        threshold (int): Number of points to keep per series.
+
+    Returns:
+        tuple: Positions and values of the kept points, per series.
+    """
+    n_series, n = y.shape
+    if threshold >= n or threshold < 3:
+        return np.broadcast_to(x, y.shape), y
+
+    x = np.asarray(x, dtype=float)
+    # Buckets of equal size between the first and the last point, the last point is a bucket of its own
+    every = (n - 2) / (threshold - 2)
+    edges = np.r_[np.floor(np.arange(threshold - 1) * every).astype(np.int64) + 1, n]
+    rows = np.arange(n_series)
+    kept = np.zeros((n_series, threshold), dtype=np.int64)
+    kept[:, -1] = n - 1
+
+    with np.errstate(invalid='ignore'), warnings.catch_warnings():
+        # Buckets where a series has no values average to NaN
+        warnings.simplefilter('ignore', RuntimeWarning)
+        for bucket in range(threshold - 2):
+            lo, hi, next_hi = edges[bucket], edges[bucket + 1], edges[bucket + 2]
+            average_x = x[hi:next_hi].mean()
+            previous_x, previous_y = x[kept[:, bucket]], y[rows, kept[:, bucket]]
+            previous_y = np.where(np.isnan(previous_y), 0, previous_y)
+            average_y = np.nanmean(y[:, hi:next_hi], axis=1)
+            average_y = np.where(np.isnan(average_y), previous_y, average_y)
+
+            area = np.abs(
+                (previous_x[:, np.newaxis] - average_x) * (y[:, lo:hi] - previous_y[:, np.newaxis])
+                - (previous_x[:, np.newaxis] - x[lo:hi]) * (average_y - previous_y)[:, np.newaxis]
+            )
+            kept[:, bucket + 1] = lo + np.argmax(np.nan_to_num(area, nan=-1.0), axis=1)
+
+    return x[kept], np.take_along_axis(y, kept, axis=1)
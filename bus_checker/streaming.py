@@ -0,0 +1,185 @@
+"""Streaming validation of plannings too large to load at once.
+
+The planning is read in chunks of rows, the chunks are regrouped so that no
+block ('omloop nummer') is split across two of them, and the per-block checks
+run on one chunk at a time. The KPIs of the blocks of all chunks are combined. Memory use
+is therefore bounded by the chunk size, or by the largest block if that is
+larger, instead of by the size of the file.
+
+Streaming needs the rows of every block to be next to each other in the
+file. The trip coverage check compares the whole planning with the timetable
+and is not part of the streaming validation.
+"""
+import numpy as np
+import pandas as pd
+
+from bus_checker.checks import check_battery_status, check_route_continuity, check_travel_time, planning_distances
+from bus_checker.kpis import FleetKPIs, fleet_kpis
+from bus_checker.model import PlanningModel
+from bus_checker.routes import DistanceLookup
+from bus_checker.runner import CheckResult, run_checks
+
+DEFAULT_CHUNK_ROWS = 10_000
+
+# Checks and KPIs of the streaming validation
+STREAMED_KPIS = ('kpis',)
+STREAMED_CHECKS = ('battery', 'continuity', 'travel time')
+
+
+def read_planning_chunks(source, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """
+    Reads a planning file in chunks of rows.
+
+    Workbooks are read with openpyxl in read-only mode, which does not load
+    the whole sheet into memory. CSV files are read with pandas in chunks.
+
+    Args:
+        source (str): Path of the .xlsx or .csv file.
+        chunk_rows (int): Number of rows per chunk.
+
+    Yields:
+        DataFrame: The next rows of the first sheet, with the header row as column names.
+    """
+    if str(source).lower().endswith('.csv'):
+        yield from pd.read_csv(source, chunksize=chunk_rows)
+        return
+
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(source, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [f'Unnamed: {i}' if name is None else str(name) for i, name in enumerate(header)]
+
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) == chunk_rows:
+                yield pd.DataFrame.from_records(chunk, columns=columns).infer_objects()
+                chunk = []
+        if chunk:
+            yield pd.DataFrame.from_records(chunk, columns=columns).infer_objects()
+    finally:
+        workbook.close()
+
+
+def block_chunks(frames):
+    """
+    Regroups chunks of rows on block boundaries.
+
+    The rows of the last block of a chunk are held back and joined with the
+    next chunk, so every block is in exactly one chunk.
+
+    Args:
+        frames (iterable): DataFrames with consecutive rows of a planning.
+
+    Yields:
+        DataFrame: Rows of one or more complete blocks.
+
+    Raises:
+        ValueError: If the 'omloop nummer' column is missing or the rows of a block are not next to each other.
+    """
+    finished = set()
+
+    def complete(frame, runs):
+        # A block may only appear in one run of rows in the whole file
+        if len(set(runs)) != len(runs) or finished.intersection(runs):
+            raise ValueError("Streaming needs the rows of every 'omloop nummer' to be next to each other in the file.")
+        finished.update(runs)
+        return frame
+
+    carry = None
+    for frame in frames:
+        frame = frame.dropna(how='all')
+        frame.columns = frame.columns.astype(str).str.strip()
+        if 'omloop nummer' not in frame.columns:
+            raise ValueError("Missing columns in 'bus_planning': {'omloop nummer'}")
+        if carry is not None:
+            frame = pd.concat([carry, frame], ignore_index=True)
+        if frame.empty:
+            continue
+
+        # Hold back the rows of the last block, it may continue in the next chunk
+        blocks = frame['omloop nummer'].to_numpy()
+        run_start = np.r_[0, np.flatnonzero(blocks[1:] != blocks[:-1]) + 1]
+        carry = frame.iloc[run_start[-1]:]
+        if len(run_start) > 1:
+            yield complete(frame.iloc[:run_start[-1]], list(blocks[run_start[:-1]]))
+
+    if carry is not None and not carry.empty:
+        yield complete(carry, [carry['omloop nummer'].iloc[0]])
+
+
+def iter_chunk_results(frames, distance_matrix, SOH, min_SOC, consumption_per_km):
+    """
+    Runs the per-block checks and KPIs on every chunk of a planning.
+
+    Args:
+        frames (iterable): DataFrames with consecutive rows of a planning, see read_planning_chunks.
+        distance_matrix (DataFrame or DistanceLookup): Distances and travel times between locations.
+        SOH (float): State of Health of the battery as a percentage.
+        min_SOC (float): Minimum state of charge required as a percentage.
+        consumption_per_km (float): Energy consumption per kilometer in kWh.
+
+    Yields:
+        list: A CheckResult per check and KPI of the chunk.
+    """
+    if not isinstance(distance_matrix, DistanceLookup):
+        distance_matrix = DistanceLookup(distance_matrix)
+
+    for frame in block_chunks(frames):
+        model = PlanningModel.from_frame(frame)
+        distances = planning_distances(model, distance_matrix)
+        tasks = {
+            'kpis': (fleet_kpis, (model, distances, consumption_per_km)),
+            'battery': (check_battery_status, (model, distances, SOH, min_SOC, consumption_per_km)),
+            'continuity': (check_route_continuity, (model,)),
+            'travel time': (check_travel_time, (model, distance_matrix)),
+        }
+        yield list(run_checks(tasks, mode='serial'))
+
+
+def stream_checks(frames, distance_matrix, SOH, min_SOC, consumption_per_km):
+    """
+    Validates a planning chunk by chunk and combines the results.
+
+    Only the rows with problems are kept from every chunk. A check that fails
+    on a chunk is reported with its first error.
+
+    Args:
+        frames (iterable): DataFrames with consecutive rows of a planning, see read_planning_chunks.
+        distance_matrix (DataFrame or DistanceLookup): Distances and travel times between locations.
+        SOH (float): State of Health of the battery as a percentage.
+        min_SOC (float): Minimum state of charge required as a percentage.
+        consumption_per_km (float): Energy consumption per kilometer in kWh.
+
+    Yields:
+        CheckResult: The combined result of every check and KPI, after the last chunk.
+    """
+    kpis = {name: [] for name in STREAMED_KPIS}
+    issues = {name: [] for name in STREAMED_CHECKS}
+    errors = {}
+    seconds = dict.fromkeys(STREAMED_KPIS + STREAMED_CHECKS, 0.0)
+
+    for results in iter_chunk_results(frames, distance_matrix, SOH, min_SOC, consumption_per_km):
+        for result in results:
+            seconds[result.name] += result.seconds
+            if result.error is not None:
+                errors.setdefault(result.name, result.error)
+            elif result.name in kpis:
+                kpis[result.name].append(result.value)
+            else:
+                issues[result.name].append(result.value)
+
+    for name in STREAMED_KPIS + STREAMED_CHECKS:
+        if name in errors:
+            yield CheckResult(name, error=errors[name], seconds=seconds[name])
+        elif name in kpis:
+            yield CheckResult(name, value=FleetKPIs.concat(kpis[name]), seconds=seconds[name])
+        else:
+            # Keep the columns of an empty result when no chunk had problems
+            parts = [part for part in issues[name] if not part.empty] or issues[name][-1:] or [pd.DataFrame()]
+            yield CheckResult(name, value=pd.concat(parts, ignore_index=True), seconds=seconds[name])
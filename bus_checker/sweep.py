@@ -0,0 +1,127 @@
+"""Battery check over a grid of parameter combinations.
+
+The battery level depends on the State of Health (through the capacity) and
+on the consumption per km, but not on the minimum State of Charge, which is
+only a threshold on the simulated level. A sweep therefore simulates every
+SOH and consumption combination once, in a single batched simulation, and
+keeps the lowest SOC of every block. Feasibility for any minimum SOC then
+follows by comparing against that lowest SOC.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from bus_checker.battery import IDLE_CONSUMPTION, simulate_battery_levels
+
+# Parameter grid matching the range of the sliders in the app
+SOH_VALUES = np.arange(85, 96)
+MIN_SOC_VALUES = np.arange(5, 26)
+CONSUMPTION_VALUES = np.round(np.arange(0.7, 2.51, 0.1), 1)
+
+# Largest number of battery levels (scenarios x rows) simulated in one batch
+MAX_BATCH_CELLS = 4_000_000
+
+
+@dataclass(frozen=True)
+class BatterySweep:
+    """
+    Lowest state of charge of every block for a grid of SOH and consumption values.
+
+    Attributes:
+        SOH (ndarray): State of Health values in percent.
+        consumption_per_km (ndarray): Energy consumption values in kWh per km.
+        blocks (ndarray): Block number ('omloop nummer') of every block.
+        lowest_soc (ndarray): Lowest SOC in percent per SOH, consumption and block, NaN where unknown.
+    """
+    SOH: np.ndarray
+    consumption_per_km: np.ndarray
+    blocks: np.ndarray
+    lowest_soc: np.ndarray
+
+    def planning_lowest_soc(self):
+        """Lowest SOC of all blocks per SOH and consumption, the highest minimum SOC that is still feasible."""
+        # Blocks with unknown levels never fail the battery check
+        known = np.where(np.isnan(self.lowest_soc), np.inf, self.lowest_soc)
+        return known.min(axis=-1, initial=np.inf)
+
+    def feasible(self, min_SOC):
+        """
+        Whether the planning passes the battery check for every combination.
+
+        Args:
+            min_SOC (float or array-like): Minimum state of charge in percent, an array adds a last axis.
+
+        Returns:
+            ndarray: Boolean per SOH and consumption (and minimum SOC).
+        """
+        lowest = self.planning_lowest_soc()
+        if np.ndim(min_SOC):
+            lowest = lowest[..., np.newaxis]
+        return lowest >= np.asarray(min_SOC)
+
+    def margins(self, min_SOC):
+        """
+        Minimum SOC margin of every block for every combination.
+
+        Args:
+            min_SOC (float): Minimum state of charge in percent.
+
+        Returns:
+            DataFrame: One row per SOH, consumption and block with the lowest SOC and its margin above the minimum,
+                negative where the block fails the battery check.
+        """
+        SOH, consumption, blocks = np.meshgrid(self.SOH, self.consumption_per_km, self.blocks, indexing='ij')
+        return pd.DataFrame({
+            'SOH': SOH.ravel(),
+            'consumption per km': consumption.ravel(),
+            'omloop nummer': blocks.ravel(),
+            'lowest SOC (%)': self.lowest_soc.ravel(),
+            'margin (%)': self.lowest_soc.ravel() - min_SOC,
+        })
+
+
+def battery_sweep(model, distances, SOH_values=SOH_VALUES, consumption_values=CONSUMPTION_VALUES):
+    """
+    Simulates the battery of every block for all combinations of SOH and consumption.
+
+    Args:
+        model (PlanningModel): The bus planning.
+        distances (ndarray): Distance in meters for every row, see planning_distances.
+        SOH_values (array-like): State of Health values in percent.
+        consumption_values (array-like): Energy consumption values in kWh per km.
+
+    Returns:
+        BatterySweep: The lowest SOC of every block per combination.
+    """
+    SOH_values = np.asarray(SOH_values, dtype=float)
+    consumption_values = np.asarray(consumption_values, dtype=float)
+
+    # One scenario per combination, SOH on the outer axis
+    SOH, consumption_per_km = (grid.ravel() for grid in np.meshgrid(SOH_values, consumption_values, indexing='ij'))
+    capacity = 300 * (SOH / 100)
+
+    # Energy per row is linear in the consumption per km, idle rows use a fixed amount
+    is_idle = model.is_activity('idle')
+    is_charging = model.is_activity('opladen')
+    kilometers = distances / 1000
+    first_rows = model.block_bounds[:-1]
+
+    lowest = np.empty((len(SOH), model.n_blocks))
+    batch = max(1, MAX_BATCH_CELLS // max(len(model), 1))
+    for start in range(0, len(SOH), batch):
+        scenarios = slice(start, start + batch)
+        consumption = np.where(
+            is_idle, IDLE_CONSUMPTION, kilometers * np.maximum(consumption_per_km[scenarios, np.newaxis], 0.7)
+        )
+        levels = simulate_battery_levels(model.blocks, is_charging, consumption, model.duration, capacity[scenarios])
+        if model.n_blocks:
+            # fmin ignores the unknown levels after a missing distance, like the battery check does
+            lowest[scenarios] = np.fmin.reduceat(levels, first_rows, axis=1) / capacity[scenarios, np.newaxis] * 100
+
+    return BatterySweep(
+        SOH=SOH_values,
+        consumption_per_km=consumption_values,
+        blocks=model.blocks[first_rows],
+        lowest_soc=lowest.reshape(len(SOH_values), len(consumption_values), model.n_blocks),
+    )
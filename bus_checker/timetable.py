@@ -0,0 +1,151 @@
+"""Index of the timetable trips for fast trip coverage checks.
+
+The trips of the 'Dienstregeling' sheet are sorted by route (start location,
+end location and line) and departure time, and stored as a single sorted
+array of integer keys. Matching a planned ride is then a binary search, and
+the same index can be reused for every planning checked against the timetable.
+"""
+import numpy as np
+
+from bus_checker.model import MINUTES_PER_DAY
+from bus_checker.routes import ROUTE_KEYS, route_codes, route_keys
+from bus_checker.schema import parse_clock_minutes
+
+# Distance between the keys of two routes, larger than any departure time plus tolerance
+KEY_STRIDE = 4 * MINUTES_PER_DAY
+
+
+class TimetableIndex:
+    """
+    Sorted departure times per route of a timetable.
+
+    Attributes:
+        routes (DataFrame): The distinct routes, the position of a route is its code.
+        trips (DataFrame): The timetable trips sorted by route and departure, with the departure in 'starttijd' as
+            minutes since midnight.
+    """
+
+    def __init__(self, timetable):
+        """
+        Builds the index.
+
+        Args:
+            timetable (DataFrame): The 'Dienstregeling' sheet with a 'vertrektijd' column.
+
+        Raises:
+            ValueError: If the timetable has no departure time column.
+        """
+        time_column = 'vertrektijd' if 'vertrektijd' in timetable.columns else 'starttijd'
+        if time_column not in timetable.columns:
+            raise ValueError("Missing 'vertrektijd' column in timetable.")
+
+        trips = route_keys(timetable).assign(
+            starttijd=parse_clock_minutes(timetable[time_column]) % MINUTES_PER_DAY
+        ).dropna(subset=['starttijd'])
+
+        self.routes = trips[ROUTE_KEYS].drop_duplicates().reset_index(drop=True)
+        route = self.route_codes(trips)
+        minute = trips['starttijd'].to_numpy(dtype=np.int64)
+
+        order = np.lexsort((minute, route))
+        self.trips = trips.iloc[order].reset_index(drop=True)
+        self._keys = route[order] * KEY_STRIDE + minute[order]
+
+    def __len__(self):
+        return len(self._keys)
+
+    def route_codes(self, rides):
+        """Route code of every ride, -1 for routes that are not in the timetable."""
+        return route_codes(self.routes, rides)
+
+    def match(self, rides, tolerance=0):
+        """
+        Assigns every ride to a timetable trip.
+
+        A ride matches a trip of the same route that departs at most
+        `tolerance` minutes earlier or later, also across midnight, so 23:59
+        matches 00:00. Every trip is given to one ride: the k-th ride nearest
+        to a departure gets the k-th trip at that departure, so identical
+        trips are covered by as many rides. A ride left over takes the nearest
+        trip that no other ride covers, and only when there is none it shares
+        the trip nearest to it.
+
+        Args:
+            rides (DataFrame): Rides with route columns and the departure in 'starttijd' as minutes since midnight.
+            tolerance (int): Maximum difference between the departure times in minutes.
+
+        Returns:
+            ndarray: Position of the matched trip in `trips` for every ride, -1 if there is none.
+        """
+        if not 0 <= tolerance < MINUTES_PER_DAY // 2:
+            raise ValueError(f'Tolerance must be between 0 and {MINUTES_PER_DAY // 2} minutes')
+
+        route = self.route_codes(rides)
+        if len(self) == 0:
+            return np.full(len(rides), -1)
+
+        query = route * KEY_STRIDE + rides['starttijd'].to_numpy(dtype=np.int64) % MINUTES_PER_DAY
+        position, surplus = _assign(self._keys, query, (route >= 0), tolerance)
+
+        # Rides beyond the trips at their departure take the nearest trip that is still uncovered
+        if surplus.any():
+            free = np.setdiff1d(np.arange(len(self)), position[(position >= 0) & ~surplus])
+            if len(free):
+                left_over = np.flatnonzero(surplus)
+                second, shared = _assign(self._keys[free], query[left_over], np.ones(len(left_over), bool), tolerance)
+                taken = (second >= 0) & ~shared
+                position[left_over[taken]] = free[second[taken]]
+        return position
+
+
+def _nearest(keys, query):
+    """
+    Position of the nearest key to every query in sorted keys, and the distance to it, across midnight.
+
+    Returns:
+        tuple: Positions in `keys` and distances in minutes.
+    """
+    nearest = np.zeros(len(query), dtype=np.int64)
+    distance = np.full(len(query), np.iinfo(np.int64).max)
+    for shift in (0, -MINUTES_PER_DAY, MINUTES_PER_DAY):
+        shifted = query + shift
+        position = np.searchsorted(keys, shifted)
+        for candidate in (np.clip(position - 1, 0, len(keys) - 1), np.clip(position, 0, len(keys) - 1)):
+            candidate_distance = np.abs(keys[candidate] - shifted)
+            closer = candidate_distance < distance
+            nearest = np.where(closer, candidate, nearest)
+            distance = np.where(closer, candidate_distance, distance)
+    return nearest, distance
+
+
+def _assign(keys, query, valid, tolerance):
+    """
+    Gives the k-th query nearest to a key the k-th of the equal keys.
+
+    Args:
+        keys (ndarray): Sorted trip keys.
+        query (ndarray): Ride keys.
+        valid (ndarray): Whether a ride can be matched at all.
+        tolerance (int): Maximum distance in minutes.
+
+    Returns:
+        tuple: Position in `keys` for every query, -1 if no key is near enough, and whether the query is left over
+            because more queries than keys are nearest to that key. A left over query has the last of those keys.
+    """
+    nearest, distance = _nearest(keys, query)
+    found = np.flatnonzero(valid & (distance <= tolerance))
+    first = np.searchsorted(keys, keys[nearest[found]], side='left')
+    count = np.searchsorted(keys, keys[nearest[found]], side='right') - first
+
+    # Rank of every query among the queries nearest to the same key, in order of departure
+    order = np.lexsort((query[found], first))
+    group = first[order]
+    starts = np.r_[0, np.flatnonzero(group[1:] != group[:-1]) + 1]
+    rank = np.empty(len(found), dtype=np.int64)
+    rank[order] = np.arange(len(found)) - np.repeat(starts, np.diff(np.r_[starts, len(found)]))
+
+    position = np.full(len(query), -1)
+    position[found] = first + np.minimum(rank, count - 1)
+    surplus = np.zeros(len(query), dtype=bool)
+    surplus[found] = rank >= count
+    return position, surplus
@@ -1,8 +1,42 @@
+import io
+import threading
+from functools import partial
+
 import streamlit as st
-import pandas as pd
-import matplotlib.pyplot as plt
-from matplotlib.patches import Patch
-import seaborn as sns
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+from bus_checker.builder import build_planning
+from bus_checker.cache import SheetCache, content_digest
+from bus_checker.chargers import DEFAULT_MAX_CHARGERS, DEFAULT_MAX_POWER, charger_occupancy, charging_power
+from bus_checker.checks import (
+    check_battery_status,
+    check_route_continuity,
+    check_travel_time,
+    every_ride_covered,
+    planning_distances,
+)
+from bus_checker.compare import compare_plannings
+from bus_checker.incremental import IncrementalValidator, block_digests
+from bus_checker.kpis import fleet_kpis
+from bus_checker.loading import read_planning
+from bus_checker.pipeline import Pipeline
+from bus_checker.plots import (
+    figure_png,
+    plot_activity_bar_chart,
+    plot_activity_pie_chart,
+    plot_charger_occupancy,
+    plot_charging_heatmap,
+    plot_feasibility_heatmap,
+    plot_schedule_from_excel,
+    plot_soc_series,
+)
+from bus_checker.profiling import DEFAULT_CAPTURE, DEFAULT_JSON_LOG, RunProfiler, enable_json_log
+from bus_checker.repair import planning_workbook, repair_battery
+from bus_checker.runner import CheckResult, validation_tasks
+from bus_checker.schema import memory_report
+from bus_checker.shared import SharedTimetableCache
+from bus_checker.soc import soc_series
+from bus_checker.sweep import battery_sweep
 
 # STREAMLIT CONFIGURATION 
 # changes: replaced st.pages with st.button and adjusted the code slightly to adhere to the logic of the new function
@@ -24,490 +58,339 @@ with st.sidebar:
     if st.button('Help', icon="❓", use_container_width=True):
         page = 'Help'
 
-# VALIDITY FUNCTIONS
-# changes: functions now return a dataframe with rows that do not adhere to the criteria checked for in each function, 
-# instead of individual error messages.
-def check_battery_status(bus_planning, distance_matrix, SOH, min_SOC, consumption_per_km):
-    """
-    Validates battery status throughout the bus schedule and adds state of charge (SOC) as a column.
+# VALIDITY AND KPI FUNCTIONS
+# changes: moved the validity checks to bus_checker.checks and the KPI functions to bus_checker.kpis, so they can be
+# imported and run in worker processes without Streamlit. bus_checker.runner runs them concurrently.
+
+# VISUALISATION FUNCTIONS
+# changes: added three functions to plot the activity distribution of the bus planning to gain better insight. 
+# plot_activity_pie_chart(df), plot_charging_heatmap(df), plot_activity_bar_chart(df) 
+# moved the plots to bus_checker.plots, they return a figure that is displayed here with st.pyplot.
+# the Gantt chart draws one collection of bars per color and is cached as an image per bus planning.
+# added a chart of the state of charge of every bus during the day, downsampled before drawing so hundreds of buses
+# can be shown, and cached as an image per bus planning, timetable and parameters.
+
+# DATA LOADING
+# changes: uploaded workbooks are parsed once per file content and kept in memory across reruns, together with the
+# distance lookup and the checks that do not depend on the parameter sliders. Moving a slider only recomputes
+# the battery check and the energy consumption. Every cache holds at most CACHE_ENTRIES results and drops the least
+# recently used one when it is full.
+# the bus planning is kept as a read-only PlanningModel, which is shared between reruns without copying.
+# locations, activities and clock times are stored as categoricals and numbers in the smallest type that fits, see
+# bus_checker.schema; departures of the timetable are stored as minutes since midnight.
+# parsed workbooks are also stored on disk in an Arrow sheet cache keyed by the hash of the file, so a workbook
+# uploaded before is not parsed again after a restart or in another app process.
+# the timetable is indexed and the distance matrix compiled into route arrays once per uploaded timetable.
+# identical timetable workbooks are parsed and indexed once per app process and shared read-only by all sessions,
+# see bus_checker.shared; the Performance tab shows how many sessions share every timetable.
+# the battery, continuity and travel time checks keep their results per block in the session; after an edited
+# planning is uploaded only the blocks that changed are checked again.
+CACHE_ENTRIES = 8
+
+# Parsed sheets of uploaded workbooks on disk, shared with other app processes and kept across restarts
+SHEET_CACHE = SheetCache()
+
+def file_digest(uploaded_file):
+    """Return the SHA-256 hash of the content of an uploaded file."""
+    return content_digest(uploaded_file.getvalue())
+
+@st.cache_resource(max_entries=CACHE_ENTRIES, show_spinner=False)
+def load_bus_planning(digest, _content):
+    """Read a bus planning workbook into a PlanningModel.
 
     Args:
-        bus_planning (DataFrame): The bus schedule with 'starttijd', 'eindtijd', and other columns.
-        distance_matrix (DataFrame): Distances between locations.
-        SOH (float): State of Health of the battery as a percentage.
-        min_SOC (float): Minimum state of charge required as a percentage.
-        consumption_per_km (float): Energy consumption per kilometer in kWh.
+        digest (str): Hash of the file content, used as the cache key.
+        _content (bytes): Content of the uploaded .xlsx file.
 
     Returns:
-        DataFrame: Rows from the schedule where battery status issues occur, with SOC as a column.
+        PlanningModel: The normalized bus planning.
     """
-    # Calculate battery capacities based on SOH and min_SOC
-    max_capacity = 300 * (SOH / 100)  # Maximum battery capacity in kWh
-    min_battery = max_capacity * (min_SOC / 100)  # Minimum allowed battery level
-
-    # Convert time columns to datetime for calculations
-    bus_planning['starttijd'] = pd.to_datetime(bus_planning['starttijd'], format='%H:%M')
-    bus_planning['eindtijd'] = pd.to_datetime(bus_planning['eindtijd'], format='%H:%M')
-
-    # Merge schedule with distance matrix to include distances between locations
-    df = pd.merge(bus_planning, distance_matrix, on=['startlocatie', 'eindlocatie', 'buslijn'], how='left')
-
-    # Calculate energy consumption based on distance and consumption per km
-    df['consumption (kWh)'] = (df['afstand in meters'] / 1000) * max(consumption_per_km, 0.7)
-
-    # Idle activities consume minimal power
-    df.loc[df['activiteit'] == 'idle', 'consumption (kWh)'] = 0.01
-
-    # Charging speeds for different battery levels
-    charging_speed_90 = 450 / 60  # Charging speed below 90% SOC in kWh per minute
-    charging_speed_10 = 60 / 60   # Charging speed above 90% SOC in kWh per minute
-
-    battery_level = max_capacity  # Initialize battery level
-    previous_loop_number = None  # Track the loop number for continuity
-
-    issues = []  # List to log rows with issues
-    state_of_charge = []  # Track SOC for each row
-
-    for i, row in df.iterrows():
-        # Reset battery level for new loops
-        if row['omloop nummer'] != previous_loop_number:
-            battery_level = max_capacity
-
-        # Handle charging activity
-        if row['activiteit'] == 'opladen':
-            charging_duration = (row['eindtijd'] - row['starttijd']).total_seconds() / 60  # Charging time in minutes
-            charge_power = (charging_speed_90 if battery_level <= (max_capacity * 0.9) else charging_speed_10) * charging_duration
-            battery_level = min(battery_level + charge_power, max_capacity)  # Cap battery level to max capacity
-        else:
-            # Subtract energy consumption for other activities
-            battery_level -= row['consumption (kWh)']
-
-        battery_level = max(battery_level, 0)  # Ensure battery level is not negative
-        state_of_charge.append(battery_level / max_capacity * 100)  # Append SOC as a percentage
-
-        # Log issues if battery falls below the minimum SOC
-        if battery_level < min_battery:
-            issues.append(row)
-
-        previous_loop_number = row['omloop nummer']
+    return read_planning(io.BytesIO(_content), SHEET_CACHE, digest)
 
-    # Add SOC as a column to the DataFrame
-    df['state_of_charge'] = state_of_charge
+@st.cache_resource(show_spinner=False)
+def shared_timetables():
+    """Timetable workbooks parsed and indexed once, shared by the sessions of all planners in this app process."""
+    return SharedTimetableCache(SHEET_CACHE, CACHE_ENTRIES)
 
-    # Return rows with issues or an empty DataFrame if no issues are found
-    if not issues:
-        return pd.DataFrame()
+def current_session():
+    """Identifier of the browser session of this script run."""
+    return get_script_run_ctx().session_id
 
-    failed_df = pd.DataFrame(issues)
-    failed_df['state of charge'] = df.loc[failed_df.index, 'state_of_charge']  # Add SOC to issue rows
-
-    # Ensure required columns are present in the output
-    required_columns = ['omloop nummer', 'starttijd', 'consumption (kWh)', 'state of charge']
-    missing_columns = set(required_columns) - set(failed_df.columns)
-    if missing_columns:
-        raise ValueError(f"Missing columns in output DataFrame: {missing_columns}")
-
-    return failed_df[required_columns]
-
-def check_route_continuity(bus_planning):
-    """
-    Checks for route continuity issues within the same loop number.
+def load_timetable(digest, content, session_id):
+    """The shared copy of a timetable workbook, held by the session until it uploads another timetable.
 
     Args:
-        bus_planning (DataFrame): The bus schedule.
+        digest (str): Hash of the file content, used as the cache key.
+        content (bytes): Content of the uploaded .xlsx file.
+        session_id (str): Identifier of the browser session.
 
     Returns:
-        DataFrame: Rows with route continuity issues.
-    """
-    issues = []
-
-    # Verify necessary columns are present
-    required_columns = {'omloop nummer', 'startlocatie', 'eindlocatie', 'starttijd'}
-    if not required_columns.issubset(bus_planning.columns):
-        missing_columns = required_columns - set(bus_planning.columns)
-        st.error(f"Missing columns in 'bus_planning': {missing_columns}")
-        return pd.DataFrame()
-
-    # Sort schedule by loop number and start time
-    bus_planning = bus_planning.sort_values(by=['omloop nummer', 'starttijd']).reset_index(drop=True)
-
-    for i in range(len(bus_planning) - 1):
-        current_row = bus_planning.iloc[i]
-        next_row = bus_planning.iloc[i + 1]
-
-        # Check continuity within the same loop number
-        if (current_row['omloop nummer'] == next_row['omloop nummer']) & (current_row['eindlocatie'] != next_row['startlocatie']):
-            issues.append({
-                'omloop nummer': current_row['omloop nummer'],
-                'current end location': current_row['eindlocatie'],
-                'next start location': next_row['startlocatie'],
-                'current end time': current_row['eindtijd'],
-                'next start time': next_row['starttijd'],
-            })
-
-    return pd.DataFrame(issues)
-
-def driven_rides(bus_planning):
-    """
-    Filters bus planning data for rides that include a bus line.
-
-    Args:
-        bus_planning (DataFrame): The bus schedule.
-
-    Returns:
-        DataFrame: Filtered DataFrame with rides containing a bus line.
-    """
-    return bus_planning[['startlocatie', 'starttijd', 'eindlocatie', 'buslijn']].dropna(subset=['buslijn'])
-
-def every_ride_covered(bus_planning, timetable):
+        SharedTimetable: The timetable and distance matrix, with the distance lookup and the timetable index.
     """
-    Checks if every trip in the bus planning is covered in the timetable.
+    return shared_timetables().acquire(session_id, content, digest)
+
+@st.cache_data(max_entries=CACHE_ENTRIES, show_spinner=False)
+def cached_planning_distances(planning_digest, timetable_digest, _model, _distance_lookup):
+    """Cached version of planning_distances, keyed by the hashes of both uploads."""
+    return planning_distances(_model, _distance_lookup)
+
+@st.cache_data(max_entries=CACHE_ENTRIES, show_spinner=False)
+def cached_block_digests(planning_digest, _model):
+    """Cached version of block_digests, keyed by the hash of the bus planning."""
+    return block_digests(_model)
+
+@st.cache_data(max_entries=CACHE_ENTRIES, show_spinner=False)
+def cached_fleet_kpis(planning_digest, _model):
+    """Cached time KPIs of the bus planning for the charts, without the energy that depends on the sliders."""
+    return fleet_kpis(_model)
+
+@st.cache_data(max_entries=CACHE_ENTRIES, show_spinner=False)
+def cached_ride_coverage(planning_digest, timetable_digest, _model, _timetable_index):
+    """Cached version of every_ride_covered, keyed by the hashes of both uploads."""
+    return every_ride_covered(_model, _timetable_index)
+
+@st.cache_data(max_entries=CACHE_ENTRIES, show_spinner=False)
+def cached_battery_sweep(planning_digest, timetable_digest, _model, _distances):
+    """Cached version of battery_sweep over the full slider ranges, keyed by the hashes of both uploads."""
+    return battery_sweep(_model, _distances)
+
+@st.cache_data(max_entries=CACHE_ENTRIES, show_spinner=False)
+def cached_battery_repair(planning_digest, timetable_digest, parameters, _model, _distance_lookup):
+    """Charging repairs of the blocks that fail the battery check and the repaired planning as a workbook."""
+    repair = repair_battery(_model, _distance_lookup, *parameters)
+    return repair, planning_workbook(repair.planning)
+
+@st.cache_data(max_entries=CACHE_ENTRIES, show_spinner=False)
+def cached_built_planning(timetable_digest, parameters, _timetable, _distance_lookup):
+    """Bus planning built from the timetable and its workbook, keyed by the hash of the timetable and the sliders."""
+    planning = build_planning(_timetable, _distance_lookup, *parameters)
+    return planning, planning_workbook(planning)
+
+@st.cache_data(max_entries=CACHE_ENTRIES, show_spinner=False)
+def cached_soc_chart(planning_digest, timetable_digest, parameters, _model, _distances):
+    """Chart of the state of charge of every block rendered to PNG, keyed by both uploads and the sliders."""
+    SOH, min_SOC, consumption_per_km = parameters
+    return figure_png(plot_soc_series(soc_series(_model, _distances, SOH, consumption_per_km), min_SOC))
+
+@st.cache_data(max_entries=CACHE_ENTRIES, show_spinner=False)
+def cached_schedule_chart(planning_digest, _model):
+    """Gantt chart of the bus planning rendered to PNG, keyed by the hash of the bus planning."""
+    return figure_png(plot_schedule_from_excel(_model))
+
+def render_chart(plot, *args):
+    """Draw a chart and render it to PNG, so it can be drawn in a worker thread and shown by the script."""
+    return figure_png(plot(*args))
+
+def activity_chart(plot, planning_digest, model):
+    """Chart of the time per activity rendered to PNG, drawn from the cached KPIs of the bus planning."""
+    return figure_png(plot(cached_fleet_kpis(planning_digest, model)))
+
+def charger_usage(model, distances, SOH, consumption_per_km):
+    """Chargers in use and power drawn during the day; without distances every session charges at the full rate."""
+    power = () if distances is None else charging_power(model, distances, SOH, consumption_per_km)
+    return charger_occupancy(model, *power)
+
+# RESULT DISPLAY
+# changes: the checks and KPIs run concurrently; every result is shown in its own place as soon as it is available,
+# together with the time the check took.
+# the Performance tab shows the time, rows and peak memory of every loading step, check, KPI and plot of a run.
+# Profile capture with cProfile or pyinstrument is opt-in, also with the BUS_CHECKER_PROFILE environment variable.
+# every step is also written as a JSON line to standard error when the BUS_CHECKER_PERFORMANCE_LOG environment variable
+# is set, e.g. BUS_CHECKER_PERFORMANCE_LOG=1, so the timings end up in the logs of a deployment.
+# the Performance tab also shows the memory of the uploaded data as read and in its compact column types.
+# the KPIs are computed in one pass by bus_checker.kpis.fleet_kpis; the metrics, the table per block and the activity
+# charts all read from its result. Idle time, charging time and the share of time in regular service were added.
+# when the battery check finds problems, charging repairs are proposed for the failing blocks and the repaired
+# planning can be downloaded.
+# loading the uploads, every check and every chart are tasks of a bus_checker.pipeline run in the background. Every
+# section fills in when its task is done, and the tasks of a stale run are cancelled when a slider moves or a new
+# file is uploaded.
+
+# Profilers that can capture a whole run, the default comes from the environment
+PROFILERS = {'None': None, 'cProfile': 'cprofile', 'pyinstrument': 'pyinstrument'}
+
+# JSON lines of every run in the logs, switched on with the environment
+if DEFAULT_JSON_LOG:
+    enable_json_log()
+
+KPI_MESSAGES = {
+    'buses': ('Total Buses Used', 'displaying buses'),
+    'deadhead': ('Total Deadhead Trips In Minutes', 'displaying deadhead time'),
+    'energy': ('Total Energy Consumed in kW', 'displaying energy consumption'),
+    'idle': ('Total Idle Time In Minutes', 'displaying idle time'),
+    'charging': ('Total Charging Time In Minutes', 'displaying charging time'),
+    'revenue ratio': ('Time In Regular Service', 'displaying the revenue service ratio'),
+}
+
+CHECK_MESSAGES = {
+    'battery': ('Battery Status', 'Battery dips below minimum State Of Charge', 'checking battery'),
+    'continuity': ('Route Continuity', 'Start and end location or times do not line up', 'checking route continuity'),
+    'coverage': (
+        'Trip Coverage',
+        'Some trips in the timetable are not covered or covered more than once, or the bus planning has extra trips',
+        'checking if each trip is covered',
+    ),
+    'travel time': ('Travel Time', 'Travel time outside of bound as specified in distance matrix', 'checking the travel time'),
+    'chargers': (
+        'Charger Capacity',
+        'More buses charge at the same time than the depot has chargers or grid power for',
+        'checking the charger capacity',
+    ),
+}
+
+def show_kpis(slots, result, energy_error=None):
+    """Display every fleet KPI in the place reserved for it, and the KPIs per block.
 
     Args:
-        bus_planning (DataFrame): Planned rides.
-        timetable (DataFrame): Timetable rides.
-
-    Returns:
-        DataFrame: Discrepancies between planning and timetable.
+        slots (dict): Streamlit placeholders (st.empty) by KPI name, and 'blocks' for the table per block.
+        result (CheckResult): The result of the KPI computation, with FleetKPIs as its value.
+        energy_error (Exception, optional): Why the energy is unknown, shown in its place.
     """
-    # Rename column for consistency
-    if 'vertrektijd' in timetable.columns:
-        timetable = timetable.rename(columns={'vertrektijd': 'starttijd'})
-
-    # Ensure necessary columns are present
-    if 'starttijd' not in bus_planning.columns or 'starttijd' not in timetable.columns:
-        st.error("Missing 'starttijd' column in bus planning or timetable.")
-        return pd.DataFrame()
-
-    # Convert start times to datetime for comparison
-    bus_planning['starttijd'] = pd.to_datetime(bus_planning['starttijd'], errors='coerce')
-    timetable['starttijd'] = pd.to_datetime(timetable['starttijd'], errors='coerce')
-
-    # Identify differences between planning and timetable
-    differences = bus_planning.merge(
-        timetable, on=['startlocatie', 'starttijd', 'eindlocatie', 'buslijn'], how='outer', indicator=True
-    )
-
-    issues = differences.query('_merge != "both"')
+    if result.error is not None:
+        for name, (_, action) in KPI_MESSAGES.items():
+            slots[name].error(f'Something went wrong {action}: {str(result.error)}')
+        return
 
-    if not issues.empty:
-        return issues[['omloop nummer', 'startlocatie', 'activiteit', 'starttijd']]
+    totals = result.value.totals()
+    for name, (label, action) in KPI_MESSAGES.items():
+        value = totals[name]
+        if value is None:
+            slots[name].error(f'Something went wrong {action}: {str(energy_error or "no trips to measure")}')
+        elif name == 'buses':
+            slots[name].metric(label, value, delta=(value - 20), delta_color="inverse")
+        elif name == 'revenue ratio':
+            slots[name].metric(label, f'{value:.0%}')
+        else:
+            slots[name].metric(label, value)
 
-    return pd.DataFrame(columns=['omloop nummer', 'startlocatie', 'activiteit', 'starttijd'])
+    with slots['blocks'].expander('Click to see the KPIs per block'):
+        st.dataframe(result.value.per_block(), hide_index=True)
 
-def check_travel_time(bus_planning, distance_matrix):
-    """
-    Validates that travel times are within expected ranges.
+def show_result(slot, result):
+    """Display the result of a check in the place reserved for it.
 
     Args:
-        bus_planning (DataFrame): Planned rides.
-        distance_matrix (DataFrame): Expected travel time data.
-
-    Returns:
-        DataFrame: Discrepancies in travel times.
+        slot: Streamlit placeholder (st.empty) reserved for the result.
+        result (CheckResult): The result of the check.
     """
-    print("Initial columns:", bus_planning.columns)
-
-    # Strip column names to avoid leading/trailing spaces
-    bus_planning.columns = bus_planning.columns.str.strip()
-
-    # Ensure required columns are present
-    if 'starttijd' not in bus_planning.columns or 'eindtijd' not in bus_planning.columns:
-        print("Missing columns:", bus_planning.columns)
-        return pd.DataFrame()
-
-    # Validate and convert time columns to datetime
-    try:
-        bus_planning['starttijd'] = pd.to_datetime(bus_planning['starttijd'], format='%H:%M:%S')
-        bus_planning['eindtijd'] = pd.to_datetime(bus_planning['eindtijd'], format='%H:%M:%S')
-    except Exception as e:
-        print("Datetime conversion error:", e)
-        return pd.DataFrame()
-
-    print("After datetime conversion:")
-    print(bus_planning[['starttijd', 'eindtijd']].info())
-
-    # Calculate the time difference in minutes
-    bus_planning['difference_in_minutes'] = (
-        bus_planning['eindtijd'] - bus_planning['starttijd']
-    ).dt.total_seconds() / 60
-
-    # Merge planning data with the distance matrix
-    merged_df = pd.merge(bus_planning, distance_matrix, on=['startlocatie', 'eindlocatie', 'buslijn'], how='inner')
-
-    issues = []
-
-    # Check if travel times fall within the expected range
-    for _, row in merged_df.iterrows():
-        if not (row['min reistijd in min'] <= row['difference_in_minutes'] <= row['max reistijd in min']):
-            issues.append({
-                'omloop nummer': row.get('omloop nummer', None),
-                'startlocatie': row['startlocatie'],
-                'eindlocatie': row['eindlocatie'],
-                'reistijd': row['difference_in_minutes'],
-                'starttijd': row['starttijd']
-            })
-
-    return pd.DataFrame(issues)
-
-# VISUALISATION FUNCTIONS
-# changes: added three functions to plot the activity distribution of the bus planning to gain better insight. 
-# plot_activity_pie_chart(df), plot_charging_heatmap(df), plot_activity_bar_chart(df) 
-
-def plot_schedule_from_excel(bus_planning):
-    """Plot a Gantt chart for bus scheduling based on a DataFrame."""
-    required_columns = ['starttijd', 'eindtijd', 'buslijn', 'omloop nummer', 'activiteit']
-    
-    # Check if all required columns are present
-    if not all(col in bus_planning.columns for col in required_columns):
-        st.error("One or more necessary columns are missing in bus planning.")
-        return
-
-    # Convert time columns to datetime format
-    bus_planning['starttijd'] = pd.to_datetime(bus_planning['starttijd'], errors='coerce')
-    bus_planning['eindtijd'] = pd.to_datetime(bus_planning['eindtijd'], errors='coerce')
-
-    # Remove rows with invalid datetime values
-    bus_planning = bus_planning.dropna(subset=['starttijd', 'eindtijd'])
-
-    # Calculate duration in hours, ensuring a minimum value for visibility
-    bus_planning['duration'] = ((bus_planning['eindtijd'] - bus_planning['starttijd']).dt.total_seconds() / 3600).clip(lower=0.05)
-
-    # Define color mapping for various activities and bus lines
-    color_map = {
-        '400.0': 'blue',
-        '401.0': 'yellow',
-        'materiaal rit': 'green',
-        'idle': 'red',
-        'opladen': 'orange'
-    }
-    bus_planning['buslijn'] = bus_planning['buslijn'].astype(str)
-
-    # Determine the color for each row based on bus line or activity
-    def determine_color(row):
-        return color_map.get(row['buslijn'], color_map.get(row['activiteit'], 'gray'))
-
-    bus_planning['color'] = bus_planning.apply(determine_color, axis=1)
-
-    # Create a Gantt chart
-    fig, ax = plt.subplots(figsize=(12, 6))
-    omloopnummers = bus_planning['omloop nummer'].unique()
-    omloop_indices = {omloop: i for i, omloop in enumerate(omloopnummers)}
-
-    for omloop, omloop_index in omloop_indices.items():
-        trips = bus_planning[bus_planning['omloop nummer'] == omloop]
-
-        if trips.empty:
-            # Add a placeholder bar for empty schedules
-            ax.barh(omloop_index, 1, left=0, color='black', edgecolor='black')
-            continue
-
-        for _, trip in trips.iterrows():
-            # Plot each trip as a horizontal bar
-            ax.barh(
-                omloop_index, 
-                trip['duration'], 
-                left=trip['starttijd'].hour + trip['starttijd'].minute / 60, 
-                color=trip['color'], 
-                edgecolor='black'
-            )
+    with slot.container():
+        _, problem, action = CHECK_MESSAGES[result.name]
+        if result.error is not None:
+            # Handle and display errors raised by the check
+            st.error(f'Something went wrong {action}: {str(result.error)}')
+        elif result.value.empty:
+            # Display a message if no problems are found
+            st.write('No problems found!')
+        else:
+            # Highlight and display rows with problems
+            st.markdown(f':red[{problem}]')
+            if 'issue' in result.value.columns:
+                counts = result.value['issue'].value_counts()
+                st.write(', '.join(f'{count} {issue}' for issue, count in counts.items()))
+            with st.expander('Click to see the affected rows'):
+                st.dataframe(result.value)
+        st.caption(f'Checked in {result.seconds:.2f} s')
+
+def show_repairs(repair):
+    """Display the proposed charging repairs and offer the repaired bus planning for download.
 
-    # Add labels and legend to the chart
-    ax.set_yticks(list(omloop_indices.values()))
-    ax.set_yticklabels(list(omloop_indices.keys()))
-    ax.set_xlabel('Time (hours)')
-    ax.set_ylabel('Bus Number')
-    ax.set_title('Gantt Chart for Bus Scheduling')
-
-    # Define legend elements
-    legend_elements = [
-        Patch(facecolor=color_map['400.0'], edgecolor='black', label='Regular trip 400'),
-        Patch(facecolor=color_map['401.0'], edgecolor='black', label='Regular trip 401'),
-        Patch(facecolor=color_map['materiaal rit'], edgecolor='black', label='Deadhead trip'),
-        Patch(facecolor=color_map['idle'], edgecolor='black', label='Idle'),
-        Patch(facecolor=color_map['opladen'], edgecolor='black', label='Charging')
-    ]
-    ax.legend(handles=legend_elements, title='Legend')
-
-    # Render the plot in Streamlit
-    st.pyplot(fig)
-
-def plot_activity_pie_chart(df):
-    """
-    Display a pie chart showing the distribution of activities in the total planning.
+    Args:
+        repair (tuple): The RepairResult and the repaired bus planning as an .xlsx workbook.
     """
-    df['starttijd'] = pd.to_datetime(df['starttijd'], format='%H:%M:%S', errors='coerce')
-    df['eindtijd'] = pd.to_datetime(df['eindtijd'], format='%H:%M:%S', errors='coerce')
-
-    # Calculate the duration of each activity
-    df['duur'] = (df['eindtijd'] - df['starttijd']).dt.total_seconds() / 3600
-
-    # Group data by activity and calculate the total duration per activity
-    stapel_data = df.groupby('activiteit')['duur'].sum().reset_index()
-
-    # Ensure all expected activities are included
-    activiteit_labels = ['opladen', 'idle']
-    for label in activiteit_labels:
-        if label not in stapel_data['activiteit'].values:
-            stapel_data = stapel_data._append({'activiteit': label, 'duur': 0}, ignore_index=True)
-
-    nieuwe_labels = ['Regular Trip', 'Idle', 'Deadhead Trip', 'Charging']
-
-    # Create and display the pie chart
-    fig, ax = plt.subplots(figsize=(8, 8))
-    ax.pie(
-        stapel_data['duur'], 
-        labels=None, 
-        autopct=lambda pct: f'{pct:.1f}%', 
-        startangle=90, 
-        colors=['blue', 'red', 'green', 'orange'], 
-        textprops={'fontsize': 14, 'fontweight': 'bold'}
-    )
-    ax.legend(nieuwe_labels, loc="best")
-    ax.set_title('Distribution of Activities in the Total Planning')
-    st.pyplot(fig)
+    repair, workbook = repair
+    if len(repair.repaired):
+        st.write(f'**{len(repair.repairs)} repairs** make **{len(repair.repaired)}** blocks pass the battery check, '
+                 'by charging at the garage during idle time.')
+    if len(repair.unrepaired):
+        st.markdown(f':red[These blocks cannot be repaired with their idle time: '
+                    f'{", ".join(map(str, repair.unrepaired))}]')
+    if not repair.repairs.empty:
+        with st.expander('Click to see the repairs'):
+            st.dataframe(repair.repairs, hide_index=True)
+        st.download_button('Download the repaired bus planning', workbook, file_name='repaired_bus_planning.xlsx',
+                           mime='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+
+def show_chart(slot, subject, result):
+    """Display a chart rendered to PNG in the place reserved for it, or why it could not be drawn.
 
-def plot_charging_heatmap(df):
-    """
-    Display a heatmap showing the 'Charging' activity by hour of the day.
+    Args:
+        slot: Streamlit placeholder (st.empty) reserved for the chart.
+        subject (str): What the chart shows, used in the error message.
+        result (CheckResult): The result of the task that rendered the chart.
     """
-    df['starttijd'] = pd.to_datetime(df['starttijd'], format='%H:%M:%S', errors='coerce')
-    df['uur'] = df['starttijd'].dt.hour
-
-    # Filter data for 'Charging' activity
-    opladen_df = df[df['activiteit'] == 'opladen']
-
-    # Count occurrences of charging by hour
-    heatmap_data = opladen_df['uur'].value_counts().reindex(range(24), fill_value=0)
-
-    # Create and display the heatmap
-    fig, ax = plt.subplots(figsize=(10, 6))
-    sns.heatmap(
-        heatmap_data.values.reshape(1, -1), 
-        cmap='YlGnBu', 
-        annot=True, 
-        cbar=True, 
-        ax=ax, 
-        xticklabels=[f"{hour}:00" for hour in range(24)], 
-        yticklabels=["Charging"]
-    )
-    ax.set_title('Heatmap of Activity "Charging" per Hour')
-    ax.set_xlabel('Hour of the Day')
-    ax.set_ylabel('Activity')
-    st.pyplot(fig)
+    if result.error is not None:
+        slot.error(f'Something went wrong drawing {subject}: {str(result.error)}')
+    else:
+        slot.image(result.value)
+
+def show_repair_result(slot, result):
+    """Display the charging repairs, or why they could not be proposed, in the place reserved for them."""
+    with slot.container():
+        st.subheader('Battery Repairs')
+        if result.error is not None:
+            st.error(f'Something went wrong repairing the battery problems: {str(result.error)}')
+        else:
+            show_repairs(result.value)
 
-def plot_activity_bar_chart(df):
-    """
-    Display a bar chart showing the total time spent on each activity.
-    """
-    df['starttijd'] = pd.to_datetime(df['starttijd'], format='%H:%M:%S', errors='coerce')
-    df['eindtijd'] = pd.to_datetime(df['eindtijd'], format='%H:%M:%S', errors='coerce')
-
-    # Calculate the duration of each activity
-    df['duur'] = (df['eindtijd'] - df['starttijd']).dt.total_seconds() / 3600
-
-    # Group data by activity and calculate the total duration per activity
-    stapel_data = df.groupby('activiteit')['duur'].sum().reset_index()
-
-    # Ensure all expected activities are included
-    activiteit_labels = ['opladen', 'idle']
-    for label in activiteit_labels:
-        if label not in stapel_data['activiteit'].values:
-            stapel_data = stapel_data._append({'activiteit': label, 'duur': 0}, ignore_index=True)
-
-    # Create and display the bar chart
-    fig, ax = plt.subplots(figsize=(10, 6))
-    ax.bar(stapel_data['activiteit'], stapel_data['duur'], color=['blue', 'red', 'green', 'orange'])
-    nieuwe_labels = ['Regular Trip', 'Idle', 'Deadhead Trip', 'Charging']
-    ax.set_xticks(range(len(nieuwe_labels)))
-    ax.set_xticklabels(nieuwe_labels, fontsize=12)
-    ax.set_title('Total Time per Activity')
-    ax.set_xlabel('Activity')
-    ax.set_ylabel('Total Time (Hours)')
-    st.pyplot(fig)
-
-# KPI FUNCTIONS
-# changes: added functions to calculate KPI's; number of buses used in bus planning, deadhead minutes, total energy consumption
-def count_buses(bus_planning):
-    """Count the number of unique 'omloop nummer' values in the bus planning data.
+def show_memory(model, timetable, distance_matrix):
+    """Display the memory of the loaded data as read from the workbooks and as kept in the session.
 
     Args:
-        bus_planning (DataFrame): The data containing bus schedules.
-
-    Returns:
-        int: Number of unique 'omloop nummer' values.
-
-    Raises:
-        ValueError: If 'omloop nummer' column is missing in the data.
+        model (PlanningModel): The bus planning.
+        timetable (DataFrame): The timetable.
+        distance_matrix (DataFrame): The distance matrix.
     """
-    # Check if the required column exists in the data
-    if 'omloop nummer' not in bus_planning.columns:
-        raise ValueError("'omloop nummer' column not found in the data.")
-
-    # Drop NaN values and count unique entries
-    valid_omloop = bus_planning['omloop nummer'].dropna()
-    return valid_omloop.nunique()
-
-def calculate_deadhead_time(bus_planning):
-    """Calculate the total time spent on deadhead trips in minutes.
+    memory = memory_report({'bus planning': model, 'timetable': timetable, 'distance matrix': distance_matrix})
+    st.write(f'**Your data** takes **{memory["stored (MB)"].sum():.2f} MB** in memory, '
+             f'**{memory["as read (MB)"].sum():.2f} MB** as read from the workbooks.')
+    st.dataframe(memory, hide_index=True, column_config={
+        'as read (MB)': st.column_config.NumberColumn(format='%.3f'),
+        'stored (MB)': st.column_config.NumberColumn(format='%.3f'),
+        'reduction': st.column_config.NumberColumn(format='%.1fx'),
+    })
+
+def show_shared_timetables(cache):
+    """Display the timetables shared by the sessions of all planners in this app process.
 
     Args:
-        bus_planning (DataFrame): The data containing bus schedules.
-
-    Returns:
-        float: Total deadhead time in minutes.
-
-    Raises:
-        ValueError: If required columns are missing in the data.
+        cache (SharedTimetableCache): The shared timetables.
     """
-    # Define required columns for the calculation
-    required_columns = ['starttijd datum', 'eindtijd datum', 'activiteit']
-
-    # Check if all required columns exist in the data
-    if not all(col in bus_planning.columns for col in required_columns):
-        raise ValueError("Required columns for deadhead time calculation are missing.")
-
-    # Filter the data for deadhead trips ('materiaal rit' activity)
-    deadhead_trips = bus_planning[bus_planning['activiteit'] == 'materiaal rit']
+    report = cache.report(current_session())
+    st.write(f'Timetables shared in this app process: **{len(report)}**, sessions using them: '
+             f'**{report["sessions"].sum()}**, workbooks parsed: **{cache.loads}**, reused: **{cache.hits}**.')
+    st.dataframe(report, hide_index=True, column_config={
+        'memory (MB)': st.column_config.NumberColumn(format='%.3f'),
+    })
 
-    # Convert start and end times to datetime format, handling errors
-    deadhead_trips['starttijd datum'] = pd.to_datetime(deadhead_trips['starttijd datum'], errors='coerce')
-    deadhead_trips['eindtijd datum'] = pd.to_datetime(deadhead_trips['eindtijd datum'], errors='coerce')
-
-    # Calculate the duration of each deadhead trip in minutes
-    deadhead_trips['duration_minutes'] = (deadhead_trips['eindtijd datum'] - deadhead_trips['starttijd datum']).dt.total_seconds() / 60
-
-    # Sum up the total duration and round to the nearest minute
-    return round(deadhead_trips['duration_minutes'].sum(), 0)
-
-def calculate_energy_consumption(bus_planning, distance_matrix, consumption_per_km):
-    """Calculate the total energy consumed for the bus planning.
+def show_performance(profiler):
+    """Display the time, rows and memory of every step of the run, and the captured profile.
 
     Args:
-        bus_planning (DataFrame): The bus schedule with details of trips and activities.
-        distance_matrix (DataFrame): Matrix with distances between locations.
-        consumption_per_km (float): Energy consumption per kilometer in kWh.
-
-    Returns:
-        float: Total energy consumed in kWh.
+        profiler (RunProfiler): The profiler of the finished run.
     """
-    # Merge the bus planning data with the distance matrix
-    df = pd.merge(bus_planning, distance_matrix, on=['startlocatie', 'eindlocatie', 'buslijn'], how='left')
-
-    # Calculate energy consumption for each trip in kWh
-    df['consumption (kWh)'] = (df['afstand in meters'] / 1000) * max(consumption_per_km, 0.7)
-
-    # Adjust energy consumption for idle activities to a minimal value
-    df.loc[df['activiteit'] == 'idle', 'consumption (kWh)'] = 0.01
+    frame = profiler.to_frame()
+    if frame.empty:
+        st.write('Upload your data to measure the checks.')
+        return
 
-    # Calculate the total energy consumption and round to the nearest kWh
-    total_energy_consumed = round(df['consumption (kWh)'].sum(), 0)
+    st.write(f'**{len(frame)} steps** took **{frame["seconds"].sum():.2f} s** in total.')
+    if not profiler.trace_memory:
+        frame = frame.drop(columns='peak memory (MB)')
+    st.dataframe(frame, hide_index=True)
+    st.download_button('Download as JSON', profiler.to_json(), file_name=f'performance-{profiler.run_id}.json',
+                       mime='application/json')
 
-    return total_energy_consumed
+    if profiler.report is not None:
+        with st.expander(f'Click to see the {profiler.capture} profile'):
+            st.code(profiler.report, language=None)
 
 # PAGE DEFINITIONS
 # changes: added tabs to bus planning checker page; Data and Parameters, Validity Checks, Your Data.
+# added a Parameter Sweep tab that runs the battery check for every SOH and consumption combination at once.
 # added three parameter sliders, one for SOH, minimum SOC and battery consumption per km.
+# added a Compare Plannings tab that validates several bus plannings against one timetable and ranks them.
+# added a charger capacity check, with sliders for the number of chargers and the grid power at the depot.
+# added a bus planning generator to the Data and Parameters tab, which builds a planning from the uploaded timetable.
 # changed the error dislpay of every criterium from a list of errors to a dropdown menu if errors were found, and 'No problems found!' if not.
 # changed the 'help' page to be applicable to the updated functionality of the tool
 # changed the 'how it works' page to be applicable to the updated functionality of the tool and removed information that was made redundant.
@@ -516,8 +399,35 @@ def bus_checker_page():
     st.header("Bus Planning Checker")
 
     # Create tabs for different functionalities
-    tab1, tab2, tab3 = st.tabs(['Data and Parameters', 'Validity Checks', 'Your Data'])
+    tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs(
+        ['Data and Parameters', 'Validity Checks', 'Your Data', 'Parameter Sweep', 'Compare Plannings', 'Performance']
+    )
+
+    # The profiling settings are read first, so they apply to the whole run
+    with tab6:
+        st.subheader('Performance')
+        col1, col2 = st.columns(2)
+        trace_memory = col1.toggle('Measure peak memory', help='Slower, the checks run one after another')
+        default = list(PROFILERS.values()).index(DEFAULT_CAPTURE) if DEFAULT_CAPTURE in PROFILERS.values() else 0
+        capture = col2.selectbox('Profiler', list(PROFILERS), index=default)
+        report = st.container()
+
+    profiler = RunProfiler(trace_memory, PROFILERS[capture])
+    with profiler:
+        check_bus_planning(tab1, tab2, tab3, tab4, tab5, tab6, profiler)
+
+    with report:
+        show_performance(profiler)
+
+
+def check_bus_planning(tab1, tab2, tab3, tab4, tab5, tab6, profiler):
+    """Fill the tabs of the Bus Planning Checker page and measure every step.
 
+    Args:
+        tab1, tab2, tab3, tab4, tab5, tab6: The Data and Parameters, Validity Checks, Your Data, Parameter Sweep,
+            Compare Plannings and Performance tabs.
+        profiler (RunProfiler): Records the time taken by every step.
+    """
     with tab1:
         # Section for uploading files and setting parameters
         st.subheader('Data')
@@ -535,164 +445,336 @@ def bus_checker_page():
         SOH =                   st.slider("**State Of Health** - %", 85, 95, 90)
         min_SOC =               st.slider("**Minimum State Of Charge** - %", 5, 25, 10)
         consumption_per_km =    st.slider("**Battery Consumption Per KM** - KwH", 0.7, 2.5, 1.6)
+        max_chargers =          st.slider("**Chargers At The Depot**", 1, 50, DEFAULT_MAX_CHARGERS)
+        max_power =             st.slider("**Grid Power For Charging** - kW", 500, 20000, DEFAULT_MAX_POWER, step=500)
+
+        # A bus planning for the uploaded timetable, which can be downloaded and checked like any other
+        if given_data:
+            generate_planning(given_data, SOH, min_SOC, consumption_per_km, profiler)
+        else:
+            # A session without a timetable no longer holds one of the shared timetables
+            shared_timetables().release(current_session())
+
+    with tab5:
+        # Candidate plannings are compared against the timetable uploaded in the Data and Parameters tab
+        compare_candidates(given_data, SOH, min_SOC, consumption_per_km, profiler)
 
     with tab3:
         # Check if the required files are uploaded
         if not uploaded_file or not given_data:
             st.error("You need to upload your data in the 'Data and Parameters' tab.")
             return  # Stop execution if files are not uploaded
-        
-        if uploaded_file and given_data:
-            with st.spinner('Your data is being processed...'): 
-                try:
-                    # Read the uploaded files into DataFrames
-                    bus_planning = pd.read_excel(uploaded_file)
-                    timetable = pd.read_excel(given_data, sheet_name='Dienstregeling')
-                    distance_matrix = pd.read_excel(given_data, sheet_name="Afstandsmatrix")
-                except Exception as e:
-                    st.error(f"Error reading Excel files: {str(e)}")
-                    return
-
-                # Display the bus planning data
-                st.write('**Your Bus Planning**')
-                st.dataframe(bus_planning, hide_index=True)
-
-                # Generate a Gantt chart for the bus planning
-                st.write('**Gantt Chart Of Your Bus Planning**')
-                plot_schedule_from_excel(bus_planning) 
-
-                # Display activity visualizations
-                st.write('**Activity Visualisations Of Your Bus Planning**')
-                col1, col2, col3 = st.columns(3)
-                with col1:
-                    st.write("Distribution of activities")
-                    plot_activity_pie_chart(bus_planning)
-
-                with col2:
-                    st.write("Distribution of charging")
-                    plot_charging_heatmap(bus_planning)
-
-                with col3:
-                    st.write("Total time per activity")
-                    plot_activity_bar_chart(bus_planning)
-            
-                # Check if any uploaded data is empty
-                if bus_planning.empty or timetable.empty or distance_matrix.empty:
-                    st.error("One or more DataFrames are empty. Please check the uploaded files.")
-                    return
-
-                # Instruction to expand graphs
-                st.write('*Click on the graph to expand*')
-                
+
+    # The tasks of the previous run of this session are stale now, this run starts its own in the background
+    ctx = get_script_run_ctx()
+    pipeline = st.session_state.setdefault('pipeline', Pipeline())
+    run = pipeline.start(
+        'serial' if profiler.serial else 'auto',
+        prepare=lambda: add_script_run_ctx(threading.current_thread(), ctx),
+        yield_point=lambda: st.session_state.get('pipeline'),
+    )
+    with run:
+        sliders = (SOH, min_SOC, consumption_per_km, max_chargers, max_power)
+        process_uploads(run, uploaded_file, given_data, sliders, tab2, tab3, tab4, tab6, profiler)
+
+
+def process_uploads(run, uploaded_file, given_data, sliders, tab2, tab3, tab4, tab6, profiler):
+    """Load the uploaded files and fill the Validity Checks, Your Data and Parameter Sweep tabs.
+
+    Loading, every check and every chart is a task of the pipeline run. A place is reserved for every result first,
+    and filled in as soon as its task is done, so the tabs fill in while the slower tasks are still running.
+
+    Args:
+        run (PipelineRun): The tasks of this script run, cancelled when the user changes a slider or a file.
+        uploaded_file, given_data: The uploaded bus planning and timetable workbooks.
+        sliders (tuple): State Of Health, minimum State Of Charge, consumption per km, chargers and grid power.
+        tab2, tab3, tab4, tab6: The Validity Checks, Your Data, Parameter Sweep and Performance tabs.
+        profiler (RunProfiler): Records the time taken by every step.
+    """
+    SOH, min_SOC, consumption_per_km, max_chargers, max_power = sliders
+    parameters = (SOH, min_SOC, consumption_per_km)
+
+    # Both workbooks are parsed at the same time, parsed files are reused across reruns
+    planning_digest = file_digest(uploaded_file)
+    timetable_digest = file_digest(given_data)
+    run.submit('bus planning', profiler.timed('bus planning', 'load', load_bus_planning, len),
+               planning_digest, uploaded_file.getvalue())
+    run.submit('timetable', profiler.timed('timetable', 'load', load_timetable, lambda shared: len(shared.timetable)),
+               timetable_digest, given_data.getvalue(), current_session())
+    with tab3, st.spinner('Your data is being processed...'):
+        loaded = [run.result('bus planning'), run.result('timetable')]
+    errors = [result.error for result in loaded if result.error is not None]
+    if errors:
+        with tab3:
+            st.error(f"Error reading Excel files: {str(errors[0])}")
+        return
+    model, shared = (result.value for result in loaded)
+    timetable, distance_matrix = shared.timetable, shared.distance_matrix
+
+    # The memory of the loaded data and the timetables shared with other planners, below the steps of the run
+    with tab6:
+        show_memory(model, timetable, distance_matrix)
+        show_shared_timetables(shared_timetables())
+
+    # How every result is shown, by the name of its task
+    shown = {}
+
+    def submit(name, kind, show, function, *args, rows=len(model)):
+        run.submit(name, profiler.timed(name, kind, function, rows), *args)
+        shown[name] = show
+
+    with tab3:
+        # Display the bus planning data
+        st.write('**Your Bus Planning**')
+        st.dataframe(model.frame, hide_index=True)
+
+        # Generate a Gantt chart for the bus planning
+        st.write('**Gantt Chart Of Your Bus Planning**')
+        submit('Gantt chart', 'plot', partial(show_chart, st.empty(), 'the Gantt chart'),
+               cached_schedule_chart, planning_digest, model)
+
+        # Display activity visualizations
+        st.write('**Activity Visualisations Of Your Bus Planning**')
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.write("Distribution of activities")
+            submit('activity pie chart', 'plot', partial(show_chart, st.empty(), 'the distribution of activities'),
+                   activity_chart, plot_activity_pie_chart, planning_digest, model)
+
+        with col2:
+            st.write("Distribution of charging")
+            submit('charging heatmap', 'plot', partial(show_chart, st.empty(), 'the distribution of charging'),
+                   render_chart, plot_charging_heatmap, model)
+
+        with col3:
+            st.write("Total time per activity")
+            submit('activity bar chart', 'plot', partial(show_chart, st.empty(), 'the time per activity'),
+                   activity_chart, plot_activity_bar_chart, planning_digest, model)
+
+        # Check if any uploaded data is empty
+        if timetable.empty or distance_matrix.empty:
+            st.error("One or more DataFrames are empty. Please check the uploaded files.")
+            for result in run.as_completed():
+                shown[result.name](result)
+            return
+
+    try:
+        with profiler.step('distances', 'load', len(model)):
+            distance_lookup = shared.distance_lookup
+            distances = cached_planning_distances(planning_digest, timetable_digest, model, distance_lookup)
+        distance_error = None
+    except Exception as e:
+        # The travel time check reports the error again when it compiles the distance matrix itself
+        distance_lookup, distances, distance_error = distance_matrix, None, e
+
+    with tab3:
+        # Display the battery level of every bus during the day
+        st.write('**Battery Level Of Your Buses**')
+        soc_chart = st.empty()
+        if distance_error is not None:
+            soc_chart.error(f'Something went wrong drawing the battery levels: {str(distance_error)}')
+        else:
+            submit('battery level chart', 'plot', partial(show_chart, soc_chart, 'the battery levels'),
+                   cached_soc_chart, planning_digest, timetable_digest, parameters, model, distances)
+
+        # Instruction to expand graphs
+        st.write('*Click on the graph to expand*')
+
     with tab2:
         # Display KPIs (Key Performance Indicators)
         st.subheader('KPIs')
-        met_col1, met_col2, met_col3 = st.columns(3)
-
-        try:
-            # Calculate and display the total number of buses used
-            buses_used = count_buses(bus_planning)  
-            met_col1.metric('Total Buses Used', buses_used, delta=(buses_used - 20), delta_color="inverse")
-        except Exception as e:
-            # Handle and display errors related to bus counting
-            st.error(f'Something went wrong displaying buses: {str(e)}')
+        met_cols = st.columns(3)
+        slots = {name: column.empty() for name, column in zip(KPI_MESSAGES, met_cols * 2)}
+        block_kpis = st.empty()
 
-        try:
-            # Calculate and display total deadhead time in minutes
-            deadhead_minutes = calculate_deadhead_time(bus_planning)  
-            met_col2.metric('Total Deadhead Trips In Minutes', deadhead_minutes)
-        except Exception as e:
-            # Handle and display errors related to deadhead time calculation
-            st.error(f'Something went wrong displaying deadhead time: {str(e)}')
-        
-        try: 
-            # Calculate and display total energy consumption in kW
-            energy_cons = calculate_energy_consumption(bus_planning, distance_matrix, consumption_per_km)
-            met_col3.metric('Total Energy Consumed in kW', energy_cons)
-        except Exception as e:
-            # Handle and display errors related to energy consumption calculation
-            st.error(f'Something went wrong displaying energy consumption: {str(e)}')
-            
         # Add a visual divider for better UI separation
         st.divider()
-        
-        # Check Battery Status
-        st.subheader('Battery Status')
-        try: 
-            # Check for battery issues based on State of Health (SOH) and minimum State of Charge (SOC)
-            battery_problems = check_battery_status(bus_planning, distance_matrix, SOH, min_SOC, consumption_per_km)
-            if battery_problems.empty:
-                # Display a message if no battery problems are found
-                st.write('No problems found!')
-            else:
-                # Highlight and display rows with battery issues
-                st.markdown(':red[Battery dips below minimum State Of Charge]')
-                with st.expander('Click to see the affected rows'):
-                    st.dataframe(battery_problems)       
-        except Exception as e:
-            # Handle and display errors related to battery status checks
-            st.error(f'Something went wrong checking battery: {str(e)}')
-        
-        # Check Route Continuity
-        st.subheader('Route Continuity')
-        try:
-            # Check for continuity issues where start and end locations do not align
-            continuity_problems = check_route_continuity(bus_planning)
-            if continuity_problems.empty:
-                # Display a message if no continuity problems are found
-                st.write('No problems found!')
-            else:
-                # Highlight and display rows with continuity issues
-                st.markdown(':red[Start and end location do not line up]')
-                with st.expander('Click to see the affected rows'):
-                    st.dataframe(continuity_problems)
-        except Exception as e:
-            # Handle and display errors related to route continuity checks
-            st.error(f'Something went wrong checking route continuity: {str(e)}')
 
-        # Check Driven Rides
-        try:
-            # Update the bus planning data with information about driven rides
-            bus_planning = driven_rides(bus_planning)
-        except Exception as e:
-            # Handle and display errors related to driven ride checks
-            st.error(f'Something went wrong checking driven rides: {str(e)}')
+        # Reserve a place for every check, filled in as soon as the check has finished
+        for name, (title, _, _) in CHECK_MESSAGES.items():
+            st.subheader(title)
+            slots[name] = st.empty()
+        occupancy_chart = st.empty()
+        repair_slot = st.empty()
+
+        for slot in slots.values():
+            slot.caption('Checking...')
+
+    # Trip coverage is cached on the hashes of the uploaded files
+    tasks = validation_tasks(model, timetable, distance_lookup, distances, SOH, min_SOC, consumption_per_km)
+    timetable_index = shared.timetable_index
+    tasks['coverage'] = (cached_ride_coverage, (planning_digest, timetable_digest, model, timetable_index))
+
+    # The per-block checks only check the blocks that changed since the previous planning of this session
+    validator = st.session_state.setdefault('validator', IncrementalValidator())
+    digests = cached_block_digests(planning_digest, model)
+    tasks['battery'] = (validator.run, (
+        'battery', (timetable_digest, *parameters), check_battery_status, model, digests, parameters, (distances,)
+    ))
+    tasks['continuity'] = (validator.run, ('continuity', (), check_route_continuity, model, digests))
+    tasks['travel time'] = (validator.run, (
+        'travel time', (timetable_digest,), check_travel_time, model, digests, (distance_lookup,)
+    ))
+
+    if distance_error is not None:
+        # Without distances the battery check cannot run, and the energy consumption is unknown
+        show_result(slots['battery'], CheckResult('battery', error=distance_error))
+        del tasks['battery']
+
+    def show_battery(result):
+        # Propose charging during idle time for the blocks that run out of battery
+        show_result(slots['battery'], result)
+        if result.error is None and not result.value.empty:
+            with repair_slot.container():
+                st.subheader('Battery Repairs')
+                st.caption('Repairing...')
+            submit('battery repairs', 'check', partial(show_repair_result, repair_slot),
+                   cached_battery_repair, planning_digest, timetable_digest, parameters, model, distance_lookup)
+
+    def show_occupancy(result):
+        # The charger check and chart use the chargers in use and power drawn during the day
+        if result.error is not None:
+            show_result(slots['chargers'], CheckResult('chargers', error=result.error))
+            return
+        occupancy = result.value
+        submit('chargers', 'check', partial(show_result, slots['chargers']),
+               occupancy.windows, max_chargers, max_power)
+        if len(occupancy.minutes):
+            submit('charger occupancy chart', 'plot', partial(show_chart, occupancy_chart, 'the charger occupancy'),
+                   render_chart, plot_charger_occupancy, occupancy, max_chargers, max_power,
+                   rows=len(occupancy.minutes))
+
+    for name, (function, args) in tasks.items():
+        if name == 'kpis':
+            submit(name, 'kpi', partial(show_kpis, {**slots, 'blocks': block_kpis}, energy_error=distance_error),
+                   function, *args)
+        else:
+            submit(name, 'check', show_battery if name == 'battery' else partial(show_result, slots[name]),
+                   function, *args)
+    # Without distances every charging session charges at the full rate
+    submit('charger occupancy', 'check', show_occupancy,
+           charger_usage, model, distances, SOH, consumption_per_km)
+
+    with tab4:
+        # Battery check for every combination of SOH and consumption in the range of the sliders
+        st.subheader('Battery Feasibility')
+        sweep_slot = st.empty()
+
+    def show_sweep(result):
+        if result.error is not None:
+            sweep_slot.error(f'Something went wrong sweeping the parameters: {str(result.error)}')
+            return
+        sweep = result.value
+        feasible = sweep.feasible(min_SOC)
+        with sweep_slot.container():
+            st.write(
+                f'The bus planning passes the battery check in **{feasible.sum()} of {feasible.size}** combinations '
+                f'of State Of Health and consumption at a minimum State Of Charge of {min_SOC}%.'
+            )
+            heatmap = st.empty()
+            with st.expander('Click to see the minimum State Of Charge margin per block'):
+                st.dataframe(sweep.margins(min_SOC).sort_values('margin (%)'), hide_index=True)
+        submit('feasibility heatmap', 'plot', partial(show_chart, heatmap, 'the feasibility heatmap'),
+               render_chart, plot_feasibility_heatmap, sweep, min_SOC, rows=sweep.lowest_soc.size)
+
+    if distance_error is not None:
+        sweep_slot.error(f'Something went wrong sweeping the parameters: {str(distance_error)}')
+    else:
+        sweep_slot.caption('Sweeping...')
+        submit('parameter sweep', 'check', show_sweep,
+               cached_battery_sweep, planning_digest, timetable_digest, model, distances)
+
+    # Show every result as soon as its task is done, including the charts of results shown earlier
+    for result in run.as_completed():
+        shown[result.name](result)
+
+def generate_planning(given_data, SOH, min_SOC, consumption_per_km, profiler):
+    """Build a bus planning that covers the uploaded timetable and offer it for download.
 
-        # Check if Every Necessary Trip is Covered
-        st.subheader('Trip Coverage')
-        try:
-            # Verify if all trips in the timetable are covered in the bus planning
-            ride_coverage = every_ride_covered(bus_planning, timetable)
-            if ride_coverage.empty:
-                # Display a message if all trips are covered
-                st.write('No problems found!')
-            else:
-                # Highlight and display rows with uncovered trips
-                st.markdown(':red[Some trips included in timetable are not present in bus planning, or vice versa]')
-                with st.expander('Click to see the affected rows'):
-                    st.dataframe(ride_coverage)             
-        except Exception as e:
-            # Handle and display errors related to trip coverage checks
-            st.error(f'Something went wrong checking if each trip is covered: {str(e)}')
+    Args:
+        given_data: The uploaded timetable workbook.
+        SOH (float): State of Health of the battery as a percentage.
+        min_SOC (float): Minimum state of charge required as a percentage.
+        consumption_per_km (float): Energy consumption per kilometer in kWh.
+        profiler (RunProfiler): Records the time taken by every step.
+    """
+    st.subheader('Generate A Bus Planning')
+    if not st.toggle('Build a bus planning from your timetable'):
+        return
 
-        # Check Travel Time
-        st.subheader('Travel Time')
+    try:
+        timetable_digest = file_digest(given_data)
+        shared = load_timetable(timetable_digest, given_data.getvalue(), current_session())
+        timetable = shared.timetable
+        with profiler.step('build planning', 'check', len(timetable)):
+            planning, workbook = cached_built_planning(
+                timetable_digest, (SOH, min_SOC, consumption_per_km), timetable, shared.distance_lookup
+            )
+    except Exception as e:
+        st.error(f'Something went wrong building a bus planning: {str(e)}')
+        return
+
+    st.write(f'The bus planning covers **{len(timetable)}** trips with **{planning["omloop nummer"].nunique()}** '
+             'buses, charging at the garage when the battery runs low.')
+    st.download_button('Download the bus planning', workbook, file_name='generated_bus_planning.xlsx',
+                       mime='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+
+def compare_candidates(given_data, SOH, min_SOC, consumption_per_km, profiler):
+    """Validate candidate bus plannings against one timetable and rank them on their problems and KPIs.
+
+    Args:
+        given_data: The uploaded timetable workbook, None if it has not been uploaded.
+        SOH (float): State of Health of the battery as a percentage.
+        min_SOC (float): Minimum state of charge required as a percentage.
+        consumption_per_km (float): Energy consumption per kilometer in kWh.
+        profiler (RunProfiler): Records the time taken by every step.
+    """
+    st.subheader('Compare Plannings')
+    candidates = st.file_uploader("Upload Candidate **Bus Plannings** Here", type="xlsx", accept_multiple_files=True)
+    if not candidates:
+        st.write('Upload two or more bus plannings to rank them against your timetable.')
+        return
+    if not given_data:
+        st.error("You need to upload your timetable in the 'Data and Parameters' tab.")
+        return
+
+    with st.spinner('Your bus plannings are being compared...'):
         try:
-            # Check for travel time issues based on the distance matrix
-            travel_time = check_travel_time(bus_planning, distance_matrix)
-            if travel_time.empty:
-                # Display a message if no travel time issues are found
-                st.write('No problems found!')
-            else:
-                # Highlight and display rows with travel time issues
-                st.markdown(':red[Travel time outside of bound as specified in distance matrix]')
-                with st.expander('Click to see the affected rows'):
-                    st.dataframe(travel_time)  
+            # The timetable is parsed and indexed once, and shared by all candidates
+            shared = load_timetable(file_digest(given_data), given_data.getvalue(), current_session())
+            timetable_index = shared.timetable_index
+            distance_lookup = shared.distance_lookup
         except Exception as e:
-            # Handle and display errors related to travel time checks
-            st.error(f'Something went wrong checking the travel time: {str(e)}')
+            st.error(f"Error reading the timetable: {str(e)}")
+            return
+
+        models, unreadable = {}, {}
+        for number, candidate in enumerate(candidates, start=1):
+            name = candidate.name if candidate.name not in models else f'{candidate.name} ({number})'
+            try:
+                with profiler.step(f'candidate {name}', 'load') as step:
+                    models[name] = load_bus_planning(file_digest(candidate), candidate.getvalue())
+                    step.rows = len(models[name])
+            except Exception as e:
+                unreadable[name] = e
+
+        ctx = get_script_run_ctx()
+        with profiler.step('compare plannings', 'check', sum(len(model) for model in models.values())):
+            table = compare_plannings(
+                models, timetable_index, distance_lookup, SOH, min_SOC, consumption_per_km,
+                mode='serial' if profiler.serial else 'auto',
+                initializer=lambda: add_script_run_ctx(threading.current_thread(), ctx),
+            )
+
+    if models:
+        st.write(f'**{table["planning"].iloc[0]}** has the fewest problems, ranked on the number of failing blocks, uncovered '
+                 'trips and rows with an unknown distance first, and on the number of buses, energy and deadhead time '
+                 'next.')
+        st.dataframe(table, hide_index=True)
+    for name, error in unreadable.items():
+        st.error(f"Error reading {name}: {str(error)}")
+
 
-                       
 def how_it_works_page():
     st.header("How It Works")
 
@@ -702,14 +784,23 @@ def how_it_works_page():
     1. **Battery Status**: the tool checks that the battery level of the bus does not drop below the minimum of the State of Charge, which is **10%** by default. 
     The system accounts for both driving and idle time consumption and charging times at two rates: a higher rate for charging up to **90%** and a slower rate beyond that. 
 
-    2. **Route Continuity**: the tool checks that the end location of each route aligns with the starting location of the following route. 
+    2. **Route Continuity**: the tool checks that the end location of each route aligns with the starting location of the following route, and that the following route starts exactly when the previous one ends, without overlaps or gaps. 
     
-    3. **Trip Coverage**: the tool ensures that every trip listed in the **timetable** is matched in the **bus planning**, and vice versa. 
+    3. **Trip Coverage**: the tool ensures that every trip listed in the **timetable** is covered exactly once in the **bus planning**, and that the bus planning has no trips that are not in the timetable. Departure times may differ by up to a minute. 
 
     4. **Travel Time**: the tool confirms that the travel time for each route falls within the predefined range included in the distance matrix. 
 
-    5. **Data Consistency**: the tool verifies that all critical columns are present in your data. 
+    5. **Charger Capacity**: the tool follows every charging session through the day and checks that the depot never needs more chargers, or more grid power, than the limits set with the sliders. A session draws power at the charging rate of the battery until the battery is full. 
+
+    6. **Data Consistency**: the tool verifies that all critical columns are present in your data. 
+
+    When blocks fail the **Battery Status** check, the tool proposes repairs that only use their idle time: an idle bus at the garage charges instead, and an idle bus elsewhere drives to the garage to charge when the idle time is long enough for the trips there and back. The repaired bus planning can be downloaded.
+
+    The **Data and Parameters** tab can also build a bus planning from your timetable: every trip goes to a bus that can reach it in time with enough battery left to return to the garage, and buses charge at the garage when they run low.
+
+    The **Parameter Sweep** tab runs the battery check for every combination of State of Health and consumption per km in the range of the sliders, and shows the lowest State of Charge the planning reaches in each of them.
 
+    The **Compare Plannings** tab runs all checks on several candidate bus plannings against the same timetable at once, and ranks them on their number of problems, then on buses, energy and deadhead time.
     """)
     
 def help_page():
@@ -0,0 +1,40 @@
+"""Small synthetic datasets shared by the tests."""
+import pytest
+
+from benchmarks.synthetic import make_dataset
+from bus_checker.checks import planning_distances
+from bus_checker.model import PlanningModel
+
+N_BLOCKS = 10
+ROWS_PER_BLOCK = 60
+
+
+@pytest.fixture
+def dataset():
+    """A clean bus planning with its timetable and distance matrix."""
+    return make_dataset(N_BLOCKS, ROWS_PER_BLOCK)
+
+
+@pytest.fixture
+def planning(dataset):
+    return dataset[0]
+
+
+@pytest.fixture
+def timetable(dataset):
+    return dataset[1]
+
+
+@pytest.fixture
+def distance_matrix(dataset):
+    return dataset[2]
+
+
+@pytest.fixture
+def model(planning):
+    return PlanningModel.from_frame(planning)
+
+
+@pytest.fixture
+def distances(model, distance_matrix):
+    return planning_distances(model, distance_matrix)
@@ -0,0 +1,52 @@
+"""The vectorized battery simulation against the row loop it replaced."""
+import numpy as np
+import pandas as pd
+
+from benchmarks.bench_battery import legacy_battery_levels, make_rows
+from bus_checker.battery import simulate_battery_levels
+from bus_checker.checks import check_battery_status, energy_per_row
+from bus_checker.model import MINUTES_PER_DAY, format_minutes
+
+
+def test_levels_match_loop():
+    rows = make_rows(2_000, seed=3)
+    max_capacity = 300 * 0.9
+    levels = simulate_battery_levels(
+        rows['omloop nummer'].to_numpy(),
+        (rows['activiteit'] == 'opladen').to_numpy(),
+        rows['consumption (kWh)'].to_numpy(),
+        rows['duration'].to_numpy(),
+        max_capacity,
+    )
+    np.testing.assert_allclose(levels, legacy_battery_levels(rows, max_capacity), rtol=0, atol=1e-6)
+
+
+def test_unknown_consumption_leaves_rest_of_block_unknown():
+    levels = simulate_battery_levels(
+        np.array([1, 1, 1, 2]), np.zeros(4, bool), np.array([1.0, np.nan, 1.0, 1.0]), np.ones(4), 100.0
+    )
+    assert levels[0] == 99.0 and np.isnan(levels[1:3]).all() and levels[3] == 99.0
+
+
+def test_check_matches_loop(model, distances):
+    SOH, min_SOC, consumption_per_km = 85, 30, 1.6
+    max_capacity = 300 * SOH / 100
+    consumption = energy_per_row(model, distances, consumption_per_km)
+    rows = pd.DataFrame({
+        'omloop nummer': model.blocks,
+        'activiteit': model.frame['activiteit'].astype(str),
+        'consumption (kWh)': consumption,
+        'duration': model.duration,
+    })
+    levels = legacy_battery_levels(rows, max_capacity)
+    failed = levels < max_capacity * min_SOC / 100
+    assert failed.any()
+
+    issues = check_battery_status(model, distances, SOH, min_SOC, consumption_per_km)
+    np.testing.assert_array_equal(issues['omloop nummer'], model.blocks[failed])
+    np.testing.assert_array_equal(issues['starttijd'], format_minutes(model.start[failed] % MINUTES_PER_DAY))
+    np.testing.assert_allclose(issues['state of charge'], levels[failed] / max_capacity * 100)
+
+
+def test_check_passes_with_full_battery(model, distances):
+    assert check_battery_status(model, distances, 100, 0, 0.7).empty
@@ -0,0 +1,30 @@
+"""Plannings built from the timetable pass every check."""
+import pytest
+
+from bus_checker.builder import build_planning
+from bus_checker.checks import (check_battery_status, check_route_continuity, check_travel_time, every_ride_covered,
+                                planning_distances)
+from bus_checker.model import PlanningModel
+
+
+@pytest.mark.parametrize('SOH, min_SOC, consumption_per_km', [(90, 10, 1.6), (60, 40, 2.5), (100, 10, 3.0)])
+def test_built_planning_passes_all_checks(timetable, distance_matrix, SOH, min_SOC, consumption_per_km):
+    model = PlanningModel.from_frame(build_planning(timetable, distance_matrix, SOH, min_SOC, consumption_per_km))
+    distances = planning_distances(model, distance_matrix)
+
+    assert check_battery_status(model, distances, SOH, min_SOC, consumption_per_km).empty
+    assert check_route_continuity(model).empty
+    assert every_ride_covered(model, timetable).empty
+    assert check_travel_time(model, distance_matrix).empty
+    assert model.is_activity('dienst rit').sum() == len(timetable)
+
+
+def test_fewer_buses_with_larger_battery(timetable, distance_matrix):
+    small = build_planning(timetable, distance_matrix, SOH=60, min_SOC=40)
+    large = build_planning(timetable, distance_matrix, SOH=100, min_SOC=10)
+    assert large['omloop nummer'].nunique() <= small['omloop nummer'].nunique()
+
+
+def test_unknown_trip(timetable, distance_matrix):
+    with pytest.raises(ValueError):
+        build_planning(timetable, distance_matrix[distance_matrix['buslijn'] != 401])
@@ -0,0 +1,37 @@
+"""Loading workbooks through the Arrow sheet cache against parsing them from Excel."""
+import os
+
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import write_dataset
+from bus_checker.cache import SheetCache
+from bus_checker.loading import TIMETABLE_SHEETS, read_sheets
+
+pytest.importorskip('pyarrow')
+
+
+def test_cached_sheets_equal_excel(tmp_path, dataset):
+    cache = SheetCache(str(tmp_path / 'cache'))
+    planning_path, timetable_path = write_dataset(str(tmp_path), *dataset)
+
+    for path, sheets in ((planning_path, [0]), (timetable_path, TIMETABLE_SHEETS)):
+        expected = read_sheets(path, sheets)
+        stored = read_sheets(path, sheets, cache)
+        cached = read_sheets(path, sheets, cache)
+        for sheet in sheets:
+            pd.testing.assert_frame_equal(stored[sheet], expected[sheet])
+            pd.testing.assert_frame_equal(cached[sheet], expected[sheet])
+    assert len(cache.entries()) == 3
+
+
+def test_evicts_least_recently_used(tmp_path, dataset):
+    cache = SheetCache(str(tmp_path))
+    cache.store('a' * 64, {0: dataset[0]})
+    (path, size, last_use), = cache.entries()
+    os.utime(path, (last_use - 60, last_use - 60))
+
+    cache.max_bytes = size
+    cache.store('b' * 64, {0: dataset[0]})
+    assert cache.load('a' * 64, [0]) is None
+    pd.testing.assert_frame_equal(cache.load('b' * 64, [0])[0], dataset[0])
@@ -0,0 +1,29 @@
+"""The charger sweep line against counting the charging sessions minute by minute."""
+import numpy as np
+
+from bus_checker.chargers import CHARGER_POWER, charger_occupancy, charging_power
+
+
+def test_occupancy_matches_count_per_minute(model, distances):
+    power, power_minutes = charging_power(model, distances, 85, 1.6)
+    occupancy = charger_occupancy(model, power, power_minutes)
+
+    is_charging = model.is_activity('opladen')
+    start, end = model.start[is_charging], model.end[is_charging]
+    minute = occupancy.minutes[:, np.newaxis]
+    in_session = (start <= minute) & (minute < end)
+    drawing = (start <= minute) & (minute < start + power_minutes)
+
+    np.testing.assert_array_equal(occupancy.minutes[[0, -1]], [start.min(), end.max() - 1])
+    np.testing.assert_array_equal(occupancy.chargers, in_session.sum(axis=1))
+    np.testing.assert_allclose(occupancy.power, (drawing * power).sum(axis=1))
+
+
+def test_windows(model):
+    occupancy = charger_occupancy(model)
+    assert occupancy.windows(occupancy.peak_chargers, occupancy.peak_power).empty
+
+    windows = occupancy.windows(max_chargers=occupancy.peak_chargers - 1)
+    assert set(windows['issue']) == {'chargers'}
+    assert windows['minutes'].sum() == (occupancy.chargers == occupancy.peak_chargers).sum()
+    assert (windows['peak power (kW)'] == occupancy.peak_chargers * CHARGER_POWER).all()
@@ -0,0 +1,22 @@
+"""Ranking candidate plannings against one timetable."""
+from benchmarks.synthetic import make_planning
+from bus_checker.compare import compare_plannings
+from bus_checker.model import PlanningModel
+
+
+def test_clean_planning_ranks_first(planning, model, timetable, distance_matrix):
+    # Route errors in one candidate, a route the distance matrix does not know in another
+    unknown = planning.copy()
+    unknown.loc[unknown.index[unknown['activiteit'] == 'materiaal rit'][0], 'eindlocatie'] = 'ehvnew'
+    models = {
+        'errors': PlanningModel.from_frame(make_planning(10, 60, error_rate=0.05)),
+        'unknown': PlanningModel.from_frame(unknown),
+        'clean': model,
+    }
+    table = compare_plannings(models, timetable, distance_matrix, 100, 5, 0.7, mode='serial')
+
+    assert table['planning'].tolist() == ['clean', 'unknown', 'errors']
+    assert table['rank'].tolist() == [1, 2, 3]
+    assert table.loc[0, 'problems'] == 0 and (table['errors'] == '').all()
+    assert table.loc[1, 'unknown distances'] == 1
+    assert table.loc[2, 'continuity blocks'] > 0
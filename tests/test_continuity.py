@@ -0,0 +1,36 @@
+"""The vectorized route continuity check against the row loop it replaced."""
+import numpy as np
+
+from benchmarks.bench_continuity import legacy_route_continuity
+from benchmarks.synthetic import make_planning
+from bus_checker.checks import check_route_continuity
+from bus_checker.model import PlanningModel
+
+
+def test_location_issues_match_loop():
+    model = PlanningModel.from_frame(make_planning(10, 60, error_rate=0.05, seed=1))
+    expected = legacy_route_continuity(model.frame)
+    assert not expected.empty
+
+    issues = check_route_continuity(model)
+    mismatches = issues[issues['current end location'] != issues['next start location']]
+    np.testing.assert_array_equal(mismatches['omloop nummer'], expected['omloop nummer'])
+    np.testing.assert_array_equal(mismatches['next start location'], expected['next start location'])
+
+
+def test_clean_planning_has_no_issues(model):
+    assert check_route_continuity(model).empty
+
+
+def test_overlap_and_gap(planning):
+    edited = planning.copy()
+    # Let the first row of block 1 end a minute late and the first row of block 2 a minute early
+    for block, minutes in ((1, 1), (2, -1)):
+        row = edited.index[edited['omloop nummer'] == block][0]
+        edited.loc[row, 'eindtijd datum'] += np.timedelta64(minutes, 'm')
+        edited.loc[row, 'eindtijd'] = edited.loc[row, 'eindtijd datum'].strftime('%H:%M:%S')
+
+    issues = check_route_continuity(PlanningModel.from_frame(edited))
+    np.testing.assert_array_equal(issues['omloop nummer'], [1, 2])
+    np.testing.assert_array_equal(issues['overlap (min)'], [1, 0])
+    np.testing.assert_array_equal(issues['gap (min)'], [0, 1])
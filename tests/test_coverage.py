@@ -0,0 +1,62 @@
+"""Matching the rides of a planning to the trips of the timetable."""
+import numpy as np
+import pandas as pd
+
+from bus_checker.checks import every_ride_covered
+from bus_checker.model import PlanningModel
+from bus_checker.timetable import TimetableIndex
+
+
+def test_clean_planning_covers_timetable(model, timetable):
+    assert every_ride_covered(model, timetable).empty
+    assert every_ride_covered(model, TimetableIndex(timetable)).empty
+
+
+def test_missing_extra_and_duplicate_trips(model, timetable):
+    edited = pd.concat([timetable.iloc[1:], timetable.iloc[[5]]], ignore_index=True)
+    edited.loc[len(edited)] = ['ehvgar', '03:00', 'ehvbst', 400]
+    # The first trip is left out, the sixth is listed twice and a trip that no bus drives is added
+    issues = every_ride_covered(model, edited)
+    assert sorted(issues['issue']) == ['extra', 'uncovered', 'uncovered']
+    assert issues.loc[issues['issue'] == 'extra', 'starttijd'].tolist() == [timetable['vertrektijd'][0]]
+    assert sorted(issues.loc[issues['issue'] == 'uncovered', 'starttijd']) == ['03:00', timetable['vertrektijd'][5]]
+
+
+def test_duplicate_rides(planning, timetable):
+    ride = planning.index[planning['activiteit'] == 'dienst rit'][0]
+    doubled = pd.concat([planning, planning.loc[[ride]].assign(**{'omloop nummer': 99})], ignore_index=True)
+    issues = every_ride_covered(PlanningModel.from_frame(doubled), timetable)
+    assert issues['issue'].tolist() == ['duplicate', 'duplicate']
+    assert sorted(issues['omloop nummer']) == [planning.loc[ride, 'omloop nummer'], 99]
+
+
+def test_tolerance(model, timetable):
+    # The first departure of the day, a minute earlier
+    first = timetable['vertrektijd'].idxmin()
+    shifted = timetable.copy()
+    shifted.loc[first, 'vertrektijd'] = (pd.Timestamp(f"2024-06-03 {timetable['vertrektijd'][first]}")
+                                         - pd.Timedelta(minutes=1)).strftime('%H:%M')
+    assert every_ride_covered(model, shifted).empty
+    assert sorted(every_ride_covered(model, shifted, tolerance=0)['issue']) == ['extra', 'uncovered']
+
+
+def test_rides_past_midnight():
+    day = pd.Timestamp('2024-06-03')
+    planning = pd.DataFrame({
+        'startlocatie': ['ehvbst', 'ehvapt'],
+        'eindlocatie': ['ehvapt', 'ehvbst'],
+        'starttijd': ['23:50:00', '00:15:00'],
+        'eindtijd': ['00:12:00', '00:37:00'],
+        'activiteit': ['dienst rit', 'dienst rit'],
+        'buslijn': [400.0, 400.0],
+        'starttijd datum': [day + pd.Timedelta('23:50:00'), day + pd.Timedelta('24:15:00')],
+        'eindtijd datum': [day + pd.Timedelta('24:12:00'), day + pd.Timedelta('24:37:00')],
+        'omloop nummer': [1, 1],
+    })
+    timetable = pd.DataFrame({
+        'startlocatie': ['ehvbst', 'ehvapt'], 'vertrektijd': ['23:50', '00:15'],
+        'eindlocatie': ['ehvapt', 'ehvbst'], 'buslijn': [400, 400],
+    })
+    model = PlanningModel.from_frame(planning)
+    np.testing.assert_array_equal(model.start, [1430, 1455])
+    assert every_ride_covered(model, timetable).empty
@@ -0,0 +1,41 @@
+"""Re-validating an edited planning incrementally against a full check."""
+import pandas as pd
+
+from benchmarks.bench_incremental import PARAMETERS, run_checks
+from bus_checker.checks import check_battery_status, check_route_continuity, check_travel_time, planning_distances
+from bus_checker.incremental import IncrementalValidator, block_digests
+from bus_checker.model import PlanningModel
+from bus_checker.routes import DistanceLookup
+
+
+def test_edited_block_equals_full_check(planning, distance_matrix):
+    lookup = DistanceLookup(distance_matrix)
+    model = PlanningModel.from_frame(planning)
+    validator = IncrementalValidator()
+    run_checks(validator, model, planning_distances(model, lookup), lookup)
+
+    # Move the end of a trip of one block, so it fails the continuity and travel time checks
+    edited = planning.copy()
+    row = edited.index[edited['omloop nummer'] == 4][10]
+    edited.loc[row, 'eindtijd'] = '23:59:00'
+    edited.loc[row, 'eindtijd datum'] = edited.loc[row, 'starttijd datum'].normalize() + pd.Timedelta('23:59:00')
+    model = PlanningModel.from_frame(edited)
+    distances = planning_distances(model, lookup)
+
+    results = run_checks(validator, model, distances, lookup)
+    expected = [
+        check_battery_status(model, distances, *PARAMETERS), check_route_continuity(model),
+        check_travel_time(model, lookup),
+    ]
+    assert not expected[1].empty and not expected[2].empty
+    for result, full in zip(results, expected):
+        pd.testing.assert_frame_equal(result, full.reset_index(drop=True))
+    assert validator.checked_blocks('continuity') == 1
+
+
+def test_digests_change_only_for_edited_block(planning):
+    before = block_digests(PlanningModel.from_frame(planning))
+    edited = planning.copy()
+    edited.loc[edited.index[edited['omloop nummer'] == 3][0], 'startlocatie'] = 'ehvgar'
+    after = block_digests(PlanningModel.from_frame(edited))
+    assert [block for block in before if before[block] != after[block]] == [3]
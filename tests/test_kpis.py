@@ -0,0 +1,43 @@
+"""The grouped fleet KPIs against the per-KPI formulas they replaced."""
+import numpy as np
+import pandas as pd
+
+from bus_checker.kpis import FleetKPIs, fleet_kpis
+
+
+def legacy_kpis(bus_planning, distance_matrix, consumption_per_km):
+    """Buses, deadhead minutes and energy as the app computed them one KPI at a time."""
+    deadhead = bus_planning[bus_planning['activiteit'] == 'materiaal rit']
+    deadhead_minutes = (deadhead['eindtijd datum'] - deadhead['starttijd datum']).dt.total_seconds() / 60
+
+    df = pd.merge(bus_planning, distance_matrix, on=['startlocatie', 'eindlocatie', 'buslijn'], how='left')
+    df['consumption (kWh)'] = (df['afstand in meters'] / 1000) * max(consumption_per_km, 0.7)
+    df.loc[df['activiteit'] == 'idle', 'consumption (kWh)'] = 0.01
+    return {
+        'buses': bus_planning['omloop nummer'].dropna().nunique(),
+        'deadhead': round(deadhead_minutes.sum(), 0),
+        'energy': round(df['consumption (kWh)'].sum(), 0),
+    }
+
+
+def test_totals_match_legacy(planning, model, distance_matrix, distances):
+    totals = fleet_kpis(model, distances, 1.2).totals()
+    for name, value in legacy_kpis(planning, distance_matrix, 1.2).items():
+        assert totals[name] == value
+
+    minutes = (planning['eindtijd datum'] - planning['starttijd datum']).dt.total_seconds() / 60
+    per_activity = minutes.groupby(planning['activiteit']).sum()
+    assert totals['idle'] == per_activity['idle'] and totals['charging'] == per_activity['opladen']
+    assert np.isclose(totals['revenue ratio'], per_activity['dienst rit'] / minutes.sum())
+
+
+def test_per_block_and_concat(model, distances):
+    kpis = fleet_kpis(model, distances, 1.2)
+    per_block = kpis.per_block()
+    assert len(per_block) == model.n_blocks
+    assert np.isclose(per_block['energy (kWh)'].sum(), np.nansum(kpis.energy))
+
+    # KPIs of two halves of the planning combine to those of the whole planning
+    halves = [fleet_kpis(model.select_blocks(blocks)[0]) for blocks in (range(1, 6), range(6, 11))]
+    combined = FleetKPIs.concat(halves).totals()
+    assert combined == fleet_kpis(model).totals()
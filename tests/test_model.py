@@ -0,0 +1,48 @@
+"""Building the PlanningModel from an uploaded planning."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from bus_checker.model import MINUTES_PER_DAY, PlanningModel, format_minutes
+
+
+def test_rows_sorted_by_block_and_start(planning):
+    model = PlanningModel.from_frame(planning.sample(frac=1, random_state=0))
+    assert len(model) == len(planning)
+    order = np.lexsort((model.start, model.blocks))
+    np.testing.assert_array_equal(order, np.arange(len(model)))
+    np.testing.assert_array_equal(model.block_bounds[[0, -1]], [0, len(model)])
+    assert model.n_blocks == planning['omloop nummer'].nunique()
+
+
+def test_arrays_are_read_only(model):
+    for array in (model.start, model.end, model.blocks, model.block_bounds):
+        with pytest.raises(ValueError):
+            array[0] = 0
+
+
+def test_times_past_midnight_without_dates():
+    planning = pd.DataFrame({
+        'startlocatie': ['ehvbst', 'ehvapt', 'ehvbst'],
+        'eindlocatie': ['ehvapt', 'ehvbst', 'ehvapt'],
+        'starttijd': ['23:40:00', '23:55:00', '00:20:00'],
+        'eindtijd': ['23:55:00', '00:10:00', '00:40:00'],
+        'activiteit': ['dienst rit'] * 3,
+        'buslijn': [400.0] * 3,
+        'omloop nummer': [1] * 3,
+    })
+    model = PlanningModel.from_frame(planning)
+    np.testing.assert_array_equal(model.start, [1420, 1435, MINUTES_PER_DAY + 20])
+    np.testing.assert_array_equal(model.duration, [15, 15, 20])
+    np.testing.assert_array_equal(format_minutes(model.end % MINUTES_PER_DAY), ['23:55', '00:10', '00:40'])
+
+
+def test_missing_columns(planning):
+    with pytest.raises(ValueError, match='buslijn'):
+        PlanningModel.from_frame(planning.drop(columns='buslijn'))
+
+
+def test_select_blocks(model):
+    part, rows = model.select_blocks([2, 5])
+    assert part.n_blocks == 2 and rows.sum() == len(part)
+    np.testing.assert_array_equal(part.start, model.start[rows])
@@ -0,0 +1,48 @@
+"""Running the tasks of a script run in the background."""
+import threading
+
+import pandas as pd
+import pytest
+
+from bus_checker.checks import check_route_continuity, check_travel_time
+from bus_checker.pipeline import Pipeline
+
+
+@pytest.mark.parametrize('mode', ['serial', 'thread'])
+def test_results_equal_direct_calls(model, distance_matrix, mode):
+    run = Pipeline().start(mode)
+    run.submit('continuity', check_route_continuity, model)
+    run.submit('travel time', check_travel_time, model, distance_matrix)
+    run.submit('fails', check_travel_time, model, None)
+
+    results = {result.name: result for result in run.as_completed()}
+    pd.testing.assert_frame_equal(results['continuity'].value, check_route_continuity(model))
+    pd.testing.assert_frame_equal(results['travel time'].value, check_travel_time(model, distance_matrix))
+    assert results['fails'].error is not None
+
+    with pytest.raises(ValueError):
+        run.submit('continuity', check_route_continuity, model)
+
+
+def test_new_run_cancels_waiting_tasks():
+    pipeline = Pipeline()
+    release = threading.Event()
+    started = threading.Semaphore(0)
+
+    def blocked():
+        started.release()
+        release.wait(5)
+        return 'done'
+
+    first = pipeline.start('thread', max_workers=2)
+    running = [first.submit(f'running {i}', blocked) for i in range(2)]
+    for _ in running:
+        started.acquire(timeout=5)
+    waiting = first.submit('waiting', blocked)
+
+    second = pipeline.start('thread', max_workers=2)
+    assert first.cancelled.is_set() and not second.cancelled.is_set()
+    assert waiting.cancelled() and pipeline.cancelled_tasks == 1
+
+    release.set()
+    assert [future.result().value for future in running] == ['done', 'done']
@@ -0,0 +1,47 @@
+"""Charging repairs of blocks that run out of battery."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import make_planning
+from bus_checker.checks import check_battery_status, check_route_continuity, planning_distances
+from bus_checker.model import PlanningModel
+from bus_checker.repair import repair_battery
+
+SOH, MIN_SOC, CONSUMPTION_PER_KM = 90, 10, 1.6
+
+
+def failing_blocks(model, distance_matrix):
+    issues = check_battery_status(model, planning_distances(model, distance_matrix), SOH, MIN_SOC, CONSUMPTION_PER_KM)
+    return set(issues['omloop nummer']) if not issues.empty else set()
+
+
+@pytest.mark.parametrize('max_repairs', [3, 10])
+def test_repaired_blocks_pass_and_others_are_unchanged(distance_matrix, max_repairs):
+    # Without its charging sessions most blocks run out of battery
+    planning = make_planning(15)
+    planning.loc[planning['activiteit'] == 'opladen', 'activiteit'] = 'idle'
+    model = PlanningModel.from_frame(planning)
+    failing = failing_blocks(model, distance_matrix)
+
+    repair = repair_battery(model, distance_matrix, SOH, MIN_SOC, CONSUMPTION_PER_KM, max_repairs=max_repairs)
+    repaired = PlanningModel.from_frame(repair.planning)
+
+    assert len(repair.repaired) and set(repair.repaired) | set(repair.unrepaired) == failing
+    assert failing_blocks(repaired, distance_matrix) == set(repair.unrepaired)
+    assert check_route_continuity(repaired).empty
+
+    # Blocks that still fail and blocks that passed keep their rows, and every regular trip keeps its place
+    unchanged = ~model.frame['omloop nummer'].isin(repair.repaired)
+    columns = ['omloop nummer', 'startlocatie', 'eindlocatie', 'activiteit', 'buslijn']
+    pd.testing.assert_frame_equal(
+        repaired.frame.loc[~repaired.frame['omloop nummer'].isin(repair.repaired), columns].astype(str).reset_index(drop=True),
+        model.frame.loc[unchanged, columns].astype(str).reset_index(drop=True),
+    )
+    np.testing.assert_array_equal(repaired.start[repaired.is_activity('dienst rit')], model.start[model.is_activity('dienst rit')])
+
+
+def test_passing_planning_is_left_alone(model, distance_matrix):
+    repair = repair_battery(model, distance_matrix, 100, 0, 0.7)
+    assert repair.repairs.empty and len(repair.unrepaired) == 0
+    assert len(repair.planning) == len(model)
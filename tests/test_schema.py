@@ -0,0 +1,41 @@
+"""Checks on the compact column types against the frames as read."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from bus_checker.checks import check_travel_time, every_ride_covered, planning_distances
+from bus_checker.model import PlanningModel
+from bus_checker.schema import compact_distance_matrix, compact_planning, compact_timetable, memory_report
+
+
+def test_checks_equal_on_compact_frames(planning, model, timetable, distance_matrix):
+    distance_matrix.loc[distance_matrix['buslijn'] == 400, 'max reistijd in min'] -= 2
+    edited = timetable.drop(index=3)
+    compact_distances = compact_distance_matrix(distance_matrix)
+
+    np.testing.assert_array_equal(planning_distances(model, compact_distances), planning_distances(model, distance_matrix))
+    pd.testing.assert_frame_equal(check_travel_time(model, compact_distances), check_travel_time(model, distance_matrix))
+    pd.testing.assert_frame_equal(
+        every_ride_covered(model, compact_timetable(edited)), every_ride_covered(model, edited), check_dtype=False
+    )
+
+
+def test_compact_planning_keeps_values(planning):
+    compact = compact_planning(planning.copy())
+    for column in planning.columns:
+        np.testing.assert_array_equal(compact[column].astype(planning[column].dtype), planning[column])
+    assert compact['buslijn'].cat.categories.dtype == np.int16
+
+
+def test_memory_is_reduced(planning, timetable, distance_matrix):
+    report = memory_report({
+        'bus planning': PlanningModel.from_frame(planning),
+        'timetable': compact_timetable(timetable),
+        'distance matrix': compact_distance_matrix(distance_matrix),
+    })
+    assert (report['stored (MB)'] < report['as read (MB)']).all()
+
+
+def test_lines_must_be_whole_numbers(planning):
+    with pytest.raises(ValueError, match='whole numbers'):
+        compact_planning(planning.assign(buslijn=planning['buslijn'] + 0.5))
@@ -0,0 +1,53 @@
+"""One parsed timetable shared by the sessions that uploaded it."""
+import io
+
+import pandas as pd
+import pytest
+
+from bus_checker.checks import check_travel_time, every_ride_covered
+from bus_checker.loading import read_timetable
+from bus_checker.shared import SharedTimetableCache
+
+
+@pytest.fixture
+def content(timetable, distance_matrix):
+    """The timetable workbook as uploaded."""
+    with io.BytesIO() as buffer:
+        with pd.ExcelWriter(buffer) as writer:
+            timetable.to_excel(writer, sheet_name='Dienstregeling', index=False)
+            distance_matrix.to_excel(writer, sheet_name='Afstandsmatrix', index=False)
+        return buffer.getvalue()
+
+
+def test_sessions_share_one_parsed_copy(model, content):
+    cache = SharedTimetableCache()
+    first, second = cache.acquire('a', content), cache.acquire('b', content)
+    assert first is second and cache.loads == 1 and cache.hits == 1 and cache.sessions(first.digest) == 2
+
+    # Checks on the shared lookup and index equal checks on a session's own copy
+    timetable, distance_matrix = read_timetable(io.BytesIO(content))
+    pd.testing.assert_frame_equal(every_ride_covered(model, first.timetable_index), every_ride_covered(model, timetable))
+    pd.testing.assert_frame_equal(check_travel_time(model, first.distance_lookup), check_travel_time(model, distance_matrix))
+
+    cache.release('a')
+    assert cache.sessions(first.digest) == 1
+
+
+def test_shared_frames_are_read_only(content):
+    entry = SharedTimetableCache().acquire('a', content)
+    for frame in (entry.timetable, entry.distance_matrix, entry.timetable_index.trips, entry.distance_lookup.routes):
+        with pytest.raises(ValueError):
+            frame.iloc[0, 0] = frame.iloc[-1, 0]
+
+    # A session that adds a column changes its own copy of the frame only
+    timetable = entry.timetable
+    timetable['changed'] = True
+    assert 'changed' not in entry.timetable.columns
+
+
+def test_unheld_entries_are_dropped(content):
+    cache = SharedTimetableCache(max_entries=0)
+    entry = cache.acquire('a', content)
+    cache.release('a')
+    assert cache.report().empty
+    assert cache.acquire('a', content) is not entry and cache.loads == 2
@@ -0,0 +1,44 @@
+"""The state of charge on a minute grid against the battery simulation."""
+import numpy as np
+
+from bus_checker.battery import simulate_battery_levels
+from bus_checker.checks import energy_per_row, planning_distances
+from bus_checker.model import PlanningModel
+from bus_checker.soc import lttb_downsample, minmax_downsample, soc_series
+
+SOH, CONSUMPTION_PER_KM = 85, 1.6
+
+
+def assert_levels_at_row_ends(model, distances):
+    series = soc_series(model, distances, SOH, CONSUMPTION_PER_KM)
+    max_capacity = 300 * SOH / 100
+    consumption = energy_per_row(model, distances, CONSUMPTION_PER_KM)
+    levels = simulate_battery_levels(model.blocks, model.is_activity('opladen'), consumption, model.duration, max_capacity)
+
+    block = np.searchsorted(series.blocks, model.blocks)
+    minute = np.searchsorted(series.minutes, model.end)
+    np.testing.assert_allclose(series.soc[block, minute], levels / max_capacity * 100, rtol=0, atol=1e-3)
+
+
+def test_levels_at_row_ends_match_simulation(model, distances):
+    assert_levels_at_row_ends(model, distances)
+
+
+def test_overlapping_rows(planning, distance_matrix):
+    # Let a trip start before the previous activity of its block ends
+    edited = planning.copy()
+    row = edited.index[(edited['omloop nummer'] == 2) & (edited['activiteit'] == 'dienst rit')][5]
+    edited.loc[row, 'starttijd datum'] -= np.timedelta64(6, 'm')
+    edited.loc[row, 'starttijd'] = edited.loc[row, 'starttijd datum'].strftime('%H:%M:%S')
+    model = PlanningModel.from_frame(edited)
+    assert_levels_at_row_ends(model, planning_distances(model, distance_matrix))
+
+
+def test_downsampling_keeps_lowest_point(model, distances):
+    series = soc_series(model, distances, SOH, CONSUMPTION_PER_KM)
+    _, minmax = minmax_downsample(series.minutes, series.soc, 50)
+    assert minmax.shape == (model.n_blocks, 100)
+    np.testing.assert_array_equal(np.nanmin(minmax, axis=1), series.lowest())
+
+    x, lttb = lttb_downsample(series.minutes, series.soc, 80)
+    assert lttb.shape == x.shape == (model.n_blocks, 80)
@@ -0,0 +1,50 @@
+"""Streaming a planning in chunks against checking it in one piece."""
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import make_planning
+from bus_checker.checks import check_battery_status, check_route_continuity, check_travel_time, planning_distances
+from bus_checker.kpis import fleet_kpis
+from bus_checker.model import PlanningModel
+from bus_checker.streaming import block_chunks, read_planning_chunks, stream_checks
+
+PARAMETERS = (85, 30, 1.6)
+
+
+@pytest.mark.parametrize('suffix', ['.xlsx', '.csv'])
+def test_streamed_results_equal_full_check(tmp_path, distance_matrix, suffix):
+    planning = make_planning(10, 60, error_rate=0.02, seed=2)
+    path = str(tmp_path / f'planning{suffix}')
+    if suffix == '.csv':
+        planning.to_csv(path, index=False)
+    else:
+        planning.to_excel(path, index=False)
+
+    model = PlanningModel.from_frame(planning)
+    distances = planning_distances(model, distance_matrix)
+    expected = {
+        'kpis': fleet_kpis(model, distances, PARAMETERS[2]),
+        'battery': check_battery_status(model, distances, *PARAMETERS),
+        'continuity': check_route_continuity(model),
+        'travel time': check_travel_time(model, distance_matrix),
+    }
+    assert not expected['battery'].empty and not expected['continuity'].empty
+
+    results = {result.name: result for result in stream_checks(read_planning_chunks(path, 45), distance_matrix, *PARAMETERS)}
+    assert set(results) == set(expected)
+    assert all(result.error is None for result in results.values())
+    assert results['kpis'].value.totals() == expected['kpis'].totals()
+    for name in ('battery', 'continuity', 'travel time'):
+        pd.testing.assert_frame_equal(results[name].value, expected[name], check_dtype=False)
+
+
+def test_chunks_end_on_block_boundaries(planning):
+    chunks = list(block_chunks(planning.iloc[start:start + 70] for start in range(0, len(planning), 70)))
+    pd.testing.assert_frame_equal(pd.concat(chunks, ignore_index=True), planning)
+    assert all(chunk['omloop nummer'].iloc[-1] not in set(following['omloop nummer'])
+               for chunk, following in zip(chunks, chunks[1:]))
+
+
+def test_split_blocks_are_rejected(planning):
+    with pytest.raises(ValueError, match='next to each other'):
+        list(block_chunks([planning, planning]))
@@ -0,0 +1,16 @@
+"""The batched parameter sweep against one battery check per combination."""
+import numpy as np
+
+from bus_checker.checks import check_battery_status
+from bus_checker.sweep import CONSUMPTION_VALUES, SOH_VALUES, battery_sweep
+
+
+def test_feasible_matches_battery_check(model, distances):
+    sweep = battery_sweep(model, distances)
+    for min_SOC in (10, 30):
+        expected = np.array([
+            [check_battery_status(model, distances, SOH, min_SOC, consumption).empty for consumption in CONSUMPTION_VALUES]
+            for SOH in SOH_VALUES
+        ])
+        assert expected.any() and not expected.all()
+        np.testing.assert_array_equal(sweep.feasible(min_SOC), expected)
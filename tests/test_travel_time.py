@@ -0,0 +1,23 @@
+"""The vectorized travel time check against the merge and row loop it replaced."""
+import numpy as np
+
+from benchmarks.bench_travel_time import legacy_travel_time
+from bus_checker.checks import check_travel_time
+from bus_checker.routes import DistanceLookup
+
+
+def test_issues_match_loop(model, distance_matrix):
+    # Tighten the bounds of line 400 so some trips fall outside of them
+    distance_matrix.loc[distance_matrix['buslijn'] == 400, 'max reistijd in min'] -= 2
+    expected = legacy_travel_time(model, distance_matrix)
+    assert not expected.empty
+
+    for lookup in (distance_matrix, DistanceLookup(distance_matrix)):
+        issues = check_travel_time(model, lookup)
+        np.testing.assert_array_equal(np.sort(issues['reistijd']), np.sort(expected['reistijd']))
+        np.testing.assert_array_equal(np.sort(issues['omloop nummer']), np.sort(expected['omloop nummer']))
+
+
+def test_unknown_routes_are_not_checked(model, distance_matrix):
+    assert check_travel_time(model, distance_matrix).empty
+    assert check_travel_time(model, distance_matrix[distance_matrix['buslijn'].isna()]).empty